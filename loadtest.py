@@ -0,0 +1,320 @@
+"""
+Общий код нагрузочных прогонов YaNews и YaNote.
+
+Проекты описывают в своём benchmarks/load.py только заготовку данных
+(seed) и сценарий пользователя (journey), а транспорт, замеры,
+виртуальные пользователи и отчёт берут отсюда. Модуль лежит в корне
+репозитория; benchmarks/__init__.py проектов добавляет корень в
+sys.path. Запускается из каталога проекта, как и его бенчмарки:
+benchmarks.common берётся оттуда.
+
+--users виртуальных пользователей (потоков) в течение --duration секунд
+повторяют сценарий. WSGI-приложение вызывается в процессе или, с
+--port, поднимается на локальном порту (wsgiref) и опрашивается по
+HTTP. По каждому маршруту выводятся число запросов, ошибки, пропускная
+способность и p50/p95/p99; с --output тот же JSON сохраняется в файл,
+чтобы сравнивать прогоны разных коммитов.
+
+Пароли хешируются MD5, если не указан --real-hasher: иначе вход
+измерял бы намеренно медленный PBKDF2, а не приложение.
+"""
+import argparse
+import io
+import json
+import logging
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.client import HTTPConnection
+from http.cookies import SimpleCookie
+from socketserver import ThreadingMixIn
+from urllib.parse import urlencode, urlsplit
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+HOST = 'localhost'
+PASSWORD = 'load-password'
+
+
+class InProcessTransport:
+    """Вызывает WSGI-приложение напрямую, без сокетов."""
+
+    def __init__(self, application):
+        self.application = application
+
+    def request(self, method, path, body, headers):
+        url = urlsplit(path)
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'SERVER_NAME': HOST,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.url_scheme': 'http',
+            'wsgi.errors': sys.stderr,
+        }
+        for name, value in headers.items():
+            if name == 'Content-Type':
+                environ['CONTENT_TYPE'] = value
+            else:
+                environ['HTTP_' + name.upper().replace('-', '_')] = value
+        started = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            started['status'] = int(status.split()[0])
+            started['headers'] = response_headers
+
+        chunks = self.application(environ, start_response)
+        try:
+            content = b''.join(chunks)
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+        return started['status'], started['headers'], content
+
+    def close(self):
+        pass
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class HttpTransport:
+    """Поднимает приложение на локальном порту и ходит к нему по HTTP."""
+
+    def __init__(self, application, port):
+        self.server = make_server(
+            '127.0.0.1', port, application,
+            server_class=ThreadingWSGIServer, handler_class=QuietHandler,
+        )
+        self.port = self.server.server_port
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+        self.thread.start()
+
+    def request(self, method, path, body, headers):
+        connection = HTTPConnection('127.0.0.1', self.port)
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            return response.status, response.getheaders(), response.read()
+        finally:
+            connection.close()
+
+    def close(self):
+        self.server.shutdown()
+
+
+class Recorder:
+    """Длительности и ошибки запросов по маршрутам URL."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.journeys = defaultdict(int)
+
+    def add(self, route, duration, ok):
+        with self.lock:
+            self.latencies[route].append(duration)
+            if not ok:
+                self.errors[route] += 1
+
+    def journey_done(self, ok):
+        with self.lock:
+            self.journeys['completed' if ok else 'failed'] += 1
+
+    def summary(self, elapsed):
+        from benchmarks.common import summarize
+
+        routes = {}
+        for route in sorted(self.latencies):
+            samples = self.latencies[route]
+            stats = summarize(samples)
+            del stats['runs']
+            routes[route] = {
+                'requests': len(samples),
+                'errors': self.errors[route],
+                'throughput_rps': round(len(samples) / elapsed, 1),
+                **stats,
+            }
+        total = sum(len(samples) for samples in self.latencies.values())
+        return {
+            'journeys': dict(self.journeys),
+            'requests': total,
+            'errors': sum(self.errors.values()),
+            'throughput_rps': round(total / elapsed, 1),
+            'routes': routes,
+        }
+
+
+class JourneyError(Exception):
+    """Неожиданный ответ: остаток сценария пропускается."""
+
+
+class Response:
+
+    def __init__(self, status, headers, content):
+        self.status = status
+        self.location = dict(headers).get('Location', '').split('#')[0]
+        self.text = content.decode('utf-8', 'replace')
+
+
+class Browser:
+    """Виртуальный пользователь: cookie, CSRF-токен и замер запросов."""
+
+    def __init__(self, transport, recorder):
+        self.transport = transport
+        self.recorder = recorder
+        self.cookies = {}
+
+    def get(self, path, expect=(200,)):
+        return self.request('GET', path, None, expect)
+
+    def post(self, path, data, expect=(302,)):
+        return self.request('POST', path, data, expect)
+
+    def request(self, method, path, data, expect):
+        from django.urls import resolve
+
+        headers = {'Host': HOST}
+        body = b''
+        if data is not None:
+            body = urlencode(data).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.cookies.get('csrftoken', '')
+        if self.cookies:
+            headers['Cookie'] = '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items()
+            )
+        start = time.perf_counter()
+        status, response_headers, content = self.transport.request(
+            method, path, body, headers
+        )
+        duration = time.perf_counter() - start
+        self.store_cookies(response_headers)
+        route = f'{method} /{resolve(urlsplit(path).path).route}'
+        self.recorder.add(route, duration, status in expect)
+        if status not in expect:
+            raise JourneyError(f'{method} {path}: {status}')
+        return Response(status, response_headers, content)
+
+    def store_cookies(self, headers):
+        for name, value in headers:
+            if name.lower() != 'set-cookie':
+                continue
+            for morsel in SimpleCookie(value).values():
+                if morsel['max-age'] == '0' or not morsel.value:
+                    self.cookies.pop(morsel.key, None)
+                else:
+                    self.cookies[morsel.key] = morsel.value
+
+
+def run(transport, users, duration, journey):
+    """Потоки users раз за разом проходят journey(browser, rng, name)."""
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+
+    def user(number):
+        rng = random.Random(number)
+        browser = Browser(transport, recorder)
+        while time.monotonic() < deadline:
+            try:
+                journey(browser, rng, f'load{number}')
+            except JourneyError:
+                recorder.journey_done(False)
+                browser.cookies.clear()
+            else:
+                recorder.journey_done(True)
+
+    threads = [
+        threading.Thread(target=user, args=(number,))
+        for number in range(users)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.summary(time.perf_counter() - started)
+
+
+def commit():
+    """Коммит, на котором сделан прогон; «+» — есть незакоммиченное."""
+    try:
+        head = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return head + ('+' if dirty else '')
+
+
+def arguments(description):
+    """Разбор общих параметров прогона; проект добавляет свои."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument(
+        '--port', type=int,
+        help='Поднять сервер на порту (0 — любой свободный).'
+    )
+    parser.add_argument('--real-hasher', action='store_true')
+    parser.add_argument('--output', help='Куда ещё сохранить JSON.')
+    return parser
+
+
+def configure(args, query_logger):
+    """Настройки Django для прогона; вызывается после setup_django()."""
+    from django.conf import settings
+
+    # Предупреждения QueryStatsMiddleware о каждом запросе не нужны.
+    logging.getLogger(query_logger).setLevel(logging.ERROR)
+    if not args.real_hasher:
+        settings.PASSWORD_HASHERS = [
+            'django.contrib.auth.hashers.MD5PasswordHasher'
+        ]
+
+
+def execute(project, application, args, journey):
+    """Прогоняет journey на application и печатает отчёт."""
+    from benchmarks.common import report
+
+    if args.port is None:
+        transport = InProcessTransport(application)
+    else:
+        transport = HttpTransport(application, args.port)
+    try:
+        result = run(transport, args.users, args.duration, journey)
+    finally:
+        transport.close()
+    result = {
+        'project': project,
+        'commit': commit(),
+        'transport': 'inprocess' if args.port is None else 'http',
+        'users': args.users,
+        'duration_s': args.duration,
+        **result,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(result, output, ensure_ascii=False, indent=2)
+    report(result)
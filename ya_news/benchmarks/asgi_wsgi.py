@@ -0,0 +1,173 @@
+"""Пропускная способность и p99 ленты и страницы новости: WSGI и ASGI.
+
+Внешнего сервера нет: обработчики Django вызываются в процессе.
+--connections клиентов работают одновременно, каждый отправляет
+следующий запрос, как только получил ответ на предыдущий. Под WSGI
+запросы обслуживает пул из --wsgi-threads потоков (как воркер
+gthread), под ASGI — один цикл событий с news.async_views.
+
+Каждый режим запускается в отдельном процессе на общей базе: выбор
+view фиксируется при загрузке urls. Клиенты по умолчанию отправляют
+cookie сессии, чтобы мерить сами view, а не кеш ответов (--cached).
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import report, setup_django, summarize
+
+HOST = 'localhost'
+COOKIE = 'sessionid=benchmark'
+
+
+def call_wsgi(handler, path, cookie):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': HOST,
+        'wsgi.input': io.BytesIO(),
+        'wsgi.url_scheme': 'http',
+        'wsgi.errors': sys.stderr,
+    }
+    if cookie:
+        environ['HTTP_COOKIE'] = cookie
+    statuses = []
+    body = handler(environ, lambda status, headers: statuses.append(status))
+    try:
+        b''.join(body)
+    finally:
+        body.close()
+    return int(statuses[0].split()[0])
+
+
+async def call_asgi(handler, path, cookie):
+    headers = [(b'host', HOST.encode())]
+    if cookie:
+        headers.append((b'cookie', cookie.encode()))
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path,
+        'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': headers, 'client': ('127.0.0.1', 0),
+        'server': (HOST, 80),
+    }
+    statuses = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    await handler(scope, receive, send)
+    return statuses[0]
+
+
+async def load(mode, paths, connections, requests, threads, cookie):
+    if mode == 'wsgi':
+        from django.core.wsgi import get_wsgi_application
+        handler = get_wsgi_application()
+        pool = ThreadPoolExecutor(max_workers=threads)
+        loop = asyncio.get_running_loop()
+
+        def call(path):
+            return loop.run_in_executor(
+                pool, call_wsgi, handler, path, cookie
+            )
+    else:
+        from django.core.asgi import get_asgi_application
+        handler = get_asgi_application()
+
+        def call(path):
+            return call_asgi(handler, path, cookie)
+
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+    rng = random.Random(0)
+
+    async def client():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            status = await call(rng.choice(paths))
+            latencies.append(time.perf_counter() - start)
+            errors += status != 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(connections)))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        **summarize(latencies),
+    }
+
+
+def run_mode(args):
+    os.environ['NEWS_ASYNC_VIEWS'] = '1' if args.mode == 'asgi' else '0'
+    setup_django(args.db)
+    from news.models import News
+
+    paths = ['/'] + [
+        f'/news/{pk}/' for pk in News.objects.values_list('pk', flat=True)
+    ]
+    result = asyncio.run(load(
+        args.mode, paths, args.connections, args.requests,
+        args.wsgi_threads, None if args.cached else COOKIE,
+    ))
+    json.dump(result, sys.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--news', type=int, default=50)
+    parser.add_argument('--comments', type=int, default=50)
+    parser.add_argument('--connections', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--wsgi-threads', type=int, default=32)
+    parser.add_argument('--cached', action='store_true')
+    parser.add_argument('--mode', choices=('wsgi', 'asgi'))
+    parser.add_argument('--db')
+    args = parser.parse_args()
+    if args.mode:
+        return run_mode(args)
+
+    from benchmarks.home_page import seed
+
+    db_path = setup_django()
+    seed(args.news, args.comments)
+    results = {}
+    for mode in ('wsgi', 'asgi'):
+        child = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.asgi_wsgi', '--mode', mode,
+             '--db', str(db_path), *sys.argv[1:]],
+            check=True, stdout=subprocess.PIPE,
+        )
+        results[mode] = json.loads(child.stdout)
+    report({
+        'news': args.news,
+        'comments_per_news': args.comments,
+        'connections': args.connections,
+        'wsgi_threads': args.wsgi_threads,
+        'async_db_workers': int(os.environ.get('NEWS_ASYNC_DB_WORKERS', 8)),
+        'cached': args.cached,
+        **results,
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Стоимость CommentForm.clean_text в зависимости от размера словаря.
+
+Сравнивает прежнюю проверку (цикл `word in text` по словарю) со
+скомпилированным BadWordsMatcher на одном и том же чистом тексте.
+"""
+import argparse
+import random
+
+from benchmarks.common import measure, report, setup_django
+
+ALPHABET = 'абвгдежзийклмнопрстуфхцчшщыьэюя'
+
+
+def random_words(count, rng):
+    return [
+        ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(5, 12)))
+        for _ in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--sizes', type=int, nargs='+',
+        default=[10, 100, 1000, 10000, 50000]
+    )
+    parser.add_argument('--text-words', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    setup_django()
+    from news import forms
+    from news.moderation import BadWordsMatcher
+
+    rng = random.Random(args.seed)
+    text = ' '.join(random_words(args.text_words, rng))
+    results = []
+    for size in args.sizes:
+        words = random_words(size, rng)
+        forms.bad_words = BadWordsMatcher(words)
+
+        def legacy():
+            lowered = text.lower()
+            return any(word in lowered for word in words)
+
+        def clean_text():
+            forms.CommentForm(data={'text': text}).is_valid()
+
+        results.append({
+            'dictionary_size': size,
+            'legacy_loop': measure(legacy, repeat=args.repeat),
+            'matcher': measure(
+                lambda: forms.bad_words.search(text), repeat=args.repeat
+            ),
+            'clean_text': measure(clean_text, repeat=args.repeat),
+        })
+    report({'text_length': len(text), 'results': results})
+
+
+if __name__ == '__main__':
+    main()
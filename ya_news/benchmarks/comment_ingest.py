@@ -0,0 +1,83 @@
+"""Публикация комментариев к одной новости: сразу в базу и через очередь.
+
+--threads пользователей одновременно отправляют комментарии через
+NewsComment. В синхронном режиме каждый запрос сам пишет в SQLite, в
+режиме COMMENTS_WRITE_BEHIND — только ставит комментарий в очередь;
+для него отдельно замеряется, сколько фоновый поток дописывает
+очередь после последнего ответа.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import get_client, report, setup_django, summarize
+
+
+def post_comments(url, clients, requests):
+    def post(number):
+        client = clients[number % len(clients)]
+        start = time.perf_counter()
+        response = client.post(url, data={'text': f'Комментарий {number}'})
+        return time.perf_counter() - start, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+        results = list(pool.map(post, range(requests)))
+    elapsed = time.perf_counter() - started
+    return elapsed, {
+        'requests': requests,
+        'errors': sum(status != 302 for _, status in results),
+        'throughput_rps': round(requests / elapsed, 1),
+        **summarize([duration for duration, _ in results]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+
+    from news.ingest import get_writer
+    from news.models import Comment, News
+
+    news = News.objects.create(title='Горячая новость', text='Текст')
+    url = f'/news/{news.pk}/'
+    clients = []
+    for number in range(args.threads):
+        client = get_client()
+        # «database is locked» должен стать ответом 500, а не исключением.
+        client.raise_request_exception = False
+        client.force_login(get_user_model().objects.create_user(
+            username=f'bench{number}'
+        ))
+        clients.append(client)
+
+    results = {}
+    for mode, write_behind in (('sync', False), ('write_behind', True)):
+        settings.COMMENTS_WRITE_BEHIND = write_behind
+        before = Comment.objects.count()
+        elapsed, results[mode] = post_comments(url, clients, args.requests)
+        if write_behind:
+            start = time.perf_counter()
+            get_writer().flush()
+            drain = time.perf_counter() - start
+            results[mode]['drain_s'] = round(drain, 3)
+            results[mode]['stored_rps'] = round(
+                args.requests / (elapsed + drain), 1
+            )
+        results[mode]['stored'] = Comment.objects.count() - before
+    news.refresh_from_db()
+    report({
+        'threads': args.threads,
+        'comment_count': news.comment_count,
+        **results,
+    })
+
+
+if __name__ == '__main__':
+    main()
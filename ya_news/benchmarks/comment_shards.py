@@ -0,0 +1,129 @@
+"""Пропускная способность записи комментариев при 1, 2, 4 и 8 шардах.
+
+--writers процессов в течение --seconds сохраняют комментарии к
+случайным из --news новостей через Comment.save(), как NewsComment:
+вставка в шард новости плюс обновление счётчика новости в default.
+Каждая конфигурация шардов работает в своём процессе на своих файлах
+SQLite (yanews.sqlite с прагмами по умолчанию).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import report, summarize
+
+
+def write_comments(args, news_ids, author_id, seed, results):
+    from django.db import OperationalError, connections
+
+    from news.models import Comment
+
+    # Соединения родителя дочернему процессу не годятся.
+    connections.close_all()
+    rng = random.Random(seed)
+    latencies, errors = [], 0
+    deadline = time.monotonic() + args.seconds
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            Comment.objects.create(
+                news_id=rng.choice(news_ids), author_id=author_id,
+                text='Комментарий под нагрузкой',
+            )
+        except OperationalError:
+            errors += 1
+        else:
+            latencies.append(time.perf_counter() - start)
+    results.put((latencies, errors))
+
+
+def run_mode(args):
+    from benchmarks.common import setup_django
+
+    directory = Path(tempfile.mkdtemp(prefix='yanews-shards-'))
+    os.environ['YANEWS_COMMENT_SHARDS'] = ','.join(
+        str(directory / f'comments{number}.db')
+        for number in range(args.shards)
+    )
+    setup_django(directory / 'main.db')
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.db import connections
+
+    from news.models import Comment, News
+
+    call_command('reshard_comments', stdout=open(os.devnull, 'w'))
+    author = get_user_model().objects.create_user(username='bench')
+    news_ids = [
+        News.objects.create(title=f'Новость {number}', text='Текст').pk
+        for number in range(args.news)
+    ]
+    connections.close_all()
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    writers = [
+        context.Process(target=write_comments, args=(
+            args, news_ids, author.pk, number, results
+        ))
+        for number in range(args.writers)
+    ]
+    for process in writers:
+        process.start()
+    latencies, errors = [], 0
+    for _ in writers:
+        writer_latencies, writer_errors = results.get()
+        latencies.extend(writer_latencies)
+        errors += writer_errors
+    for process in writers:
+        process.join()
+    json.dump({
+        'comments_per_s': round(len(latencies) / args.seconds, 1),
+        'per_shard': [
+            Comment.objects.using(alias).count()
+            for alias in settings.COMMENT_SHARDS
+        ],
+        'errors': errors,
+        **summarize(latencies),
+    }, sys.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--news', type=int, default=200)
+    parser.add_argument(
+        '--shard-counts', type=int, nargs='+', default=[1, 2, 4, 8]
+    )
+    parser.add_argument('--shards', type=int)
+    args = parser.parse_args()
+    if args.shards:
+        return run_mode(args)
+
+    results = {}
+    for shards in args.shard_counts:
+        child = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.comment_shards',
+             '--shards', str(shards), *sys.argv[1:]],
+            check=True, stdout=subprocess.PIPE,
+        )
+        results[f'{shards}_shards'] = json.loads(child.stdout)
+    report({
+        'writers': args.writers,
+        'seconds': args.seconds,
+        **results,
+    })
+
+
+if __name__ == '__main__':
+    main()
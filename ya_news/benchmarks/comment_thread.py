@@ -0,0 +1,72 @@
+"""Время ответа страницы новости с кешем ветки комментариев и без него.
+
+«Промах» — каждый запрос с пустым кешем: выборка и отрисовка страницы
+комментариев; «попадание» — повторные запросы к той же странице.
+"""
+import argparse
+from datetime import timedelta
+
+from benchmarks.common import (
+    bulk_insert, get_client, measure, report, setup_django
+)
+
+
+def seed(comments):
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+
+    from news.models import Comment, News
+
+    author = get_user_model().objects.create_user(username='bench')
+    news = News.objects.create(title='Новость', text='Текст новости.')
+    now = timezone.now()
+    bulk_insert(Comment, [
+        Comment(
+            news=news, author=author,
+            text=f'Комментарий {i}.\n' + 'Ещё одна строка.\n' * 5,
+            created=now + timedelta(seconds=i),
+        )
+        for i in range(comments)
+    ])
+    return news
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--comments', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.core.cache import caches
+
+    from news.fragments import cache_stats, reset_stats
+
+    from django.contrib.auth import get_user_model
+
+    url = f'/news/{seed(args.comments).pk}/'
+    client = get_client()
+    # Анониму страницу отдал бы кеш ответов, не доходя до кеша ветки.
+    client.force_login(
+        get_user_model().objects.create_user(username='reader')
+    )
+
+    def cold():
+        caches[settings.COMMENTS_CACHE_ALIAS].clear()
+        client.get(url)
+
+    miss = measure(cold, repeat=args.repeat)
+    reset_stats()
+    hit = measure(lambda: client.get(url), repeat=args.repeat)
+    report({
+        'comments': args.comments,
+        'per_page': settings.COMMENTS_COUNT_ON_DETAIL_PAGE,
+        'miss': miss,
+        'hit': hit,
+        'cache_stats': cache_stats(),
+    })
+
+
+if __name__ == '__main__':
+    main()
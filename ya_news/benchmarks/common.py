@@ -0,0 +1,169 @@
+"""Общие помощники для бенчмарков проекта YaNews.
+
+Бенчмарки запускаются из каталога ya_news как модули::
+
+    python -m benchmarks.home_page --comments 10000
+
+Каждый из них работает на отдельной временной базе SQLite, поэтому
+рабочая db.sqlite3 не затрагивается.
+"""
+import gc
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+
+def setup_django(db_path=None):
+    """Настраивает Django на отдельную базу и применяет миграции."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanews.settings')
+    import django
+    from django.conf import settings
+
+    if db_path is None:
+        db_path = Path(tempfile.mkdtemp(prefix='yanews-bench-')) / 'bench.db'
+    settings.DATABASES['default']['NAME'] = str(db_path)
+    settings.DEBUG = False
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return db_path
+
+
+def get_client():
+    """Тестовый клиент с разрешённым в ALLOWED_HOSTS заголовком Host."""
+    from django.test import Client
+    return Client(HTTP_HOST='localhost')
+
+
+def percentile(samples, fraction):
+    """Перцентиль по отсортированной выборке (ближайший ранг)."""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Сводка по выборке длительностей в секундах, результат в мс."""
+    return {
+        'runs': len(samples),
+        'mean_ms': round(statistics.mean(samples) * 1000, 3),
+        'p50_ms': round(percentile(samples, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 3),
+    }
+
+
+def measure(func, repeat=50, warmup=3):
+    """Замеряет длительность вызова func и возвращает сводку."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def bulk_insert(model, objects, batch_size=5000):
+    """Вставляет объекты пачками внутри одной транзакции."""
+    from django.db import transaction
+
+    with transaction.atomic():
+        model.objects.bulk_create(objects, batch_size=batch_size)
+
+
+def calibrate(func, min_round=0.02):
+    """Число вызовов func, которое длится не меньше min_round секунд."""
+    number = 1
+    while time_call(func, number) * number < min_round:
+        number *= 2
+    return number
+
+
+def time_call(func, number):
+    """Среднее время вызова func за number повторов, без сборщика мусора."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        return (time.perf_counter() - start) / number
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def time_rounds(funcs, rounds=30):
+    """
+    Замеры времени одного вызова каждой функции по rounds раундам.
+
+    Раунды разных функций чередуются, поэтому медленный дрейф машины
+    (нагрев, соседние процессы) размазывается по всем функциям, а не
+    попадает целиком в замеры одной из них.
+    """
+    numbers = [calibrate(func) for func in funcs]
+    samples = [[] for _ in funcs]
+    for _ in range(rounds):
+        for func, number, func_samples in zip(funcs, numbers, samples):
+            func_samples.append(time_call(func, number))
+    return samples
+
+
+def peak_memory_kb(func):
+    """Пик памяти, выделенной Python за один вызов func, в КБ."""
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def mann_whitney_greater(samples, baseline):
+    """
+    p-value одностороннего критерия Манна — Уитни: samples больше baseline.
+
+    Нормальное приближение с поправкой на совпадения и непрерывность;
+    годится начиная примерно с десяти замеров в каждой выборке.
+    """
+    n1, n2 = len(samples), len(baseline)
+    pooled = sorted(
+        [(value, 0) for value in samples] + [(value, 1) for value in baseline]
+    )
+    ranks = [0.0] * len(pooled)
+    ties = 0
+    start = 0
+    while start < len(pooled):
+        end = start
+        while end + 1 < len(pooled) and pooled[end + 1][0] == pooled[start][0]:
+            end += 1
+        for index in range(start, end + 1):
+            ranks[index] = (start + end) / 2 + 1
+        size = end - start + 1
+        ties += size ** 3 - size
+        start = end + 1
+    u = sum(
+        rank for rank, (_, group) in zip(ranks, pooled) if group == 0
+    ) - n1 * (n1 + 1) / 2
+    total = n1 + n2
+    variance = n1 * n2 / 12 * ((total + 1) - ties / (total * (total - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(variance)
+    return math.erfc(z / math.sqrt(2)) / 2
+
+
+def report(result):
+    """Печатает результат бенчмарка в JSON."""
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write('\n')
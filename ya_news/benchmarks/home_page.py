@@ -0,0 +1,80 @@
+"""Время ответа главной страницы до и после денормализации счётчика.
+
+«До» — прежний путь: prefetch_related('comment_set') и подсчёт
+комментариев в шаблоне; «после» — текущий NewsList с News.comment_count.
+"""
+import argparse
+from datetime import timedelta
+
+from benchmarks.common import (
+    bulk_insert, get_client, measure, report, setup_django
+)
+
+LEGACY_TEMPLATE = '''
+{% for news in object_list %}
+  <h3>{{ news.title }}</h3>
+  <div>{{ news.text|truncatewords:15 }}</div>
+  {% if news.comment_set.all %}
+    Комментариев: {{ news.comment_set.count }}
+  {% endif %}
+{% endfor %}
+'''
+
+
+def seed(news_count, comments_per_news):
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+
+    from news.models import Comment, News, make_excerpt
+
+    author = get_user_model().objects.create_user(username='bench')
+    text = 'Текст новости. ' * 50
+    bulk_insert(News, [
+        News(title=f'Новость {i}', text=text, excerpt=make_excerpt(text))
+        for i in range(news_count)
+    ])
+    now = timezone.now()
+    for news in News.objects.all():
+        bulk_insert(Comment, [
+            Comment(
+                news=news, author=author, text=f'Комментарий {i}',
+                created=now + timedelta(seconds=i)
+            )
+            for i in range(comments_per_news)
+        ])
+    News.objects.refresh_comment_counts()
+
+
+def legacy_home():
+    from django.conf import settings
+    from django.template import engines
+
+    from news.models import News
+
+    template = engines['django'].from_string(LEGACY_TEMPLATE)
+    object_list = News.objects.prefetch_related(
+        'comment_set'
+    )[:settings.NEWS_COUNT_ON_HOME_PAGE]
+    return template.render({'object_list': object_list})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--news', type=int, default=10)
+    parser.add_argument('--comments', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    seed(args.news, args.comments)
+    client = get_client()
+    report({
+        'news': args.news,
+        'comments_per_news': args.comments,
+        'before': measure(legacy_home, repeat=args.repeat),
+        'after': measure(lambda: client.get('/'), repeat=args.repeat),
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Нагрузочный прогон YaNews по сценариям пользователей.
+
+Виртуальные пользователи повторяют сценарий: лента, новость, вход,
+комментарий, его правка и удаление, выход. Параметры прогона, транспорт
+и отчёт — общие для проектов, см. loadtest в корне репозитория.
+"""
+import re
+from functools import partial
+
+from benchmarks.common import setup_django
+from loadtest import PASSWORD, JourneyError, arguments, configure, execute
+
+
+def journey(browser, rng, username, news_ids):
+    browser.get('/')
+    news_url = f'/news/{rng.choice(news_ids)}/'
+    browser.get(news_url)
+    browser.get('/auth/login/')
+    browser.post(
+        '/auth/login/', {'username': username, 'password': PASSWORD}
+    )
+    response = browser.post(news_url, {'text': f'Комментарий {username}'})
+    page = browser.get(response.location)
+    comment_ids = re.findall(r'/edit_comment/(\d+)/', page.text)
+    if not comment_ids:
+        raise JourneyError('Комментарий не найден на странице.')
+    comment_id = max(map(int, comment_ids))
+    browser.get(f'/edit_comment/{comment_id}/')
+    browser.post(
+        f'/edit_comment/{comment_id}/', {'text': 'Исправленный комментарий'}
+    )
+    browser.get(f'/delete_comment/{comment_id}/')
+    browser.post(f'/delete_comment/{comment_id}/', {})
+    browser.get('/auth/logout/')
+
+
+def seed(users, news_count, comments_per_news):
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+
+    from benchmarks.home_page import seed as seed_news
+    from news.models import News
+
+    seed_news(news_count, comments_per_news)
+    password = make_password(PASSWORD)
+    User = get_user_model()
+    User.objects.bulk_create([
+        User(username=f'load{number}', password=password)
+        for number in range(users)
+    ])
+    return list(News.objects.values_list('pk', flat=True))
+
+
+def main():
+    parser = arguments(__doc__)
+    parser.add_argument('--news', type=int, default=100)
+    parser.add_argument('--comments', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    configure(args, 'yanews.queries')
+    news_ids = seed(args.users, args.news, args.comments)
+
+    from yanews.wsgi import application
+
+    execute('yanews', application, args, partial(journey, news_ids=news_ids))
+
+
+if __name__ == '__main__':
+    main()
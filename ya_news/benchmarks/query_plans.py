@@ -0,0 +1,98 @@
+"""Планы запросов и задержки горячих путей на большом объёме данных.
+
+По умолчанию наполняет базу 100 000 новостей и 1 000 000 комментариев
+командой generate_dataset (с фиксированным seed), затем для каждого
+представления записывает EXPLAIN QUERY PLAN его запросов и время их
+выполнения. Результат можно сохранить через --output и сравнивать
+между коммитами.
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.common import get_client, measure, report, setup_django
+
+
+def seed(news_count, comment_count, user_count, seed):
+    from django.core.management import call_command
+
+    call_command(
+        'generate_dataset', news=news_count, comments=comment_count,
+        users=user_count, seed=seed, stdout=sys.stderr,
+    )
+
+
+def query_shapes():
+    """Запросы представлений news в том виде, в каком их строит ORM."""
+    from django.conf import settings
+    from django.db.models import Count
+
+    from news.models import Comment, News
+    from news.pagination import after, before
+
+    per_page = settings.COMMENTS_COUNT_ON_DETAIL_PAGE
+    hot = News.objects.order_by('-comment_count').first()
+    author_id = Comment.objects.values('author').annotate(
+        total=Count('pk')
+    ).order_by('-total').values_list('author', flat=True).first()
+    # Курсоры у самых старых комментариев: худший случай для OFFSET и
+    # для условий, которые индекс не может использовать как диапазон.
+    deep = hot.comment_set.order_by('created', 'pk')[per_page]
+    comments = Comment.objects.filter(news=hot).select_related('author')
+    return hot, {
+        'NewsList': News.objects.all()[:settings.NEWS_COUNT_ON_HOME_PAGE],
+        'NewsDetail.first_page': comments.order_by(
+            'created', 'pk'
+        )[:per_page + 1],
+        'NewsDetail.deep_page': comments.filter(
+            before(deep.created, deep.pk)
+        ).order_by('-created', '-pk')[:per_page + 1],
+        'NewsDetail.next_page': comments.filter(
+            after(deep.created, deep.pk)
+        ).order_by('created', 'pk')[:per_page + 1],
+        'CommentBase.get_queryset': Comment.objects.filter(
+            author_id=author_id, pk=deep.pk
+        ),
+        'CommentBase.author_comments': Comment.objects.filter(
+            author_id=author_id
+        ).order_by('created')[:per_page],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--news', type=int, default=100000)
+    parser.add_argument('--comments', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--output', help='Файл для сохранения JSON.')
+    args = parser.parse_args()
+
+    setup_django()
+    seed(args.news, args.comments, args.users, args.seed)
+    hot, queries = query_shapes()
+    result = {
+        'news': args.news, 'comments': args.comments, 'seed': args.seed,
+        'queries': {}, 'views': {},
+    }
+    for name, queryset in queries.items():
+        result['queries'][name] = {
+            'plan': queryset.explain().splitlines(),
+            'latency': measure(
+                lambda: list(queryset.all()), repeat=args.repeat
+            ),
+        }
+    client = get_client()
+    for name, url in (('home', '/'), ('detail', f'/news/{hot.pk}/')):
+        result['views'][name] = measure(
+            lambda: client.get(url), repeat=args.repeat
+        )
+    report(result)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(result, output, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
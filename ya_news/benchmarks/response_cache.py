@@ -0,0 +1,50 @@
+"""Время ответа анонимам с кешем готовых страниц и без него.
+
+Для каждой страницы «промах» — запрос после очистки кешей, «попадание»
+— повторный запрос той же страницы.
+"""
+import argparse
+
+from benchmarks.common import get_client, measure, report, setup_django
+from benchmarks.home_page import seed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--news', type=int, default=10)
+    parser.add_argument('--comments', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.cache import caches
+
+    from news.models import News
+
+    seed(args.news, args.comments)
+    client = get_client()
+    pages = {
+        'home': '/',
+        'detail': f'/news/{News.objects.first().pk}/',
+    }
+
+    def cold(url):
+        for cache in caches.all():
+            cache.clear()
+        client.get(url)
+
+    results = {}
+    for name, url in pages.items():
+        results[name] = {
+            'miss': measure(lambda: cold(url), repeat=args.repeat),
+            'hit': measure(lambda: client.get(url), repeat=args.repeat),
+        }
+    report({
+        'news': args.news,
+        'comments_per_news': args.comments,
+        **results,
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Задержка полнотекстового поиска новостей на большом индексе.
+
+Наполняет базу командой generate_dataset (по умолчанию 1 000 000
+новостей без комментариев) и замеряет search_news для редких и частых
+слов, а также полный ответ страницы поиска.
+"""
+import argparse
+import sys
+
+from benchmarks.common import get_client, measure, report, setup_django
+
+QUERIES = {
+    'rare': 'уникальный',
+    'common': 'новость',
+    'two_words': 'жители погода',
+    'prefix_miss': 'несуществующееслово',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--news', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+
+    from news.models import News
+    from news.search import search_news
+
+    call_command(
+        'generate_dataset', news=args.news, comments=0, users=1,
+        seed=args.seed, stdout=sys.stderr,
+    )
+    # Несколько документов с редким словом, как у настоящих запросов.
+    News.objects.bulk_create(
+        News(title='Уникальный случай', text='Текст') for _ in range(10)
+    )
+    client = get_client()
+    report({
+        'documents': News.objects.count(),
+        'search_news': {
+            name: measure(lambda: search_news(query), repeat=args.repeat)
+            for name, query in QUERIES.items()
+        },
+        'view': {
+            name: measure(
+                lambda: client.get('/search/', {'q': query}),
+                repeat=args.repeat,
+            )
+            for name, query in QUERIES.items()
+        },
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Чтение страницы комментариев во время непрерывной записи комментариев.
+
+--readers процессов (отдельных, чтобы GIL не скрывал ожидание
+блокировок) в течение --seconds читают первую страницу комментариев
+случайной новости, а писатель всё это время пишет комментарии пачками
+по --write-batch в транзакции, как импорт или отложенная запись
+комментариев.
+Сравниваются стандартный бэкенд django.db.backends.sqlite3 (журнал
+отката, настройки SQLite по умолчанию) и yanews.sqlite с прагмами по
+умолчанию; каждый режим работает в своём процессе на своей базе.
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.common import report, summarize
+
+ENGINES = {
+    'default': 'django.db.backends.sqlite3',
+    'tuned': 'yanews.sqlite',
+}
+
+
+def configure(mode):
+    """Настраивает Django на выбранный бэкенд до первого соединения."""
+    import os
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanews.settings')
+    from django.conf import settings
+
+    database = settings.DATABASES['default']
+    database['ENGINE'] = ENGINES[mode]
+    if mode == 'default':
+        database['OPTIONS'] = {}
+
+
+def read_pages(args, news_ids, seed, results):
+    from django.db import OperationalError, connection
+
+    from news.models import Comment
+
+    # Соединение родителя дочернему процессу не годится.
+    connection.close()
+    rng = random.Random(seed)
+    latencies, errors = [], 0
+    deadline = time.monotonic() + args.seconds
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            list(Comment.objects.filter(
+                news_id=rng.choice(news_ids)
+            ).select_related('author')[:50])
+        except OperationalError:
+            errors += 1
+        else:
+            latencies.append(time.perf_counter() - start)
+    results.put((latencies, errors))
+
+
+def write_batches(args, news_ids, author, stop, stats):
+    from django.db import OperationalError, connection, transaction
+
+    from news.models import Comment
+
+    rng = random.Random(-1)
+    text = 'Комментарий во время чтения. ' * (args.text_size // 29 + 1)
+    while not stop.is_set():
+        try:
+            with transaction.atomic():
+                Comment.objects.bulk_create([
+                    Comment(
+                        news_id=rng.choice(news_ids), author=author,
+                        text=text,
+                    )
+                    for _ in range(args.write_batch)
+                ])
+        except OperationalError:
+            stats['write_errors'] += 1
+        else:
+            stats['writes'] += args.write_batch
+    connection.close()
+
+
+def run_mode(args):
+    from benchmarks.common import setup_django
+    from benchmarks.home_page import seed
+
+    configure(args.mode)
+    setup_django()
+    seed(args.news, args.comments)
+
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+
+    from news.models import News
+
+    author = get_user_model().objects.get()
+    news_ids = list(News.objects.values_list('pk', flat=True))
+    connection.close()
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    readers = [
+        context.Process(
+            target=read_pages, args=(args, news_ids, number, results)
+        )
+        for number in range(args.readers)
+    ]
+    for process in readers:
+        process.start()
+    stop = threading.Event()
+    stats = {'writes': 0, 'write_errors': 0}
+    writer = threading.Thread(
+        target=write_batches, args=(args, news_ids, author, stop, stats)
+    )
+    writer.start()
+    latencies, read_errors = [], 0
+    for _ in readers:
+        reader_latencies, reader_errors = results.get()
+        latencies.extend(reader_latencies)
+        read_errors += reader_errors
+    stop.set()
+    writer.join()
+    for process in readers:
+        process.join()
+    json.dump({
+        'reads_per_s': round(len(latencies) / args.seconds, 1),
+        'writes_per_s': round(stats['writes'] / args.seconds, 1),
+        'read_errors': read_errors,
+        'write_errors': stats['write_errors'],
+        'read': summarize(latencies) if latencies else None,
+    }, sys.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-batch', type=int, default=500)
+    parser.add_argument('--text-size', type=int, default=1000)
+    parser.add_argument('--news', type=int, default=100)
+    parser.add_argument('--comments', type=int, default=200)
+    parser.add_argument('--mode', choices=tuple(ENGINES))
+    args = parser.parse_args()
+    if args.mode:
+        return run_mode(args)
+
+    results = {}
+    for mode in ENGINES:
+        child = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.sqlite_concurrency',
+             '--mode', mode, *sys.argv[1:]],
+            check=True, stdout=subprocess.PIPE,
+        )
+        results[mode] = json.loads(child.stdout)
+    report({
+        'readers': args.readers,
+        'seconds': args.seconds,
+        **results,
+    })
+
+
+if __name__ == '__main__':
+    main()
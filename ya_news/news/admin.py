@@ -1,15 +1,81 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.forms.models import BaseInlineFormSet
 
 from .models import Comment, News
+from .search import filter_news
+
+
+class CommentPageFormSet(BaseInlineFormSet):
+    """
+    Формы комментариев новости только для одной страницы.
+
+    Комментарии читаются из шарда новости; номер страницы берётся из
+    параметра page_param адреса страницы новости в админке.
+    """
+    per_page = 20
+    page_param = 'comments_page'
+    query = None
+
+    def __init__(self, *args, instance=None, queryset=None, **kwargs):
+        if instance is not None and instance.pk is not None:
+            queryset = Comment.objects.for_news(instance)
+        self.page = None
+        super().__init__(
+            *args, instance=instance, queryset=queryset, **kwargs
+        )
+
+    def get_queryset(self):
+        if self.page is None:
+            paginator = Paginator(super().get_queryset(), self.per_page)
+            number = (self.query or {}).get(self.page_param)
+            self.page = paginator.get_page(number)
+            self._queryset = self.page.object_list
+        return self._queryset
+
+    def page_query(self, number):
+        query = self.query.copy()
+        query[self.page_param] = number
+        return '?' + query.urlencode()
+
+    @property
+    def previous_page_query(self):
+        return self.page_query(self.page.previous_page_number())
+
+    @property
+    def next_page_query(self):
+        return self.page_query(self.page.next_page_number())
 
 
 class CommentInline(admin.StackedInline):
     model = Comment
     extra = 0
+    formset = CommentPageFormSet
+    # Выпадающий список всех пользователей в каждой форме слишком
+    # тяжёл: автор вводится по id.
+    raw_id_fields = ('author',)
+    template = 'admin/news/comment_inline.html'
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.query = request.GET
+        return formset
 
 
 @admin.register(News)
 class NewsAdmin(admin.ModelAdmin):
+    # Число комментариев хранится в самой новости, поэтому список не
+    # соединяется с таблицей комментариев.
+    list_display = ('title', 'date', 'comment_count')
+    list_filter = ('date',)
+    # Поиск идёт по индексу FTS5 (get_search_results), а не LIKE по
+    # этим полям; search_fields только включает поле поиска.
+    search_fields = ('title', 'text')
+    # Полный COUNT(*) таблицы на каждой странице списка не нужен.
+    show_full_result_count = False
     inlines = [
         CommentInline,
     ]
+
+    def get_search_results(self, request, queryset, search_term):
+        return filter_news(queryset, search_term), False
@@ -0,0 +1,136 @@
+"""
+Асинхронные варианты NewsList, NewsDetail и NewsDetailView для ASGI.
+
+Запросы к базе выполняются в отдельном пуле потоков ограниченного
+размера (NEWS_ASYNC_DB_WORKERS), а не в единственном потоке
+sync_to_async(thread_sensitive=True): пока одни запросы ждут базу,
+другие уже отрисовывают шаблоны. Страница собирается теми же
+методами, что и в синхронных view, и отрисовывается там же, в пуле:
+цикл событий только раздаёт запросы.
+"""
+import asyncio
+import contextvars
+from calendar import timegm
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views import generic
+from yanews.middleware import collect_queries
+
+from .conditional import (
+    news_detail_etag, news_detail_last_modified, news_list_etag,
+    news_list_last_modified
+)
+from .views import NewsComment, NewsDetail, NewsDetailView, NewsList
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.NEWS_ASYNC_DB_WORKERS,
+    thread_name_prefix='news-db',
+)
+
+
+def _in_db_thread(func, *args):
+    # Потоки пула живут дольше запроса, поэтому соединения в них
+    # закрываются по тем же правилам (CONN_MAX_AGE), что и в конце
+    # обычного запроса.
+    close_old_connections()
+    try:
+        with collect_queries():
+            return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_db(func, *args):
+    """Выполняет func в пуле потоков базы с контекстом текущего запроса."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, context.run, _in_db_thread, func, *args
+    )
+
+
+class AsyncViewMixin:
+    """
+    Делает класс-view асинхронным.
+
+    Django 3.2 решает, async ли view, по функции из as_view(), а не по
+    методам класса. Декоратор condition у синхронных view с корутинами
+    не работает, поэтому dispatch берётся исходный, а условный GET
+    проверяется в build_response().
+    """
+    dispatch = generic.View.dispatch
+    etag_func = None
+    last_modified_func = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view._is_coroutine = asyncio.coroutines._is_coroutine
+        return view
+
+    async def options(self, request, *args, **kwargs):
+        return super().options(request, *args, **kwargs)
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        return super().http_method_not_allowed(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        return await run_db(self.build_response, request, kwargs)
+
+    def build_response(self, request, kwargs):
+        """
+        Проверка валидаторов, выборка данных и отрисовка одним заходом
+        в пул: каждый переход между потоками стоит дороже самой работы.
+        """
+        etag = self.etag_func(request, **kwargs)
+        last_modified = self.last_modified_func(request, **kwargs)
+        etag = etag and quote_etag(etag)
+        last_modified = last_modified and timegm(
+            last_modified.utctimetuple()
+        )
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = self.render_to_response(self.load_context())
+            response.render()
+        # Как condition: валидаторы отдаются и с ответом 304.
+        if etag and not response.has_header('ETag'):
+            response['ETag'] = etag
+        if last_modified and not response.has_header('Last-Modified'):
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class AsyncNewsList(AsyncViewMixin, NewsList):
+    etag_func = staticmethod(news_list_etag)
+    last_modified_func = staticmethod(news_list_last_modified)
+
+    def load_context(self):
+        self.object_list = self.get_queryset()
+        return self.get_context_data()
+
+
+class AsyncNewsDetail(AsyncViewMixin, NewsDetail):
+    etag_func = staticmethod(news_detail_etag)
+    last_modified_func = staticmethod(news_detail_last_modified)
+
+    def load_context(self):
+        self.object = self.get_object()
+        return self.get_context_data(object=self.object)
+
+
+class AsyncNewsDetailView(AsyncViewMixin, NewsDetailView):
+    """Чтение — асинхронно, публикация комментария — прежним view."""
+
+    async def get(self, request, *args, **kwargs):
+        return await AsyncNewsDetail.as_view()(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(NewsComment.as_view())(
+            request, *args, **kwargs
+        )
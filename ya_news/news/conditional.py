@@ -0,0 +1,107 @@
+"""
+Валидаторы для условных GET-запросов к ленте и странице новости.
+
+Каждый валидатор строится одним лёгким запросом без текстов новостей
+и комментариев и кешируется на объекте запроса, чтобы etag_func и
+last_modified_func декоратора condition не ходили в базу дважды.
+"""
+import hashlib
+
+from django.conf import settings
+from django.middleware.csrf import get_token
+
+from .ingest import get_writer
+from .models import News
+
+
+def _memoize(request, name, build):
+    validators = request.__dict__.setdefault('_news_validators', {})
+    if name not in validators:
+        validators[name] = build()
+    return validators[name]
+
+
+def _etag(request, *parts):
+    """
+    Значение ETag от состояния данных и пользователя.
+
+    Страница зависит от пользователя (ссылки на правку, форма, шапка),
+    поэтому его идентификатор входит в тег. Вошедшему пользователю
+    форма отдаётся с токеном CSRF, а повторный вход меняет и сессию,
+    и токен: без ключа сессии и cookie CSRF в теге браузер получил бы
+    304 и отправил бы форму со старым токеном. get_token() заводит
+    секрет CSRF уже здесь, если cookie ещё нет, — тот же, что попадёт
+    в форму.
+    """
+    session = None
+    if request.user.is_authenticated:
+        get_token(request)
+        session = (
+            request.session.session_key, request.META['CSRF_COOKIE']
+        )
+    raw = repr((
+        request.user.pk, session, request.get_full_path(), parts
+    ))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _last_modified(request, modified):
+    """
+    Last-Modified отдаём только анонимам: дата не отражает смену
+    пользователя, а ETag от неё учитывает.
+    """
+    if request.user.is_authenticated:
+        return None
+    return modified
+
+
+def news_list_state(request):
+    return _memoize(request, 'list', lambda: list(
+        News.objects.values_list(
+            'pk', 'modified', 'comment_count'
+        )[:settings.NEWS_COUNT_ON_HOME_PAGE]
+    ))
+
+
+def news_list_etag(request, *args, **kwargs):
+    return _etag(request, news_list_state(request))
+
+
+def news_list_last_modified(request, *args, **kwargs):
+    rows = news_list_state(request)
+    if not rows:
+        return None
+    return _last_modified(request, max(modified for _, modified, _ in rows))
+
+
+def news_detail_state(request, pk):
+    return _memoize(request, f'detail:{pk}', lambda: News.objects.filter(
+        pk=pk
+    ).values_list('modified', 'comment_count').first())
+
+
+def pending_comments(request, pk):
+    """
+    Сколько комментариев автора к новости ждут отложенной записи.
+
+    Страница показывает их автору сразу, а в comment_count они попадут
+    только после записи: без них в теге автор получил бы 304 на
+    страницу без своего комментария.
+    """
+    if not (settings.COMMENTS_WRITE_BEHIND and request.user.is_authenticated):
+        return 0
+    return len(get_writer().pending_for(pk, request.user.pk))
+
+
+def news_detail_etag(request, pk, *args, **kwargs):
+    state = news_detail_state(request, pk)
+    if state is None:
+        return None
+    return _etag(request, pk, state, pending_comments(request, pk))
+
+
+def news_detail_last_modified(request, pk, *args, **kwargs):
+    state = news_detail_state(request, pk)
+    if state is None:
+        return None
+    return _last_modified(request, state[0])
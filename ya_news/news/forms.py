@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.forms import ModelForm
 from django.core.exceptions import ValidationError
 
 from .models import Comment
+from .moderation import BadWordsMatcher, load_words
 
 BAD_WORDS = (
     'редиска',
@@ -10,6 +12,15 @@ BAD_WORDS = (
 )
 WARNING = 'Не ругайтесь!'
 
+bad_words = BadWordsMatcher(
+    BAD_WORDS + tuple(
+        load_words(settings.BAD_WORDS_FILE) if settings.BAD_WORDS_FILE
+        else ()
+    ),
+    lookalikes=settings.BAD_WORDS_LOOKALIKES,
+    whole_words=settings.BAD_WORDS_WHOLE_WORDS,
+)
+
 
 class CommentForm(ModelForm):
 
@@ -20,8 +31,6 @@ class CommentForm(ModelForm):
     def clean_text(self):
         """Не позволяем ругаться в комментариях."""
         text = self.cleaned_data['text']
-        lowered_text = text.lower()
-        for word in BAD_WORDS:
-            if word in lowered_text:
-                raise ValidationError(WARNING)
+        if text in bad_words:
+            raise ValidationError(WARNING)
         return text
@@ -0,0 +1,136 @@
+"""
+Кеш отрисованной ветки комментариев на странице новости.
+
+В кеше лежит страница комментариев с готовым HTML каждого комментария
+(автор, дата, текст после linebreaksbr). Ключ страницы содержит версию
+ветки: сигналы меняют её при любой записи комментариев новости, и
+старые страницы перестают читаться. Ссылки на правку и удаление
+зависят от пользователя, поэтому шаблон дорисовывает их поверх кеша.
+
+Кеш — COMMENTS_CACHE_ALIAS, общий для процессов: с кешем в памяти
+процесса запись в одном процессе не сбрасывала бы ветку в остальных.
+"""
+import hashlib
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.template.loader import get_template
+from django.utils import timezone, translation
+from yanews.replicas import replica_synced_at
+
+from .models import Comment
+from .pagination import paginate_comments
+
+RenderedComment = namedtuple('RenderedComment', 'pk author_id html')
+
+STATS_KEYS = {
+    'hits': 'news:comments:hits',
+    'misses': 'news:comments:misses',
+}
+
+
+def _cache():
+    return caches[settings.COMMENTS_CACHE_ALIAS]
+
+
+def _version_key(news_id):
+    return f'news:{news_id}:comments:version'
+
+
+def thread_version(news_id):
+    """Текущая версия ветки; появляется при первом обращении."""
+    cache, key = _cache(), _version_key(news_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(news_ids):
+    _cache().set_many(
+        {_version_key(pk): uuid.uuid4().hex for pk in news_ids},
+        timeout=None,
+    )
+
+
+def invalidate_threads(news_ids):
+    """
+    Сбрасывает кеш веток комментариев указанных новостей.
+
+    Версия меняется сразу и ещё раз после коммита: иначе страница,
+    прочитанная до коммита, могла бы попасть в кеш под новой версией.
+    """
+    news_ids = list(news_ids)
+    _bump(news_ids)
+    transaction.on_commit(lambda: _bump(news_ids))
+
+
+def _count(name):
+    cache, key = _cache(), STATS_KEYS[name]
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def cache_stats():
+    """Попадания и промахи кеша веток с момента последнего сброса."""
+    cache = _cache()
+    stats = {name: cache.get(key, 0) for name, key in STATS_KEYS.items()}
+    total = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / total if total else None
+    return stats
+
+
+def reset_stats():
+    _cache().delete_many(STATS_KEYS.values())
+
+
+def _page_key(news_id, per_page, after_cursor, before_cursor):
+    # Курсоры приходят из запроса как есть, поэтому в ключ идёт хеш.
+    # Страницы, прочитанные с копии базы, хранятся отдельно для
+    # каждого её снимка: версия ветки меняется при записи, а копия
+    # получает запись только при следующей синхронизации.
+    variant = repr((
+        per_page, after_cursor, before_cursor,
+        translation.get_language(), timezone.get_current_timezone_name(),
+        replica_synced_at(),
+    ))
+    return 'news:{}:comments:{}:{}'.format(
+        news_id, thread_version(news_id),
+        hashlib.md5(variant.encode()).hexdigest(),
+    )
+
+
+def comment_thread(news, per_page, after_cursor=None, before_cursor=None):
+    """
+    Страница комментариев новости из кеша или из базы.
+
+    Возвращает CommentPage, в котором вместо комментариев лежат
+    RenderedComment с готовым HTML.
+    """
+    key = _page_key(news.pk, per_page, after_cursor, before_cursor)
+    cache = _cache()
+    page = cache.get(key)
+    if page is not None:
+        _count('hits')
+        return page
+    _count('misses')
+    page = paginate_comments(
+        Comment.objects.for_news(news).with_related('author'), per_page,
+        after_cursor=after_cursor, before_cursor=before_cursor,
+    )
+    template = get_template('includes/comment.html')
+    page.object_list = [
+        RenderedComment(
+            comment.pk, comment.author_id,
+            template.render({'comment': comment}),
+        )
+        for comment in page
+    ]
+    cache.set(key, page, settings.COMMENTS_CACHE_TIMEOUT)
+    return page
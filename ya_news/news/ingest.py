@@ -0,0 +1,150 @@
+"""
+Отложенная запись комментариев (write-behind).
+
+При COMMENTS_WRITE_BEHIND проверенные формой комментарии не
+сохраняются в запросе, а попадают в очередь процесса. Фоновый поток
+забирает их пачками (до COMMENTS_WRITE_BEHIND_BATCH штук или по
+истечении COMMENTS_WRITE_BEHIND_INTERVAL секунд) и пишет одним
+bulk_create в короткой транзакции (по одной на шард, см. news.shards),
+так что SQLite берёт блокировку записи один раз на пачку, а не на
+каждый комментарий.
+
+Надёжность: комментарий, который ещё в очереди, живёт только в памяти
+процесса. При штатной остановке очередь дописывается (atexit), при
+падении процесса — теряется. Если запись пачки не удалась после
+нескольких попыток, комментарии пишутся в лог news.ingest и
+отбрасываются. Пока комментарий не записан, его видит только автор и
+только в том же процессе.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, transaction
+
+from .models import Comment
+from .shards import group_by_shard
+from .signals import comments_bulk_changed
+
+logger = logging.getLogger('news.ingest')
+
+RETRIES = 3
+
+
+class CommentWriter:
+    """Очередь комментариев и фоновый поток, который их записывает."""
+
+    def __init__(self, batch_size, interval, max_pending):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, comment):
+        """
+        Ставит комментарий в очередь.
+
+        Переполненная очередь даёт queue.Full: вызывающий код может
+        сохранить комментарий сам.
+        """
+        key = (comment.news_id, comment.author_id)
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name='comment-writer', daemon=True
+                )
+                self.thread.start()
+            self.queue.put_nowait(comment)
+            self.pending.setdefault(key, []).append(comment)
+
+    def pending_for(self, news_id, author_id):
+        """Незаписанные комментарии автора к новости."""
+        with self.lock:
+            return list(self.pending.get((news_id, author_id), ()))
+
+    def flush(self):
+        """Ждёт, пока всё поставленное в очередь будет записано."""
+        if self.thread is not None:
+            self.queue.join()
+
+    def next_batch(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.next_batch()
+            try:
+                self.write(batch)
+            except Exception:
+                logger.exception(
+                    'Не записаны комментарии: %s',
+                    [(c.news_id, c.author_id, c.text) for c in batch],
+                )
+            finally:
+                self.release(batch)
+                for _ in batch:
+                    self.queue.task_done()
+
+    def write(self, batch):
+        close_old_connections()
+        for alias, comments in group_by_shard(batch).items():
+            self.write_shard(alias, comments)
+        comments_bulk_changed.send(
+            sender=Comment, news_ids={comment.news_id for comment in batch}
+        )
+
+    @staticmethod
+    def write_shard(alias, comments):
+        for attempt in range(RETRIES):
+            try:
+                with transaction.atomic(using=alias):
+                    Comment.objects.using(alias).bulk_create(comments)
+                break
+            except OperationalError:
+                # База занята другим писателем: ждём и пробуем снова.
+                if attempt == RETRIES - 1:
+                    raise
+                time.sleep(0.1 * 2 ** attempt)
+
+    def release(self, batch):
+        with self.lock:
+            for comment in batch:
+                key = (comment.news_id, comment.author_id)
+                waiting = self.pending.get(key, [])
+                if comment in waiting:
+                    waiting.remove(comment)
+                if not waiting:
+                    self.pending.pop(key, None)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Общий для процесса CommentWriter с параметрами из настроек."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = CommentWriter(
+                settings.COMMENTS_WRITE_BEHIND_BATCH,
+                settings.COMMENTS_WRITE_BEHIND_INTERVAL,
+                settings.COMMENTS_WRITE_BEHIND_MAX_PENDING,
+            )
+            atexit.register(_writer.flush)
+        return _writer
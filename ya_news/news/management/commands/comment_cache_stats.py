@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from news.fragments import cache_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает попадания и промахи кеша веток комментариев. '
+        'Счётчики хранятся в кеше COMMENTS_CACHE_ALIAS и видны всем '
+        'процессам; файловый кеш увеличивает их без блокировки, поэтому '
+        'при одновременных запросах часть отсчётов теряется.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счётчики после вывода.'
+        )
+
+    def handle(self, *args, **options):
+        stats = cache_stats()
+        rate = stats['hit_rate']
+        self.stdout.write(
+            f'Попаданий: {stats["hits"]}, промахов: {stats["misses"]}, '
+            'доля попаданий: '
+            + ('—' if rate is None else f'{rate:.1%}')
+        )
+        if options['reset']:
+            reset_stats()
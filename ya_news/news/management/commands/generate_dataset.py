@@ -0,0 +1,202 @@
+import random
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from news.models import Comment, News, make_excerpt
+
+WORDS = (
+    'новость', 'город', 'проект', 'блог', 'сегодня', 'первый', 'жители',
+    'погода', 'сообщили', 'конкурс', 'интернет', 'команда', 'выпуск',
+    'рекорд', 'неделя', 'событие', 'участники', 'результат', 'мир', 'спорт',
+)
+TEXT_POOL_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует воспроизводимый набор пользователей, новостей и '
+        'комментариев для нагрузочного тестирования. Комментарии '
+        'распределены по новостям по закону Ципфа.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--news', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=1000000)
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель распределения комментариев по новостям; '
+                 '0 — равномерно, больше — сильнее перекос в «горячие».'
+        )
+        parser.add_argument(
+            '--text-words', type=int, default=30,
+            help='Средняя длина комментария в словах.'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--prefix',
+            help='Префикс имён пользователей; по умолчанию load<seed>_. '
+                 'Пользователи с таким префиксом не должны существовать.'
+        )
+        parser.add_argument('--batch-size', type=int, default=20000)
+        parser.add_argument(
+            '--keep-indexes', action='store_true',
+            help='Не снимать индексы комментариев на время загрузки. '
+                 'По умолчанию они пересоздаются после вставки: '
+                 'построить индекс заново быстрее, чем поддерживать его '
+                 'при вставке строк в случайные места.'
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        user_ids = self.create_users(
+            options['users'], options['prefix'] or f"load{options['seed']}_"
+        )
+        news_ids = self.create_news(options['news'])
+        indexes = () if options['keep_indexes'] else Comment._meta.indexes
+        self.alter_indexes(indexes, 'remove_index')
+        try:
+            self.create_comments(
+                options['comments'], news_ids, user_ids,
+                options['zipf'], options['text_words'],
+            )
+        finally:
+            self.alter_indexes(indexes, 'add_index')
+        if settings.COMMENT_SHARDS:
+            # Строки вставляются напрямую в default; по шардам их
+            # раскладывает обычный перенос.
+            call_command('reshard_comments', stdout=self.stdout)
+        if news_ids:
+            News.objects.filter(
+                pk__gte=min(news_ids)
+            ).refresh_comment_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(user_ids)}, новостей: {len(news_ids)}, '
+            f'комментариев: {options["comments"]}'
+        ))
+
+    def alter_indexes(self, indexes, operation):
+        if not indexes:
+            return
+        with connection.schema_editor() as schema_editor:
+            for index in indexes:
+                getattr(schema_editor, operation)(Comment, index)
+
+    def text(self, words):
+        return ' '.join(self.rng.choices(WORDS, k=max(1, words))).capitalize()
+
+    def text_pool(self, mean_words):
+        """
+        Заранее собранные тексты с логнормальной длиной.
+
+        Генерировать текст для каждой из миллионов строк слишком дорого.
+        """
+        return [
+            self.text(round(self.rng.lognormvariate(0, 0.75) * mean_words))
+            for _ in range(TEXT_POOL_SIZE)
+        ]
+
+    def insert(self, model, objects):
+        with transaction.atomic():
+            model.objects.bulk_create(objects)
+
+    def insert_rows(self, model, field_names, rows):
+        """
+        Вставка готовых кортежей одним executemany.
+
+        Для миллионов комментариев подготовка значений в bulk_create
+        занимает большую часть времени, поэтому значения сразу
+        собираются в том виде, в котором их хранит база.
+        """
+        columns = [model._meta.get_field(name).column for name in field_names]
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(model._meta.db_table),
+            ', '.join(map(connection.ops.quote_name, columns)),
+            ', '.join(['%s'] * len(columns)),
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+
+    def create_users(self, count, prefix):
+        User = get_user_model()
+        # Хешировать пароль для каждого пользователя слишком долго.
+        password = make_password(None)
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {prefix!r} уже есть: удалите их '
+                'или задайте другой --prefix.'
+            )
+        for start in range(0, count, self.batch_size):
+            self.insert(User, [
+                User(username=f'{prefix}{number}', password=password)
+                for number in range(start, min(count, start + self.batch_size))
+            ])
+        return list(User.objects.filter(
+            username__startswith=prefix
+        ).values_list('pk', flat=True))
+
+    def create_news(self, count):
+        first_pk = News.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        texts = [(text, make_excerpt(text)) for text in self.text_pool(150)]
+        start_date = date.today() - timedelta(days=3 * 365)
+
+        def build():
+            title = self.text(4)[:50]
+            text, excerpt = self.rng.choice(texts)
+            return News(
+                title=title,
+                text=text,
+                excerpt=excerpt,
+                date=start_date + timedelta(days=self.rng.randrange(3 * 365)),
+            )
+
+        for start in range(0, count, self.batch_size):
+            self.insert(News, [
+                build()
+                for _ in range(start, min(count, start + self.batch_size))
+            ])
+        return list(News.objects.filter(
+            pk__gt=first_pk
+        ).values_list('pk', flat=True))
+
+    def create_comments(self, count, news_ids, user_ids, zipf, text_words):
+        if not news_ids or not user_ids:
+            return
+        # Ранги «популярности» назначаются новостям в случайном порядке,
+        # чтобы горячие новости не совпадали с первыми id.
+        ranked = news_ids[:]
+        self.rng.shuffle(ranked)
+        weights = list(accumulate(
+            1 / rank ** zipf for rank in range(1, len(ranked) + 1)
+        ))
+        texts = self.text_pool(text_words)
+        period = 3 * 365 * 24 * 3600
+        # Время хранится в UTC без часового пояса, как его пишет Django.
+        since = datetime.utcnow() - timedelta(seconds=period)
+        for start in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - start)
+            targets = self.rng.choices(ranked, cum_weights=weights, k=size)
+            self.insert_rows(
+                Comment, ('news', 'author', 'text', 'created'), [
+                    (
+                        news_id,
+                        self.rng.choice(user_ids),
+                        self.rng.choice(texts),
+                        str(since + timedelta(
+                            seconds=self.rng.randrange(period),
+                            microseconds=self.rng.randrange(10 ** 6),
+                        )),
+                    )
+                    for news_id in targets
+                ]
+            )
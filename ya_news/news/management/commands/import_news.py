@@ -0,0 +1,227 @@
+import csv
+import io
+import json
+import sys
+from datetime import date
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from news.models import Comment, News, make_excerpt
+from news.shards import group_by_shard
+from news.signals import comments_bulk_changed
+
+NEWS_FIELDS = ('title', 'text', 'excerpt', 'date', 'modified')
+COMMENT_FIELDS = ('news', 'author', 'text', 'created')
+AUTHOR_CACHE_SIZE = 100000
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает новости (и комментарии) из JSONL или CSV. '
+        'Строка JSONL: {"id", "title", "text", "date", "comments": '
+        '[{"id", "author", "text", "created"}]}; CSV — колонки id, '
+        'title, text, date. Поле id нужно только в режиме --upsert.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или «-» для stdin.')
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'),
+            help='Формат входа; по умолчанию — по расширению файла.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько новостей записывать в одной транзакции.'
+        )
+        parser.add_argument(
+            '--upsert', action='store_true',
+            help='Обновлять записи с существующим id вместо создания '
+                 'новых; повторный импорт того же файла ничего не меняет.'
+        )
+        parser.add_argument(
+            '--create-authors', action='store_true',
+            help='Создавать отсутствующих авторов комментариев; иначе '
+                 'их комментарии пропускаются.'
+        )
+
+    def handle(self, *args, **options):
+        self.upsert = options['upsert']
+        self.create_authors = options['create_authors']
+        self.authors = {}
+        self.stats = dict.fromkeys((
+            'news_created', 'news_updated', 'comments_created',
+            'comments_updated', 'comments_skipped',
+        ), 0)
+        records = self.read(options['path'], options['format'])
+        while True:
+            batch = list(islice(records, options['batch_size']))
+            if not batch:
+                break
+            with transaction.atomic():
+                self.import_batch(batch)
+        self.stdout.write(self.style.SUCCESS(', '.join(
+            f'{name}: {value}' for name, value in self.stats.items()
+        )))
+
+    def read(self, path, input_format):
+        """Генератор записей; файл читается построчно."""
+        if input_format is None:
+            input_format = 'csv' if path.endswith('.csv') else 'jsonl'
+        if path == '-':
+            stream = io.TextIOWrapper(
+                sys.stdin.buffer, encoding='utf-8', newline=''
+            )
+        else:
+            stream = open(path, encoding='utf-8', newline='')
+        with stream:
+            if input_format == 'csv':
+                yield from csv.DictReader(stream)
+                return
+            for number, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as error:
+                    raise CommandError(f'Строка {number}: {error}')
+
+    def import_batch(self, batch):
+        news_list = [self.build_news(record) for record in batch]
+        if self.upsert:
+            self.upsert_objects(News.objects, news_list, NEWS_FIELDS, 'news')
+        else:
+            # SQLite не возвращает id из bulk_create, а они нужны
+            # комментариям, поэтому назначаем их сами внутри транзакции.
+            last_pk = News.objects.aggregate(last=Max('pk'))['last'] or 0
+            for offset, news in enumerate(news_list, start=1):
+                news.pk = last_pk + offset
+            News.objects.bulk_create(news_list)
+            self.stats['news_created'] += len(news_list)
+
+        comments = []
+        authors = self.lookup_authors({
+            comment['author']
+            for record in batch for comment in record.get('comments', ())
+        })
+        for record, news in zip(batch, news_list):
+            for comment in record.get('comments', ()):
+                author_id = authors.get(comment['author'])
+                if author_id is None:
+                    self.stats['comments_skipped'] += 1
+                    continue
+                comments.append(self.build_comment(comment, news, author_id))
+        # Комментарии в шардах пишутся в своих транзакциях: при сбое
+        # пачку можно догрузить повторным импортом с --upsert.
+        for alias, group in group_by_shard(comments).items():
+            with transaction.atomic(using=alias):
+                if self.upsert:
+                    self.upsert_objects(
+                        Comment.objects.using(alias), group,
+                        COMMENT_FIELDS, 'comments',
+                    )
+                else:
+                    Comment.objects.using(alias).bulk_create(group)
+                    self.stats['comments_created'] += len(group)
+        # Сигнал сбрасывает и кеш ленты, поэтому отправляется и для
+        # пачки без комментариев.
+        comments_bulk_changed.send(
+            sender=Comment, news_ids={news.pk for news in news_list},
+        )
+
+    def upsert_objects(self, queryset, objects, fields, name):
+        """Создаёт новые и обновляет существующие объекты по id."""
+        existing = set(queryset.filter(
+            pk__in=[obj.pk for obj in objects]
+        ).values_list('pk', flat=True))
+        updated = [obj for obj in objects if obj.pk in existing]
+        created = [obj for obj in objects if obj.pk not in existing]
+        queryset.bulk_update(updated, fields)
+        queryset.bulk_create(created)
+        self.stats[f'{name}_updated'] += len(updated)
+        self.stats[f'{name}_created'] += len(created)
+
+    def require_id(self, record):
+        if not self.upsert:
+            return None
+        if not record.get('id'):
+            raise CommandError(f'В режиме --upsert нужен id: {record}')
+        return int(record['id'])
+
+    def build_news(self, record):
+        return News(
+            pk=self.require_id(record),
+            title=record['title'],
+            text=record['text'],
+            excerpt=make_excerpt(record['text']),
+            date=(
+                self.parse(date.fromisoformat, record, 'date')
+                if record.get('date') else date.today()
+            ),
+            modified=timezone.now(),
+        )
+
+    def build_comment(self, record, news, author_id):
+        created = (
+            self.parse(parse_datetime, record, 'created')
+            if record.get('created') else timezone.now()
+        )
+        if timezone.is_naive(created):
+            created = timezone.make_aware(created)
+        return Comment(
+            pk=self.require_id(record),
+            news=news,
+            author_id=author_id,
+            text=record['text'],
+            created=created,
+        )
+
+    @staticmethod
+    def parse(parser, record, field):
+        """Значение поля с датой; неверное значение — CommandError."""
+        try:
+            value = parser(record[field])
+        except (TypeError, ValueError):
+            # TypeError — не строка в JSON, например число.
+            value = None
+        if value is None:
+            raise CommandError(
+                f'Неверное значение {field} {record[field]!r}: {record}'
+            )
+        return value
+
+    def lookup_authors(self, usernames):
+        """
+        Находит id авторов одним запросом на пачку.
+
+        Уже известные имена берутся из ограниченного кеша, а
+        отсутствующие авторы при --create-authors создаются разом.
+        """
+        missing = usernames - self.authors.keys()
+        if missing:
+            if len(self.authors) > AUTHOR_CACHE_SIZE:
+                self.authors.clear()
+            User = get_user_model()
+            found = dict(User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'pk'))
+            if self.create_authors and len(found) < len(missing):
+                password = make_password(None)
+                User.objects.bulk_create(
+                    User(username=username, password=password)
+                    for username in missing - found.keys()
+                )
+                found = dict(User.objects.filter(
+                    username__in=missing
+                ).values_list('username', 'pk'))
+            self.authors.update(found)
+        return {
+            username: self.authors[username]
+            for username in usernames if username in self.authors
+        }
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from news.models import News
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает News.comment_count по таблице комментариев. '
+        'Используется для заполнения и починки счётчиков.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько новостей обновлять в одной транзакции.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = News.objects.order_by('pk').values_list('pk', flat=True)
+        processed = 0
+        last_pk = 0
+        while True:
+            batch = list(ids.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                News.objects.filter(pk__in=batch).refresh_comment_counts()
+            processed += len(batch)
+            last_pk = batch[-1]
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано новостей: {processed}')
+        )
@@ -0,0 +1,110 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Max
+
+from news.models import Comment, CommentSequence
+from news.shards import comment_databases, group_by_shard, shard_for
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит комментарии в шарды по текущему COMMENT_SHARDS: '
+        'из default, из всех шардов и из файлов --source. Перед '
+        'переносом применяет миграции к шардам. Команду можно '
+        'перезапускать после сбоя: перенос идёт копированием, а затем '
+        'удалением в источнике.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', action='append', default=[], metavar='PATH',
+            help='Файл SQLite бывшего шарда, которого уже нет в '
+                 'COMMENT_SHARDS. Можно указать несколько раз.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько комментариев читать из источника за раз.'
+        )
+
+    def handle(self, *args, **options):
+        for alias in settings.COMMENT_SHARDS:
+            call_command('migrate', 'news', database=alias, verbosity=0)
+        extra = [
+            self.connect(f'reshard_source{number}', path)
+            for number, path in enumerate(options['source'])
+        ]
+        moved = Counter()
+        try:
+            for source in dict.fromkeys(
+                ['default', *settings.COMMENT_SHARDS, *extra]
+            ):
+                self.move(source, options['batch_size'], moved)
+        finally:
+            for alias in extra:
+                connections[alias].close()
+                del connections[alias]
+                del connections.databases[alias]
+        self.sync_sequence()
+        for alias in comment_databases():
+            self.stdout.write(
+                f'{alias}: перенесено {moved[alias]}, всего '
+                f'{Comment.objects.using(alias).count()}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено комментариев: {sum(moved.values())}'
+        ))
+
+    @staticmethod
+    def connect(alias, path):
+        connections.databases[alias] = {
+            **connections.databases['default'], 'NAME': path,
+        }
+        return alias
+
+    @staticmethod
+    def move(source, batch_size, moved):
+        comments = Comment.objects.using(source).order_by('pk')
+        last_pk = 0
+        while True:
+            batch = list(comments.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            leaving = [
+                comment for comment in batch
+                if shard_for(comment.news_id) != source
+            ]
+            for target, group in group_by_shard(leaving).items():
+                with transaction.atomic(using=target):
+                    Comment.objects.using(target).bulk_create(
+                        group, ignore_conflicts=True
+                    )
+                moved[target] += len(group)
+            # Без сигналов: комментарии не удаляются, а переезжают, и
+            # счётчики новостей менять не нужно.
+            with transaction.atomic(using=source):
+                comments.filter(
+                    pk__in=[comment.pk for comment in leaving]
+                )._raw_delete(source)
+
+    @staticmethod
+    def sync_sequence():
+        """Счётчик id не должен отставать от уже занятых id."""
+        if not settings.COMMENT_SHARDS:
+            return
+        last = max(
+            Comment.objects.using(alias).aggregate(last=Max('pk'))['last']
+            or 0
+            for alias in {'default', *settings.COMMENT_SHARDS}
+        )
+        with transaction.atomic():
+            if not CommentSequence.objects.filter(
+                pk=1, last_id__lt=last
+            ).update(last_id=last):
+                CommentSequence.objects.get_or_create(
+                    pk=1, defaults={'last_id': last}
+                )
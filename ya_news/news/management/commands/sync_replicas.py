@@ -0,0 +1,36 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from yanews.replicas import mark_synced
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу в локальные копии для чтения '
+        '(NEWS_READ_REPLICAS) через backup API SQLite. Запускается '
+        'периодически на каждом узле.'
+    )
+
+    def handle(self, *args, **options):
+        source = connections['default']
+        source.ensure_connection()
+        for alias in settings.NEWS_READ_REPLICAS:
+            path = str(connections[alias].settings_dict['NAME'])
+            start = time.perf_counter()
+            # Всё записанное до этого момента попадёт в копию.
+            synced = time.time()
+            # Копия читается только на чтение, поэтому пишем в неё
+            # отдельным соединением. Копирование идёт одной транзакцией:
+            # читатели копии видят либо старый снимок, либо новый.
+            target = sqlite3.connect(path)
+            try:
+                source.connection.backup(target)
+            finally:
+                target.close()
+            mark_synced(alias, synced)
+            self.stdout.write(self.style.SUCCESS(
+                f'{alias}: {path} за {time.perf_counter() - start:.2f} с'
+            ))
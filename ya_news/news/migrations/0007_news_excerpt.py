@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+from news.models import make_excerpt
+
+BATCH_SIZE = 1000
+
+
+def backfill_excerpt(apps, schema_editor):
+    News = apps.get_model('news', 'News')
+    last_pk = 0
+    while True:
+        batch = list(News.objects.filter(
+            pk__gt=last_pk
+        ).order_by('pk').only('text')[:BATCH_SIZE])
+        if not batch:
+            break
+        for news in batch:
+            news.excerpt = make_excerpt(news.text)
+        News.objects.bulk_update(batch, ['excerpt'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_news_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='excerpt',
+            field=models.CharField(
+                blank=True, editable=False, max_length=300
+            ),
+        ),
+        migrations.RunPython(backfill_excerpt, migrations.RunPython.noop),
+    ]
@@ -1,37 +1,187 @@
+from collections import Counter
 from datetime import datetime
 
 from django.conf import settings
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from .shards import comment_databases, next_comment_id, shard_for
+
+EXCERPT_WORDS = 15
+EXCERPT_MAX_LENGTH = 300
+
+
+def make_excerpt(text):
+    """Начало текста новости для ленты: первые слова, не длиннее поля."""
+    return Truncator(
+        Truncator(text).words(EXCERPT_WORDS)
+    ).chars(EXCERPT_MAX_LENGTH)
+
+
+class NewsQuerySet(models.QuerySet):
+
+    def refresh_comment_counts(self):
+        """Пересчитывает счётчики комментариев по таблице комментариев."""
+        if settings.COMMENT_SHARDS:
+            return self.refresh_sharded_comment_counts()
+        comments = Comment.objects.filter(
+            news=OuterRef('pk')
+        ).order_by().values('news').annotate(
+            total=Count('pk')
+        ).values('total')
+        return self.update(comment_count=Coalesce(Subquery(comments), 0))
+
+    def refresh_sharded_comment_counts(self):
+        # Подзапрос между базами невозможен: считаем в каждом шарде
+        # и записываем готовые числа.
+        news_ids = list(self.values_list('pk', flat=True))
+        by_shard = {}
+        for pk in news_ids:
+            by_shard.setdefault(shard_for(pk), []).append(pk)
+        counts = Counter()
+        for alias, ids in by_shard.items():
+            counts.update(dict(
+                Comment.objects.using(alias).filter(
+                    news_id__in=ids
+                ).order_by().values('news').annotate(
+                    total=Count('pk')
+                ).values_list('news', 'total')
+            ))
+        self.model.objects.bulk_update(
+            [News(pk=pk, comment_count=counts[pk]) for pk in news_ids],
+            ['comment_count'], batch_size=500,
+        )
+        return len(news_ids)
 
 
 class News(models.Model):
     title = models.CharField(max_length=50)
     text = models.TextField()
+    # Лента показывает только начало текста; оно хранится отдельно,
+    # чтобы список не читал и не резал полные тексты.
+    excerpt = models.CharField(
+        max_length=EXCERPT_MAX_LENGTH, blank=True, editable=False
+    )
     date = models.DateField(default=datetime.today)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    # Меняется при любом изменении новости или её комментариев;
+    # служит валидатором для условных GET-запросов.
+    modified = models.DateTimeField(auto_now=True)
+
+    objects = NewsQuerySet.as_manager()
 
     class Meta:
         ordering = ('-date',)
         verbose_name_plural = 'Новости'
         verbose_name = 'Новость'
+        indexes = (
+            models.Index(fields=('-date', '-id'), name='news_date_id_idx'),
+        )
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Без загруженного текста (defer) пересчитывать нечего.
+        if 'text' not in self.get_deferred_fields():
+            self.excerpt = make_excerpt(self.text)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'text' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'excerpt'}
+        super().save(*args, **kwargs)
+
+
+class CommentQuerySet(models.QuerySet):
+
+    def for_news(self, news):
+        """Комментарии новости (объект или id) из её шарда."""
+        news_id = getattr(news, 'pk', news)
+        queryset = self.filter(news_id=news_id)
+        if settings.COMMENT_SHARDS:
+            queryset = queryset.using(shard_for(news_id))
+        return queryset
+
+    def with_related(self, *fields):
+        """
+        Подгружает связанные объекты: JOIN, если они в той же базе, и
+        отдельным запросом, если комментарии лежат в шардах.
+        """
+        if settings.COMMENT_SHARDS:
+            return self.prefetch_related(*fields)
+        return self.select_related(*fields)
+
+    def create(self, **kwargs):
+        # QuerySet.create() пишет в self.db, а без подсказки это
+        # default; шард выбирается по самому комментарию в save().
+        if settings.COMMENT_SHARDS and self._db is None:
+            comment = self.model(**kwargs)
+            comment.save(force_insert=True)
+            return comment
+        return super().create(**kwargs)
+
+    def get_from_shards(self, **lookup):
+        """get() по всем базам комментариев, когда шард неизвестен."""
+        if not settings.COMMENT_SHARDS:
+            return self.get(**lookup)
+        for alias in comment_databases():
+            comment = self.using(alias).filter(**lookup).first()
+            if comment is not None:
+                return comment
+        raise self.model.DoesNotExist(
+            f'{self.model._meta.object_name} matching query does not exist.'
+        )
+
 
 class Comment(models.Model):
+    # Одиночные индексы по внешним ключам не нужны: их покрывают
+    # составные индексы из Meta.indexes. Новость и автор могут быть
+    # в другой базе (news.shards), поэтому ограничений FOREIGN KEY нет,
+    # а каскадное удаление делают сигналы.
     news = models.ForeignKey(
         News,
-        on_delete=models.CASCADE
+        on_delete=models.DO_NOTHING,
+        db_index=False,
+        db_constraint=False,
     )
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
+        db_index=False,
+        db_constraint=False,
     )
     text = models.TextField()
-    created = models.DateTimeField(auto_now_add=True)
+    # Не auto_now_add: импорт должен сохранять исходное время.
+    created = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = CommentQuerySet.as_manager()
 
     class Meta:
         ordering = ('created',)
+        indexes = (
+            models.Index(
+                fields=('news', 'created', 'id'),
+                name='comment_news_created_idx',
+            ),
+            models.Index(
+                fields=('author', 'created'),
+                name='comment_author_created_idx',
+            ),
+        )
 
     def __str__(self):
         return self.text[:50]
+
+    def save(self, *args, **kwargs):
+        if self.pk is None and settings.COMMENT_SHARDS:
+            # Автоинкремент шарда не уникален между шардами.
+            self.pk = next_comment_id()
+            kwargs['force_insert'] = True
+        super().save(*args, **kwargs)
+
+
+class CommentSequence(models.Model):
+    """Последний выданный id комментария при шардировании."""
+    last_id = models.BigIntegerField(default=0)
@@ -0,0 +1,100 @@
+"""
+Поиск запрещённых слов в тексте комментариев.
+
+Словарь компилируется один раз в одно регулярное выражение в виде
+префиксного дерева: на каждом символе текста проверяется не больше
+ветвей, чем букв в алфавите, поэтому стоимость проверки почти не
+зависит от размера словаря.
+"""
+import re
+
+# Латинские буквы и цифры, которыми подменяют похожие кириллические.
+LOOKALIKES = str.maketrans({
+    'a': 'а', 'b': 'в', 'c': 'с', 'e': 'е', 'h': 'н', 'k': 'к', 'm': 'м',
+    'o': 'о', 'p': 'р', 't': 'т', 'x': 'х', 'y': 'у', '0': 'о', '3': 'з',
+    'ё': 'е',
+})
+END = ''
+
+
+def normalize(text, lookalikes=True):
+    text = text.lower()
+    if lookalikes:
+        text = text.translate(LOOKALIKES)
+    return text
+
+
+def load_words(path):
+    """Словарь из файла: одно слово или фраза на строку."""
+    with open(path, encoding='utf-8') as dictionary:
+        return [line.strip() for line in dictionary if line.strip()]
+
+
+def _trie(words):
+    root = {}
+    for word in words:
+        node = root
+        for char in word:
+            node = node.setdefault(char, {})
+        node[END] = {}
+    return root
+
+
+def _pattern(node, prune):
+    """
+    Регулярное выражение для поддерева.
+
+    При поиске подстроки (prune=True) слово, целиком содержащее другое
+    слово словаря, ничего не добавляет, и ветви за концом слова
+    отбрасываются.
+    """
+    if END in node and prune:
+        return ''
+    branches = [
+        re.escape(char) + _pattern(child, prune)
+        for char, child in sorted(node.items()) if char != END
+    ]
+    if not branches:
+        return ''
+    if len(branches) == 1 and END not in node:
+        return branches[0]
+    group = '(?:' + '|'.join(branches) + ')'
+    return group + '?' if END in node else group
+
+
+class BadWordsMatcher:
+    """
+    Скомпилированный словарь запрещённых слов.
+
+    lookalikes — приводить латинские двойники к кириллице,
+    whole_words — искать только целые слова, а не подстроки.
+    """
+
+    def __init__(self, words=(), lookalikes=True, whole_words=False):
+        self.lookalikes = lookalikes
+        self.whole_words = whole_words
+        self.reload(words)
+
+    def reload(self, words):
+        """Перекомпилирует словарь; старый работает до замены."""
+        words = {
+            normalize(word, self.lookalikes) for word in words if word
+        }
+        self.size = len(words)
+        if not words:
+            self._regex = None
+            return
+        pattern = _pattern(_trie(words), prune=not self.whole_words)
+        if self.whole_words:
+            pattern = rf'(?<!\w)(?:{pattern})(?!\w)'
+        self._regex = re.compile(pattern)
+
+    def search(self, text):
+        """Первое найденное запрещённое слово или None."""
+        if self._regex is None:
+            return None
+        match = self._regex.search(normalize(text, self.lookalikes))
+        return match.group() if match else None
+
+    def __contains__(self, text):
+        return self.search(text) is not None
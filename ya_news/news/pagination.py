@@ -0,0 +1,110 @@
+"""Курсорная (keyset) пагинация комментариев.
+
+Комментарии упорядочены по (created, id), как в Comment.Meta. Страница
+выбирается условием «строго раньше/позже курсора», а не OFFSET, поэтому
+глубокие страницы стоят столько же, сколько первая.
+"""
+import base64
+import binascii
+
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+
+ASCENDING = ('created', 'pk')
+DESCENDING = ('-created', '-pk')
+MAX_ID = 2 ** 63 - 1
+
+
+def encode_cursor(comment):
+    """Непрозрачный курсор, указывающий на комментарий."""
+    raw = f'{comment.created.isoformat()}|{comment.pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор в пару (created, pk); мусор даёт 404."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created, pk = raw.decode().rsplit('|', 1)
+        created, pk = parse_datetime(created), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise Http404('Некорректный курсор.')
+    # Больше 64 бит драйвер SQLite не передаст в запрос (OverflowError).
+    if created is None or not -MAX_ID - 1 <= pk <= MAX_ID:
+        raise Http404('Некорректный курсор.')
+    return created, pk
+
+
+# Условие по created вынесено отдельно от OR, чтобы SQLite мог
+# использовать его как диапазон по индексу (news, created, id).
+def before(created, pk):
+    return Q(created__lte=created) & (
+        Q(created__lt=created) | Q(pk__lt=pk)
+    )
+
+
+def after(created, pk):
+    return Q(created__gte=created) & (
+        Q(created__gt=created) | Q(pk__gt=pk)
+    )
+
+
+class CommentPage:
+    """Страница комментариев с курсорами на соседние страницы."""
+
+    def __init__(self, object_list, has_older, has_newer):
+        self.object_list = object_list
+        self.older_cursor = None
+        self.newer_cursor = None
+        if object_list and has_older:
+            self.older_cursor = encode_cursor(object_list[0])
+        if object_list and has_newer:
+            self.newer_cursor = encode_cursor(object_list[-1])
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def paginate_comments(queryset, per_page, after_cursor=None,
+                      before_cursor=None):
+    """
+    Возвращает страницу комментариев.
+
+    Без курсоров — самые ранние комментарии; after_cursor — следующие
+    за курсором, before_cursor — предшествующие ему. Лишняя
+    (per_page + 1)-я строка показывает, есть ли что-то дальше.
+    """
+    if before_cursor:
+        rows = list(queryset.filter(
+            before(*decode_cursor(before_cursor))
+        ).order_by(*DESCENDING)[:per_page + 1])
+        has_older = len(rows) > per_page
+        return CommentPage(rows[:per_page][::-1], has_older, True)
+    if after_cursor:
+        queryset = queryset.filter(after(*decode_cursor(after_cursor)))
+    rows = list(queryset.order_by(*ASCENDING)[:per_page + 1])
+    has_newer = len(rows) > per_page
+    return CommentPage(rows[:per_page], bool(after_cursor), has_newer)
+
+
+def locate_comment(queryset, comment):
+    """
+    Параметры запроса для страницы, которая начинается с comment.
+
+    Нужен один индексный запрос за предыдущим комментарием: курсор
+    «после него» открывает страницу, первым на которой будет comment.
+    Для ещё не записанного комментария (pk нет) предыдущий — последний
+    созданный не позже него.
+    """
+    condition = (
+        Q(created__lte=comment.created) if comment.pk is None
+        else before(comment.created, comment.pk)
+    )
+    previous = queryset.filter(condition).order_by(*DESCENDING).first()
+    if previous is None:
+        return {}
+    return {'after': encode_cursor(previous)}
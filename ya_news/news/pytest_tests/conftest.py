@@ -1,8 +1,52 @@
+from io import StringIO
+
 import pytest
 from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connections
+from django.test.client import Client
 from news.models import News, Comment
 
 
+@pytest.fixture(autouse=True)
+def query_budget(request, monkeypatch):
+    """
+    Проверяем бюджет SQL-запросов из маркера query_budget.
+
+    Число запросов берётся из статистики QueryStatsMiddleware, поэтому
+    учитываются только запросы, выполненные при обработке URL, а не
+    при подготовке данных теста.
+    """
+    marker = request.node.get_closest_marker('query_budget')
+    if marker is None:
+        return
+    budget = marker.args[0]
+    send_request = Client.request
+
+    def checked_request(client, **kwargs):
+        response = send_request(client, **kwargs)
+        stats = response.wsgi_request.query_stats
+        assert stats.count <= budget, (
+            f'{response.wsgi_request.method} {response.wsgi_request.path}: '
+            f'{stats}, а бюджет {budget}; повторяются: '
+            f'{stats.duplicated_sql()}'
+        )
+        return response
+
+    monkeypatch.setattr(Client, 'request', checked_request)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """
+    Кеш общий для всех тестов, а id в тестовой базе повторяются,
+    поэтому каждый тест начинается с пустого кеша.
+    """
+    for cache in caches.all():
+        cache.clear()
+
+
 @pytest.fixture
 def user(db):
     """Создаём тестового пользователя."""
@@ -41,3 +85,37 @@ def comment(db, author_user, news):
     return Comment.objects.create(
         news=news, author=author_user, text='Test comment'
     )
+
+
+@pytest.fixture
+def replica(transactional_db, settings, tmp_path):
+    """Копия базы для чтения в отдельном файле SQLite."""
+    connections.databases['replica'] = {
+        'ENGINE': 'yanews.sqlite',
+        'NAME': str(tmp_path / 'replica.sqlite3'),
+        'OPTIONS': {'pragmas': {'query_only': 'ON'}},
+    }
+    settings.NEWS_READ_REPLICAS = ['replica']
+    yield 'replica'
+    connections['replica'].close()
+    del connections['replica']
+    del connections.databases['replica']
+
+
+@pytest.fixture
+def comment_shards(transactional_db, settings, tmp_path):
+    """Два шарда комментариев в отдельных файлах SQLite."""
+    aliases = ['shard0', 'shard1']
+    for alias in aliases:
+        connections.databases[alias] = {
+            'ENGINE': 'yanews.sqlite',
+            'NAME': str(tmp_path / f'{alias}.sqlite3'),
+        }
+    settings.COMMENT_SHARDS = aliases
+    # Заодно создаёт в шардах таблицу комментариев.
+    call_command('reshard_comments', stdout=StringIO())
+    yield aliases
+    for alias in aliases:
+        connections[alias].close()
+        del connections[alias]
+        del connections.databases[alias]
@@ -1,8 +1,19 @@
+import os
+import subprocess
+import sys
+
 import pytest
 from django.urls import reverse
+from news.admin import CommentPageFormSet
+from news.async_views import AsyncNewsDetailView, AsyncNewsList
+from news.fragments import cache_stats
 from news.models import News, Comment
+from news.pagination import encode_cursor
 from datetime import datetime, timedelta
 from django.contrib.auth import get_user_model
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.test import Client, RequestFactory
 
 User = get_user_model()
 
@@ -21,6 +32,26 @@ def test_homepage_news_count(client, settings):
     assert len(response.context['news_list']) <= 10
 
 
+@pytest.mark.django_db
+def test_homepage_shows_stored_excerpt(client):
+    """
+    Проверяет, что лента выводит сохранённое начало текста и не
+    загружает полные тексты новостей.
+    """
+    news = News.objects.create(
+        title='Long read', text=' '.join(f'слово{i}' for i in range(500))
+    )
+    assert news.excerpt == ' '.join(f'слово{i}' for i in range(15)) + '…'
+    news.text = 'Короткий текст'
+    news.save(update_fields=['text'])
+    news.refresh_from_db()
+    assert news.excerpt == 'Короткий текст'
+    response = client.get(reverse('news:home'))
+    (shown,) = response.context['news_list']
+    assert 'text' in shown.get_deferred_fields()
+    assert 'Короткий текст' in response.content.decode()
+
+
 def test_news_ordering(db):
     """
     Проверяет, что новости сортируются по дате в порядке
@@ -89,3 +120,195 @@ def test_authenticated_user_can_access_comment_form(client):
     url = reverse('news:detail', args=[news.pk])
     response = client.get(url)
     assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_comments_are_paginated_by_cursor(client, settings, comment):
+    """
+    Проверяет, что комментарии на странице новости разбиты на страницы
+    по курсору и соседние страницы не пересекаются.
+    """
+    settings.COMMENTS_COUNT_ON_DETAIL_PAGE = 2
+    for i in range(4):
+        Comment.objects.create(
+            news=comment.news, author=comment.author, text=f'Comment {i}'
+        )
+    url = reverse('news:detail', args=[comment.news.pk])
+    ids = list(Comment.objects.values_list('pk', flat=True))
+    first_page = client.get(url).context['comments_page']
+    assert [comment.pk for comment in first_page] == ids[:2]
+    assert first_page.older_cursor is None
+    second_page = client.get(
+        url, {'after': first_page.newer_cursor}
+    ).context['comments_page']
+    assert [comment.pk for comment in second_page] == ids[2:4]
+    back = client.get(
+        url, {'before': second_page.older_cursor}
+    ).context['comments_page']
+    assert list(back) == list(first_page)
+    assert client.get(url, {'after': 'garbage'}).status_code == 404
+    # id за пределами 64 бит.
+    cursor = encode_cursor(Comment(created=comment.created, pk=10 ** 30))
+    for name in ('after', 'before'):
+        assert client.get(url, {name: cursor}).status_code == 404
+
+
+@pytest.mark.django_db
+def test_new_comment_redirect_lands_on_its_page(auth_client, settings, news):
+    """
+    Проверяет, что после публикации комментария редирект ведёт
+    на страницу, где этот комментарий виден.
+    """
+    settings.COMMENTS_COUNT_ON_DETAIL_PAGE = 2
+    url = reverse('news:detail', args=[news.pk])
+    for i in range(3):
+        response = auth_client.post(url, data={'text': f'Comment {i}'})
+    newest = Comment.objects.last()
+    page = auth_client.get(response.url).context['comments_page']
+    assert response.url.endswith('#comments')
+    assert newest.pk in [comment.pk for comment in page]
+
+
+@pytest.mark.django_db
+def test_comment_thread_cache_is_invalidated(author_client, comment):
+    """
+    Проверяет, что ветка комментариев берётся из кеша, сбрасывается
+    при правке и удалении комментария, а ссылки на правку видит
+    только автор.
+    """
+    client = Client()
+    url = reverse('news:detail', args=[comment.news.pk])
+    edit_url = reverse('news:edit', args=[comment.pk])
+    assert edit_url not in client.get(url).content.decode()
+    assert edit_url in author_client.get(url).content.decode()
+    assert cache_stats()['hits'] == 1
+    author_client.post(edit_url, data={'text': 'Исправленный текст'})
+    assert 'Исправленный текст' in client.get(url).content.decode()
+    author_client.post(reverse('news:delete', args=[comment.pk]))
+    assert 'Исправленный текст' not in client.get(url).content.decode()
+    assert cache_stats()['misses'] == 3
+
+
+@pytest.mark.django_db
+def test_comment_thread_is_invalidated_from_other_process(
+    author_client, comment, settings
+):
+    """
+    Проверяет, что сброс ветки комментариев в другом процессе (как
+    запись в соседнем воркере) действует и в этом.
+    """
+    url = reverse('news:detail', args=[comment.news.pk])
+    author_client.get(url)
+    author_client.get(url)
+    assert cache_stats()['misses'] == 1
+    subprocess.run(
+        [sys.executable, '-c', (
+            'import django; django.setup(); '
+            'from news.fragments import invalidate_threads; '
+            f'invalidate_threads([{comment.news.pk}])'
+        )],
+        check=True, cwd=settings.BASE_DIR,
+        env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'yanews.settings'},
+    )
+    author_client.get(url)
+    assert cache_stats()['misses'] == 2
+
+
+@pytest.mark.django_db
+def test_search_finds_ranks_and_highlights(client):
+    """
+    Проверяет, что поиск находит новость по слову из заголовка или
+    текста, ставит выше совпадение в заголовке, подсвечивает его и
+    сразу учитывает правки и удаление новости.
+    """
+    by_text = News.objects.create(
+        title='Погода', text='Жители <b>ждут</b> снегопад'
+    )
+    by_title = News.objects.create(title='Снегопад', text='Текст')
+    url = reverse('news:search')
+    results = client.get(url, {'q': 'снегопад'}).context['object_list']
+    assert results == [by_title, by_text]
+    assert '<mark>' in results[1].snippet
+    assert '&lt;b&gt;' in results[1].snippet
+    by_title.title = 'Метель'
+    by_title.save()
+    by_text.delete()
+    assert client.get(url, {'q': 'снегопад'}).context['object_list'] == []
+    assert client.get(url, {'q': '"OR *'}).status_code == 200
+
+
+@pytest.mark.django_db
+def test_admin_news_page_paginates_comment_forms(
+        admin_client, monkeypatch, comment
+):
+    """
+    Проверяет, что страница новости в админке выводит формы только
+    для одной страницы комментариев и сохраняет правку на ней.
+    """
+    monkeypatch.setattr(CommentPageFormSet, 'per_page', 2)
+    for i in range(2):
+        Comment.objects.create(
+            news=comment.news, author=comment.author, text=f'Comment {i}'
+        )
+    url = reverse('admin:news_news_change', args=[comment.news.pk])
+    page = admin_client.get(url, {'comments_page': 2})
+    formset = page.context['inline_admin_formsets'][0].formset
+    assert [form.instance.text for form in formset] == ['Comment 1']
+    assert 'comments_page=1' in page.content.decode()
+    data = {
+        'title': comment.news.title,
+        'text': comment.news.text,
+        'date': comment.news.date.strftime('%d.%m.%Y'),
+        'comment_set-TOTAL_FORMS': 1,
+        'comment_set-INITIAL_FORMS': 1,
+        'comment_set-0-id': formset[0].instance.pk,
+        'comment_set-0-news': comment.news.pk,
+        'comment_set-0-author': comment.author.pk,
+        'comment_set-0-text': 'Исправлено в админке',
+    }
+    response = admin_client.post(f'{url}?comments_page=2', data)
+    assert response.status_code == 302
+    assert Comment.objects.filter(text='Исправлено в админке').count() == 1
+
+
+@pytest.mark.django_db
+def test_admin_news_search_uses_full_text_index(admin_client):
+    """Проверяет, что поиск в списке новостей в админке идёт по FTS5."""
+    found = News.objects.create(title='Снегопад', text='Текст')
+    News.objects.create(title='Погода', text='Жара')
+    response = admin_client.get(
+        reverse('admin:news_news_changelist'), {'q': 'снегопад'}
+    )
+    assert list(response.context['cl'].result_list) == [found]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_views_render_same_pages(client, comment):
+    """
+    Проверяет, что асинхронные лента и страница новости отдают те же
+    страницы, что и синхронные, и отвечают 304 на совпавший ETag.
+    """
+    factory = RequestFactory()
+    pages = (
+        (reverse('news:home'), AsyncNewsList.as_view(), {}),
+        (
+            reverse('news:detail', args=[comment.news.pk]),
+            AsyncNewsDetailView.as_view(), {'pk': comment.news.pk},
+        ),
+    )
+    for url, view, kwargs in pages:
+        expected = client.get(url)
+        for headers, status in (
+            ({}, 200), ({'HTTP_IF_NONE_MATCH': expected['ETag']}, 304),
+        ):
+            request = factory.get(url, **headers)
+            request.user = AnonymousUser()
+            response = async_to_sync(view)(request, **kwargs)
+            assert response.status_code == status
+            assert response['ETag'] == expected['ETag']
+        assert response.content == b''
+        request = factory.get(url)
+        request.user = AnonymousUser()
+        assert async_to_sync(view)(
+            request, **kwargs
+        ).content == expected.content
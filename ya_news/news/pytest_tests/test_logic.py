@@ -1,6 +1,19 @@
+import json
+import threading
+from io import BytesIO, StringIO
+
 import pytest
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
 from django.urls import reverse
-from news.models import Comment
+from news.forms import BAD_WORDS
+from news.ingest import get_writer
+from news.models import Comment, News
+from news.moderation import BadWordsMatcher
+from news.shards import shard_for
+from yanews.replicas import PIN_COOKIE
+from yanews.sqlite.base import DatabaseWrapper
 
 
 @pytest.mark.django_db
@@ -70,3 +83,312 @@ def test_non_author_cannot_edit_delete_comment(auth_client, comment):
         edit_url, data={'text': 'Updated text'}
     ).status_code == 404
     assert auth_client.post(delete_url).status_code == 404
+
+
+@pytest.mark.django_db
+def test_comment_count_follows_create_and_delete(author_client, news):
+    """
+    Проверяет, что счётчик комментариев новости увеличивается
+    при публикации комментария и уменьшается при его удалении.
+    """
+    url = reverse('news:detail', kwargs={'pk': news.pk})
+    author_client.post(url, data={'text': 'Test comment'})
+    news.refresh_from_db()
+    assert news.comment_count == 1
+    comment = Comment.objects.get()
+    author_client.post(reverse('news:delete', kwargs={'pk': comment.pk}))
+    news.refresh_from_db()
+    assert news.comment_count == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_write_behind_comment_is_visible_to_author_until_written(
+    author_client, news, settings, monkeypatch
+):
+    """
+    Проверяет, что в режиме отложенной записи комментарий сразу виден
+    автору, а после записи фоновым потоком попадает в базу и счётчик.
+    """
+    settings.COMMENTS_WRITE_BEHIND = True
+    writer = get_writer()
+    # Писатель ждёт, пока тест проверит незаписанный комментарий.
+    written = threading.Event()
+    write = writer.write
+    monkeypatch.setattr(
+        writer, 'write', lambda batch: written.wait(5) and write(batch)
+    )
+    url = reverse('news:detail', kwargs={'pk': news.pk})
+    etag = author_client.get(url)['ETag']
+    response = author_client.post(url, data={'text': 'Быстрый ответ'})
+    assert response.status_code == 302
+    assert not Comment.objects.exists()
+    page = author_client.get(response.url, HTTP_IF_NONE_MATCH=etag)
+    assert page.status_code == 200
+    assert 'Быстрый ответ' in page.content.decode()
+    written.set()
+    writer.flush()
+    assert writer.pending_for(news.pk, response.wsgi_request.user.pk) == []
+    assert Comment.objects.get().text == 'Быстрый ответ'
+    news.refresh_from_db()
+    assert news.comment_count == 1
+    page = author_client.get(response.url).content.decode()
+    assert page.count('Быстрый ответ') == 1
+
+
+def test_author_reads_primary_after_comment(
+    replica, client, news, user, author_user
+):
+    """
+    Проверяет, что новость читается с отстающей копии базы, а
+    пользователь после своего комментария читает основную базу.
+    """
+    call_command('sync_replicas', stdout=StringIO())
+    Comment.objects.create(news=news, author=author_user, text='Свежий')
+    url = reverse('news:detail', kwargs={'pk': news.pk})
+    assert 'Свежий' not in client.get(url).content.decode()
+    client.force_login(user)
+    assert 'Свежий' not in client.get(url).content.decode()
+    response = client.post(url, data={'text': 'Мой ответ'})
+    assert PIN_COOKIE in response.cookies
+    assert 'Мой ответ' in client.get(response.url).content.decode()
+    assert 'Свежий' in client.get(url).content.decode()
+    call_command('sync_replicas', stdout=StringIO())
+    client.logout()
+    assert 'Мой ответ' in client.get(url).content.decode()
+
+
+def test_caches_do_not_keep_stale_replica_pages(
+    replica, client, news, author_user
+):
+    """
+    Проверяет, что страница, прочитанная с отстающей копии после
+    нового комментария, не остаётся в кеше ответов и кеше веток
+    после синхронизации копии.
+    """
+    call_command('sync_replicas', stdout=StringIO())
+    url = reverse('news:detail', kwargs={'pk': news.pk})
+    assert client.get(url)['X-Response-Cache'] == 'miss'
+    Comment.objects.create(news=news, author=author_user, text='Свежий')
+    for _ in range(2):
+        response = client.get(url)
+        assert response['X-Response-Cache'] == 'miss'
+        assert 'Свежий' not in response.content.decode()
+    call_command('sync_replicas', stdout=StringIO())
+    response = client.get(url)
+    assert response['X-Response-Cache'] == 'miss'
+    assert 'Свежий' in response.content.decode()
+    assert client.get(url)['X-Response-Cache'] == 'hit'
+
+
+def test_comments_are_stored_in_news_shards(
+    comment_shards, author_client, author_user
+):
+    """
+    Проверяет, что комментарии лежат в шарде своей новости, а страница
+    новости, правка и пересчёт счётчиков работают поверх шардов.
+    """
+    news_by_shard = {}
+    while len(news_by_shard) < len(comment_shards):
+        news = News.objects.create(title='Новость', text='Текст')
+        news_by_shard.setdefault(shard_for(news.pk), news)
+    for alias, news in news_by_shard.items():
+        url = reverse('news:detail', kwargs={'pk': news.pk})
+        author_client.post(url, data={'text': f'Комментарий в {alias}'})
+        comment = Comment.objects.using(alias).get()
+        assert comment.news_id == news.pk
+        page = author_client.get(url).content.decode()
+        assert f'Комментарий в {alias}' in page
+        assert author_user.username in page
+    assert not Comment.objects.using('default').exists()
+    edit_url = reverse('news:edit', kwargs={'pk': comment.pk})
+    author_client.post(edit_url, data={'text': 'Исправлено'})
+    assert Comment.objects.for_news(news).get().text == 'Исправлено'
+    News.objects.update(comment_count=0)
+    call_command('recount_comments', stdout=StringIO())
+    for news in news_by_shard.values():
+        news.refresh_from_db()
+        assert news.comment_count == 1
+
+
+def test_reshard_comments_moves_comments(
+    comment_shards, settings, news, author_user
+):
+    """
+    Проверяет перенос комментариев из default в шарды и из бывшего
+    шарда в оставшиеся.
+    """
+    Comment.objects.using('default').bulk_create([
+        Comment(news=news, author=author_user, text='Старый комментарий')
+    ])
+    call_command('reshard_comments', stdout=StringIO())
+    assert not Comment.objects.using('default').exists()
+    assert Comment.objects.using(shard_for(news.pk)).exists()
+    source = shard_for(news.pk)
+    settings.COMMENT_SHARDS = [
+        alias for alias in comment_shards if alias != source
+    ]
+    call_command(
+        'reshard_comments', stdout=StringIO(),
+        source=[connections.databases[source]['NAME']],
+    )
+    assert not Comment.objects.using(source).exists()
+    assert Comment.objects.for_news(news).get().text == 'Старый комментарий'
+
+
+@pytest.mark.django_db
+def test_recount_comments_repairs_counter(comment, news):
+    """
+    Проверяет, что команда recount_comments восстанавливает
+    рассинхронизированный счётчик комментариев.
+    """
+    News.objects.update(comment_count=42)
+    call_command('recount_comments', stdout=StringIO())
+    news.refresh_from_db()
+    assert news.comment_count == 1
+
+
+@pytest.mark.parametrize('text', ('РЕДИСКА!', 'pедиска', 'негодяйка'))
+def test_bad_words_matcher_catches_variants(text):
+    """
+    Проверяет, что словарь находит запрещённые слова независимо от
+    регистра, латинских двойников букв и окончаний.
+    """
+    assert text in BadWordsMatcher(BAD_WORDS)
+
+
+def test_bad_words_matcher_whole_words_and_reload():
+    """Проверяет режим поиска целых слов и перезагрузку словаря."""
+    matcher = BadWordsMatcher(('редис',), whole_words=True)
+    assert 'редиска' not in matcher
+    assert 'ах, редис.' in matcher
+    matcher.reload(('морковка',))
+    assert 'ах, редис.' not in matcher
+    assert 'Морковка' in matcher
+
+
+@pytest.mark.django_db
+def test_import_news_jsonl_upsert_is_idempotent(tmp_path, author_user):
+    """
+    Проверяет, что import_news загружает новости с комментариями,
+    пропускает неизвестных авторов, а повторный импорт в режиме
+    --upsert не создаёт дубликатов.
+    """
+    source = tmp_path / 'news.jsonl'
+    source.write_text('\n'.join(json.dumps(record) for record in (
+        {'id': 10, 'title': 'Первая', 'text': 'Текст', 'date': '2024-01-02',
+         'comments': [
+             {'id': 100, 'author': 'author', 'text': 'Комментарий',
+              'created': '2024-01-02T10:00:00'},
+             {'id': 101, 'author': 'nobody', 'text': 'Пропустится'},
+         ]},
+        {'id': 11, 'title': 'Вторая', 'text': 'Текст'},
+    )), encoding='utf-8')
+    for _ in range(2):
+        call_command(
+            'import_news', str(source), '--upsert', '--batch-size', '1',
+            stdout=StringIO()
+        )
+    assert News.objects.count() == 2
+    comment = Comment.objects.get()
+    assert comment.pk == 100
+    assert comment.created.year == 2024
+    assert News.objects.get(pk=10).comment_count == 1
+
+
+@pytest.mark.django_db
+def test_import_news_csv(tmp_path):
+    """Проверяет загрузку новостей из CSV."""
+    source = tmp_path / 'news.csv'
+    source.write_text(
+        'title,text,date\nПервая,Текст,2024-01-02\nВторая,Текст,\n',
+        encoding='utf-8'
+    )
+    call_command('import_news', str(source), stdout=StringIO())
+    assert News.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_import_news_from_stdin_refreshes_home_page(client, monkeypatch):
+    """
+    Проверяет, что CSV из stdin сохраняет переводы строк в кавычках,
+    а загрузка одних новостей сбрасывает кеш главной страницы.
+    """
+    home_url = reverse('news:home')
+    client.get(home_url)
+    stdin = StringIO()
+    stdin.buffer = BytesIO(
+        'title,text\r\nИмпорт,"Строка\r\nещё строка"\r\n'.encode()
+    )
+    monkeypatch.setattr('sys.stdin', stdin)
+    call_command('import_news', '-', '--format', 'csv', stdout=StringIO())
+    assert News.objects.get().text == 'Строка\r\nещё строка'
+    assert 'Импорт' in client.get(home_url).content.decode()
+
+
+def test_import_news_rejects_bad_dates(tmp_path, author_user):
+    """Проверяет, что неверная дата даёт CommandError, а не трассировку."""
+    source = tmp_path / 'news.csv'
+    source.write_text('title,text,date\nНовость,Текст,02.01.2024\n')
+    with pytest.raises(CommandError, match='02.01.2024'):
+        call_command('import_news', str(source), stdout=StringIO())
+    source = tmp_path / 'news.jsonl'
+    source.write_text(json.dumps({
+        'title': 'Новость', 'text': 'Текст',
+        'comments': [{'author': 'author', 'text': 'Т', 'created': 'вчера'}],
+    }))
+    with pytest.raises(CommandError, match='вчера'):
+        call_command('import_news', str(source), stdout=StringIO())
+    source.write_text(json.dumps({
+        'title': 'Новость', 'text': 'Текст', 'date': 20240102,
+    }))
+    with pytest.raises(CommandError, match='20240102'):
+        call_command('import_news', str(source), stdout=StringIO())
+
+
+@pytest.mark.django_db
+def test_generate_dataset_is_reproducible():
+    """
+    Проверяет, что generate_dataset создаёт заданные объёмы, считает
+    комментарии и при одинаковом seed даёт одинаковое распределение.
+    """
+    def generate():
+        call_command(
+            'generate_dataset', '--users', '3', '--news', '5',
+            '--comments', '200', '--keep-indexes', stdout=StringIO()
+        )
+        counts = list(News.objects.order_by('pk').values_list(
+            'comment_count', flat=True
+        ))
+        users = list(User.objects.values_list('username', flat=True))
+        with pytest.raises(CommandError, match='load42_'):
+            call_command('generate_dataset', stdout=StringIO())
+        News.objects.all().delete()
+        User.objects.all().delete()
+        return counts, users
+
+    counts, users = generate()
+    assert sum(counts) == 200
+    assert max(counts) > 200 / 5
+    assert generate() == (counts, users)
+
+
+@pytest.mark.django_db
+def test_sqlite_backend_applies_pragmas(tmp_path):
+    """
+    Проверяет, что бэкенд yanews.sqlite настраивает каждое новое
+    соединение прагмами по умолчанию и из OPTIONS['pragmas'].
+    """
+    wrapper = DatabaseWrapper({
+        **connection.settings_dict,
+        'NAME': str(tmp_path / 'db.sqlite3'),
+        'OPTIONS': {'pragmas': {'synchronous': 'OFF'}},
+    })
+    try:
+        with wrapper.cursor() as cursor:
+            values = [
+                cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                for name in ('journal_mode', 'synchronous', 'busy_timeout')
+            ]
+    finally:
+        wrapper.close()
+    assert values == ['wal', 0, 5000]
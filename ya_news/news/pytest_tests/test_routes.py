@@ -1,3 +1,7 @@
+import os
+import subprocess
+import sys
+
 import pytest
 from django.urls import reverse
 from news.models import News, Comment
@@ -83,3 +87,139 @@ def test_auth_pages_accessible_anonymous(client):
     assert client.get(signup_url).status_code == 200
     assert client.get(login_url).status_code == 200
     assert client.get(logout_url).status_code == 200
+
+
+@pytest.mark.django_db
+def test_home_answers_304_until_comment_is_edited(client, comment):
+    """
+    Проверяет, что главная страница отвечает 304 на совпавший ETag
+    и отдаёт новую версию после правки комментария.
+    """
+    url = reverse('news:home')
+    etag = client.get(url)['ETag']
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    comment.text = 'Updated text'
+    comment.save()
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.django_db
+def test_detail_validator_changes_on_comment_delete(
+    author_client, comment
+):
+    """
+    Проверяет, что страница новости отвечает 304 на совпавший ETag,
+    а удаление комментария делает старый ETag недействительным.
+    """
+    url = reverse('news:detail', kwargs={'pk': comment.news.pk})
+    etag = author_client.get(url)['ETag']
+    assert author_client.get(
+        url, HTTP_IF_NONE_MATCH=etag
+    ).status_code == 304
+    author_client.post(reverse('news:delete', kwargs={'pk': comment.pk}))
+    assert author_client.get(
+        url, HTTP_IF_NONE_MATCH=etag
+    ).status_code == 200
+
+
+@pytest.mark.django_db
+def test_detail_validator_changes_on_login_again(
+    author_client, author_user, news
+):
+    """
+    Проверяет, что после выхода и повторного входа страница новости
+    не отвечает 304: в сохранённой браузером форме старый токен CSRF.
+    """
+    url = reverse('news:detail', kwargs={'pk': news.pk})
+    etag = author_client.get(url)['ETag']
+    assert author_client.get(
+        url, HTTP_IF_NONE_MATCH=etag
+    ).status_code == 304
+    author_client.logout()
+    author_client.force_login(author_user)
+    assert author_client.get(
+        url, HTTP_IF_NONE_MATCH=etag
+    ).status_code == 200
+
+
+@pytest.mark.django_db
+def test_anonymous_pages_are_cached_until_data_changes(client, comment):
+    """
+    Проверяет, что анонимам страницы отдаются из кеша, изменение
+    новости или комментария сбрасывает их, а пользователям с сессией
+    кеш не используется.
+    """
+    home_url = reverse('news:home')
+    detail_url = reverse('news:detail', kwargs={'pk': comment.news.pk})
+    for url in (home_url, detail_url):
+        assert client.get(url)['X-Response-Cache'] == 'miss'
+        assert client.get(url)['X-Response-Cache'] == 'hit'
+    Comment.objects.create(
+        news=comment.news, author=comment.author, text='Новый комментарий'
+    )
+    response = client.get(detail_url)
+    assert response['X-Response-Cache'] == 'miss'
+    assert 'Новый комментарий' in response.content.decode()
+    assert client.get(home_url)['X-Response-Cache'] == 'miss'
+    News.objects.create(title='Свежая новость', text='Текст')
+    response = client.get(home_url)
+    assert 'Свежая новость' in response.content.decode()
+    client.force_login(comment.author)
+    assert 'X-Response-Cache' not in client.get(home_url)
+
+
+@pytest.mark.django_db
+def test_anonymous_pages_are_purged_from_other_process(
+    client, comment, settings
+):
+    """
+    Проверяет, что сброс тега в другом процессе (как запись в соседнем
+    воркере) сбрасывает ленту, сохранённую в памяти этого процесса.
+    """
+    home_url = reverse('news:home')
+    client.get(home_url)
+    assert client.get(home_url)['X-Response-Cache'] == 'hit'
+    subprocess.run(
+        [sys.executable, '-c', (
+            'import django; django.setup(); '
+            'from yanews.response_cache import purge; '
+            "purge('news')"
+        )],
+        check=True, cwd=settings.BASE_DIR,
+        env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'yanews.settings'},
+    )
+    assert client.get(home_url)['X-Response-Cache'] == 'miss'
+
+
+@pytest.mark.query_budget(2)
+@pytest.mark.django_db
+def test_homepage_query_budget(client, comment):
+    """Проверяет число SQL-запросов главной страницы."""
+    assert client.get(reverse('news:home')).status_code == 200
+
+
+@pytest.mark.query_budget(5)
+@pytest.mark.django_db
+def test_news_detail_query_budget(author_client, comment):
+    """
+    Проверяет число SQL-запросов страницы новости, публикации
+    комментария и страниц его правки и удаления.
+    """
+    detail_url = reverse('news:detail', kwargs={'pk': comment.news.pk})
+    assert author_client.get(detail_url).status_code == 200
+    assert author_client.get(
+        reverse('news:edit', kwargs={'pk': comment.pk})
+    ).status_code == 200
+    assert author_client.get(
+        reverse('news:delete', kwargs={'pk': comment.pk})
+    ).status_code == 200
+
+
+@pytest.mark.query_budget(6)
+@pytest.mark.django_db
+def test_news_comment_query_budget(author_client, news):
+    """Проверяет число SQL-запросов при публикации комментария."""
+    detail_url = reverse('news:detail', kwargs={'pk': news.pk})
+    assert author_client.post(
+        detail_url, data={'text': 'Test comment'}
+    ).status_code == 302
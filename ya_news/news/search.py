@@ -0,0 +1,129 @@
+"""
+Полнотекстовый поиск по новостям на SQLite FTS5.
+
+Индекс news_news_fts хранит только токены (external content) и
+поддерживается триггерами на news_news, поэтому любая запись в таблицу —
+через ORM, bulk_create или импорт — сразу попадает в индекс.
+"""
+import re
+
+from django.conf import settings
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import News
+
+TABLE = 'news_news_fts'
+MARK_START, MARK_END = '\x02', '\x03'
+
+SCHEMA = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+        title, text, content='news_news', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_insert
+    AFTER INSERT ON news_news BEGIN
+        INSERT INTO {TABLE}(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_delete
+    AFTER DELETE ON news_news BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_update
+    AFTER UPDATE OF title, text ON news_news BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO {TABLE}(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+)
+
+# bm25 с весами колонок: совпадение в заголовке важнее, чем в тексте.
+# Ранжирование идёт в подзапросе по одному индексу, а соединение с
+# news_news и snippet() считаются только для попавших в LIMIT строк.
+RANK = f'bm25({TABLE}, 10.0, 1.0)'
+SEARCH_SQL = f"""
+    SELECT news_news.id, news_news.title, news_news.date,
+           snippet({TABLE}, -1, %s, %s, '…', 16) AS snippet
+    FROM {TABLE}
+    JOIN news_news ON news_news.id = {TABLE}.rowid
+    WHERE {TABLE} MATCH %s AND {TABLE}.rowid IN (
+        SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s
+        ORDER BY {RANK} LIMIT %s
+    )
+    ORDER BY {RANK}
+"""
+
+
+def install(connection):
+    """
+    Создаёт индекс и триггеры, если их нет.
+
+    Вызывается и после каждой миграции: пересоздание таблицы
+    news_news при изменении её полей удаляет триггеры.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in SCHEMA:
+            cursor.execute(statement)
+
+
+def rebuild(connection):
+    """Перестраивает индекс по текущему содержимому news_news."""
+    install(connection)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+
+
+def match_expression(query):
+    """
+    Запрос пользователя в синтаксисе FTS5.
+
+    Каждое слово берётся в кавычки, поэтому операторы и спецсимволы
+    FTS5 из ввода не могут сломать запрос; слова объединяются по И.
+    """
+    return ' '.join(f'"{word}"' for word in re.findall(r'\w+', query))
+
+
+def highlight(snippet):
+    """Экранирует фрагмент и превращает маркеры совпадений в <mark>."""
+    return mark_safe(escape(snippet).replace(
+        MARK_START, '<mark>'
+    ).replace(MARK_END, '</mark>'))
+
+
+def filter_news(queryset, query):
+    """Сужает queryset новостей до подходящих под запрос, без ранжирования."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [expression]
+    ))
+
+
+def search_news(query, limit=None):
+    """Новости, подходящие под запрос, по убыванию релевантности."""
+    expression = match_expression(query)
+    if not expression:
+        return []
+    results = list(News.objects.raw(SEARCH_SQL, [
+        MARK_START, MARK_END, expression, expression,
+        limit or settings.NEWS_SEARCH_RESULTS_COUNT,
+    ]))
+    for news in results:
+        news.snippet = highlight(news.snippet)
+    return results
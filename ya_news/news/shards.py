@@ -0,0 +1,161 @@
+"""
+Шардирование комментариев по новостям.
+
+Комментарии новости лежат в одной из баз COMMENT_SHARDS, которая
+выбирается по хешу news_id (shard_for), так что запись комментариев к
+разным новостям идёт в разные файлы SQLite и не ждёт одну блокировку
+записи. Новости, пользователи и сессии остаются в default. Без
+COMMENT_SHARDS всё работает с default, как раньше.
+
+Автоинкремент у каждого шарда свой, поэтому id комментариев выдаются
+блоками из счётчика CommentSequence в default (next_comment_id) и
+остаются уникальными при переносе между шардами.
+
+Ограничения: запрос комментариев без новости (Comment.objects.all())
+в шардах не маршрутизируется — нужен for_news() или обход
+comment_databases(); связанные новость и автор подгружаются отдельными
+запросами к default (select_related между базами невозможен).
+"""
+import os
+import threading
+import zlib
+
+from django.apps import apps
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F, Max
+
+ID_BLOCK = 1000
+
+
+def comment_databases():
+    """Базы, в которых лежат комментарии."""
+    return settings.COMMENT_SHARDS or ['default']
+
+
+def shard_for(news_id):
+    """База комментариев новости."""
+    shards = comment_databases()
+    return shards[zlib.crc32(str(news_id).encode()) % len(shards)]
+
+
+def _is_comment(obj):
+    return obj is not None and obj._meta.label_lower == 'news.comment'
+
+
+def _is_news(obj):
+    return obj is not None and obj._meta.label_lower == 'news.news'
+
+
+def allocate_comment_ids(count):
+    """Резервирует в default блок из count id комментариев."""
+    Comment = apps.get_model('news', 'Comment')
+    Sequence = apps.get_model('news', 'CommentSequence')
+    with transaction.atomic(using='default'):
+        # UPDATE сразу берёт блокировку записи, поэтому два процесса
+        # не получат один блок и не создадут счётчик дважды.
+        if not Sequence.objects.filter(pk=1).update(
+            last_id=F('last_id') + count
+        ):
+            start = max(
+                Comment.objects.using(alias).aggregate(
+                    last=Max('pk')
+                )['last'] or 0
+                for alias in {'default', *comment_databases()}
+            )
+            Sequence.objects.create(pk=1, last_id=start + count)
+        last = Sequence.objects.values_list('last_id', flat=True).get(pk=1)
+    return range(last - count + 1, last + 1)
+
+
+_ids = iter(())
+_ids_lock = threading.Lock()
+
+
+def _forget_ids():
+    # После fork блок остался бы общим у родителя и потомка.
+    global _ids
+    _ids = iter(())
+
+
+os.register_at_fork(after_in_child=_forget_ids)
+
+
+def next_comment_id():
+    """Следующий id комментария из зарезервированного процессом блока."""
+    global _ids
+    with _ids_lock:
+        pk = next(_ids, None)
+        if pk is None:
+            _ids = iter(allocate_comment_ids(ID_BLOCK))
+            pk = next(_ids)
+        return pk
+
+
+def group_by_shard(comments):
+    """
+    Раскладывает новые комментарии по шардам для bulk_create.
+
+    При шардировании заодно назначает им id: bulk_create в SQLite их
+    не возвращает, а автоинкремент шарда не уникален.
+    """
+    groups = {}
+    for comment in comments:
+        if settings.COMMENT_SHARDS and comment.pk is None:
+            comment.pk = next_comment_id()
+        groups.setdefault(shard_for(comment.news_id), []).append(comment)
+    return groups
+
+
+class CommentShardRouter:
+    """
+    Направляет комментарии в шард их новости.
+
+    Шард берётся из подсказки instance: комментарий или новость (для
+    news.comment_set). Связанные с комментарием новость и автор
+    читаются так, как если бы подсказки не было, — обычно из default.
+    """
+
+    @staticmethod
+    def comment_db(hints):
+        instance = hints.get('instance')
+        if _is_comment(instance):
+            if instance._state.db in settings.COMMENT_SHARDS:
+                return instance._state.db
+            if instance.news_id is not None:
+                return shard_for(instance.news_id)
+        if _is_news(instance) and instance.pk is not None:
+            return shard_for(instance.pk)
+        return None
+
+    def db_for_read(self, model, **hints):
+        if not settings.COMMENT_SHARDS:
+            return None
+        if _is_comment(model):
+            return self.comment_db(hints)
+        if _is_comment(hints.get('instance')):
+            return router.db_for_read(model)
+        return None
+
+    def db_for_write(self, model, **hints):
+        if not settings.COMMENT_SHARDS:
+            return None
+        if _is_comment(model):
+            return self.comment_db(hints)
+        if _is_comment(hints.get('instance')):
+            return router.db_for_write(model)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if settings.COMMENT_SHARDS and (
+            _is_comment(obj1) or _is_comment(obj2)
+        ):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # В шардах только таблица комментариев; в default она тоже
+        # остаётся — из неё reshard_comments переносит старые данные.
+        if db in settings.COMMENT_SHARDS:
+            return app_label == 'news' and model_name == 'comment'
+        return None
@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_init, post_migrate, post_save, pre_delete
+)
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+from yanews.response_cache import depend_on, purge
+
+from . import search
+from .fragments import invalidate_threads
+from .models import Comment, News
+from .shards import comment_databases
+
+# Отправляется после массовой записи комментариев в обход save()/delete()
+# (bulk_create, импорт и т.п.); аргумент news_ids — затронутые новости.
+comments_bulk_changed = Signal()
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    """
+    Новый комментарий увеличивает счётчик новости.
+
+    Любое сохранение, в том числе правка, отмечает новость изменённой.
+    """
+    changes = {'modified': timezone.now()}
+    if created:
+        changes['comment_count'] = F('comment_count') + 1
+    News.objects.filter(pk=instance.news_id).update(**changes)
+    invalidate_threads([instance.news_id])
+    purge(f'news:{instance.news_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """Удалённый комментарий уменьшает счётчик новости."""
+    News.objects.filter(pk=instance.news_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1, modified=timezone.now()
+    )
+    invalidate_threads([instance.news_id])
+    purge(f'news:{instance.news_id}')
+
+
+@receiver(comments_bulk_changed)
+def refresh_comment_counts(sender, news_ids, **kwargs):
+    """После массовых изменений пересчитываем счётчики целиком."""
+    news = News.objects.filter(pk__in=news_ids)
+    news.refresh_comment_counts()
+    news.update(modified=timezone.now())
+    invalidate_threads(news_ids)
+    # Массовая запись могла добавить и сами новости.
+    purge('news', *(f'news:{pk}' for pk in news_ids))
+
+
+@receiver(post_save, sender=News)
+def news_saved(sender, instance, created, **kwargs):
+    """
+    Изменение новости сбрасывает её страницу и ленту.
+
+    Новая новость к тому же начинает ветку комментариев с новой
+    версии: SQLite может выдать ей id удалённой новости.
+    """
+    if created:
+        invalidate_threads([instance.pk])
+    purge('news', f'news:{instance.pk}')
+
+
+@receiver(pre_delete, sender=News)
+def delete_news_comments(sender, instance, **kwargs):
+    """Каскадное удаление: комментарии могут лежать в другой базе."""
+    Comment.objects.for_news(instance).delete()
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def delete_user_comments(sender, instance, **kwargs):
+    for alias in comment_databases():
+        Comment.objects.using(alias).filter(author_id=instance.pk).delete()
+
+
+@receiver(post_delete, sender=News)
+def news_deleted(sender, instance, **kwargs):
+    purge('news', f'news:{instance.pk}')
+
+
+@receiver(post_init, sender=News)
+def news_loaded(sender, instance, **kwargs):
+    """Кешируемый ответ зависит от каждой прочитанной новости."""
+    if instance.pk is not None:
+        depend_on(f'news:{instance.pk}')
+
+
+@receiver(post_init, sender=Comment)
+def comment_loaded(sender, instance, **kwargs):
+    if instance.news_id is not None:
+        depend_on(f'news:{instance.news_id}')
+
+
+@receiver(post_migrate)
+def install_search_index(sender, using, **kwargs):
+    """Возвращает триггеры поиска, если миграция пересоздала таблицу."""
+    if sender.name == 'news' and router.allow_migrate_model(using, News):
+        search.install(connections[using])
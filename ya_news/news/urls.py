@@ -1,12 +1,20 @@
+from django.conf import settings
 from django.urls import path
 
 from news import views
 
 app_name = 'news'
 
+news_list, news_detail = views.NewsList, views.NewsDetailView
+if settings.NEWS_ASYNC_VIEWS:
+    from news import async_views
+    news_list = async_views.AsyncNewsList
+    news_detail = async_views.AsyncNewsDetailView
+
 urlpatterns = [
-    path('', views.NewsList.as_view(), name='home'),
-    path('news/<int:pk>/', views.NewsDetailView.as_view(), name='detail'),
+    path('', news_list.as_view(), name='home'),
+    path('news/<int:pk>/', news_detail.as_view(), name='detail'),
+    path('search/', views.NewsSearch.as_view(), name='search'),
     path(
         'delete_comment/<int:pk>/',
         views.CommentDelete.as_view(),
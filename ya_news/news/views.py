@@ -1,13 +1,43 @@
+import queue
+from urllib.parse import urlencode
+
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.views import generic
-
+from django.views.decorators.http import condition
+from yanews.replicas import read_from_replica
+from yanews.response_cache import cache_anonymous
+
+from .conditional import (
+    news_detail_etag, news_detail_last_modified, news_list_etag,
+    news_list_last_modified
+)
 from .forms import CommentForm
+from .fragments import comment_thread
+from .ingest import get_writer
 from .models import Comment, News
+from .pagination import locate_comment
+from .search import search_news
+
 
+def comment_url(comment):
+    """Адрес страницы новости, на которой виден комментарий."""
+    query = urlencode(locate_comment(
+        Comment.objects.for_news(comment.news_id), comment
+    ))
+    url = reverse('news:detail', kwargs={'pk': comment.news_id})
+    return f'{url}?{query}#comments' if query else f'{url}#comments'
 
+
+@read_from_replica
+@cache_anonymous(alias='pages', tags=('news',))
+@method_decorator(condition(
+    etag_func=news_list_etag, last_modified_func=news_list_last_modified
+), name='dispatch')
 class NewsList(generic.ListView):
     """Список новостей."""
     model = News
@@ -17,28 +47,38 @@ class NewsList(generic.ListView):
         """
         Выводим только несколько последних новостей.
 
-        Их количество определяется в настройках проекта.
+        Их количество определяется в настройках проекта. Полные тексты
+        ленте не нужны: она выводит сохранённое начало текста.
         """
-        return self.model.objects.prefetch_related(
-            'comment_set'
-        )[:settings.NEWS_COUNT_ON_HOME_PAGE]
+        return self.model.objects.defer('text')[
+            :settings.NEWS_COUNT_ON_HOME_PAGE
+        ]
 
 
+@method_decorator(condition(
+    etag_func=news_detail_etag, last_modified_func=news_detail_last_modified
+), name='dispatch')
 class NewsDetail(generic.DetailView):
     model = News
     template_name = 'news/detail.html'
 
     def get_object(self, queryset=None):
-        obj = get_object_or_404(
-            self.model.objects.prefetch_related('comment_set__author'),
-            pk=self.kwargs['pk']
-        )
-        return obj
+        return get_object_or_404(self.model, pk=self.kwargs['pk'])
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context['comments_page'] = comment_thread(
+            self.object,
+            settings.COMMENTS_COUNT_ON_DETAIL_PAGE,
+            after_cursor=self.request.GET.get('after'),
+            before_cursor=self.request.GET.get('before'),
+        )
         if self.request.user.is_authenticated:
             context['form'] = CommentForm()
+            if settings.COMMENTS_WRITE_BEHIND:
+                context['pending_comments'] = get_writer().pending_for(
+                    self.object.pk, self.request.user.pk
+                )
         return context
 
 
@@ -59,14 +99,32 @@ class NewsComment(
         comment = form.save(commit=False)
         comment.news = self.object
         comment.author = self.request.user
-        comment.save()
+        if not self.enqueue(comment):
+            comment.save()
+        self.comment = comment
         return super().form_valid(form)
 
+    @staticmethod
+    def enqueue(comment):
+        """
+        В режиме отложенной записи отдаёт комментарий фоновому писателю.
+
+        Если очередь переполнена, комментарий сохраняется как обычно.
+        """
+        if not settings.COMMENTS_WRITE_BEHIND:
+            return False
+        try:
+            get_writer().submit(comment)
+        except queue.Full:
+            return False
+        return True
+
     def get_success_url(self):
-        post = self.get_object()
-        return reverse('news:detail', kwargs={'pk': post.pk}) + '#comments'
+        return comment_url(self.comment)
 
 
+@read_from_replica
+@cache_anonymous(alias='pages_files')
 class NewsDetailView(generic.View):
 
     def get(self, request, *args, **kwargs):
@@ -78,19 +136,38 @@ class NewsDetailView(generic.View):
         return view(request, *args, **kwargs)
 
 
+class NewsSearch(generic.ListView):
+    """Полнотекстовый поиск по заголовкам и текстам новостей."""
+    template_name = 'news/search.html'
+
+    def get_queryset(self):
+        return search_news(self.request.GET.get('q', ''))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        return context
+
+
 class CommentBase(LoginRequiredMixin):
     """Базовый класс для работы с комментариями."""
     model = Comment
 
     def get_success_url(self):
-        comment = self.get_object()
-        return reverse(
-            'news:detail', kwargs={'pk': comment.news.pk}
-        ) + '#comments'
+        return comment_url(self.object)
 
     def get_queryset(self):
         """Пользователь может работать только со своими комментариями."""
-        return self.model.objects.filter(author=self.request.user)
+        return self.model.objects.with_related('news').filter(
+            author=self.request.user
+        )
+
+    def get_object(self, queryset=None):
+        """По id шард комментария неизвестен: ищем во всех."""
+        try:
+            return self.get_queryset().get_from_shards(pk=self.kwargs['pk'])
+        except self.model.DoesNotExist:
+            raise Http404('Комментарий не найден.')
 
 
 class CommentUpdate(CommentBase, generic.UpdateView):
@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanews.settings')
+# Под ASGI лента и страница новости работают без потоков sync_to_async
+# на каждый запрос; NEWS_ASYNC_VIEWS=0 возвращает синхронные view.
+os.environ.setdefault('NEWS_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -0,0 +1,132 @@
+"""Учёт SQL-запросов, выполненных при обработке HTTP-запроса."""
+import asyncio
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('yanews.queries')
+
+HEADER = 'X-DB-Queries'
+
+_current = ContextVar('query_stats', default=None)
+
+
+class QueryStats:
+    """Счётчик запросов; подключается через connection.execute_wrapper."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            # Один и тот же запрос к разным базам (шардам) — не повтор.
+            self.statements[
+                (context['connection'].alias, sql, repr(params))
+            ] += 1
+
+    @property
+    def duplicates(self):
+        """Сколько запросов повторили уже выполненный с теми же params."""
+        return sum(times - 1 for times in self.statements.values())
+
+    def duplicated_sql(self):
+        return [
+            sql for (_, sql, _), times in self.statements.items()
+            if times > 1
+        ]
+
+    def __str__(self):
+        return (
+            f'count={self.count}; time={self.duration * 1000:.1f}ms; '
+            f'duplicates={self.duplicates}'
+        )
+
+
+@contextmanager
+def collect_queries(stats=None):
+    """
+    Считает запросы соединений текущего потока в stats.
+
+    Без аргумента берётся статистика обрабатываемого HTTP-запроса, так
+    что потоки, выполняющие запросы к базе за async-view, подключаются
+    к ней сами.
+    """
+    stats = stats or _current.get()
+    with ExitStack() as stack:
+        if stats is not None:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+        yield
+
+
+class QueryStatsMiddleware:
+    """
+    Считает запросы, их суммарное время и дубликаты для каждого запроса.
+
+    Статистика пишется в лог yanews.queries и сохраняется в
+    request.query_stats; при DEBUG она также отдаётся в заголовке
+    X-DB-Queries. Middleware стоит первым, чтобы учесть и запросы
+    сессий и аутентификации.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так же, как MiddlewareMixin: по этому признаку Django
+            # отличает async-middleware.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats, token = self.start(request)
+        try:
+            with collect_queries(stats):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        # Запросы в потоках sync_to_async (сессия, аутентификация) здесь
+        # не видны; пул news.async_views подключается через
+        # collect_queries().
+        stats, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats)
+
+    @staticmethod
+    def start(request):
+        stats = request.query_stats = QueryStats()
+        return stats, _current.set(stats)
+
+    @staticmethod
+    def finish(request, response, stats):
+        if stats.duplicates:
+            logger.warning(
+                '%s %s: %s; повторяются: %s', request.method,
+                request.path, stats, stats.duplicated_sql()
+            )
+        else:
+            logger.info('%s %s: %s', request.method, request.path, stats)
+        if settings.DEBUG:
+            response[HEADER] = str(stats)
+        return response
@@ -0,0 +1,163 @@
+"""
+Чтение ленты и страниц новостей с локальных копий базы.
+
+Копии (NEWS_READ_REPLICAS) — снимки основной базы, которые
+обновляет команда sync_replicas. Читать с копии можно только view,
+отмеченным декоратором read_from_replica, и только в GET/HEAD;
+остальные запросы и любая запись идут в основную базу.
+
+Копия отстаёт от основной базы на интервал синхронизации. Чтобы
+пользователь сразу видел то, что сам записал, после успешного
+изменяющего запроса ReplicaMiddleware ставит cookie, и следующие
+REPLICA_PIN_SECONDS секунд все его запросы читают основную базу.
+
+Кеши страниц и веток комментариев сбрасываются при записи, а копия
+получает запись позже. Поэтому sync_replicas рядом с файлом копии
+записывает время, на которое копия совпадает с основной базой
+(synced_at), и всё, что прочитано с копии, считается собранным в этот
+момент: сброшенное после него устаревает до следующей синхронизации.
+"""
+import asyncio
+import os
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+PIN_COOKIE = 'read_primary'
+SYNCED_SUFFIX = '.synced'
+
+# Сессии и пользователи всегда читаются из основной базы: только что
+# созданной сессии на копии ещё нет.
+REPLICA_APPS = {'news'}
+
+_use_replica = ContextVar('use_replica', default=False)
+_synced_at = ContextVar('replica_synced_at', default=None)
+
+
+def read_from_replica(view):
+    """Разрешает view-функции или классу-view читать с копии базы."""
+    view.read_from_replica = True
+    return view
+
+
+def reading_from_replica():
+    """Читает ли текущий запрос с копии базы."""
+    return _use_replica.get() and bool(settings.NEWS_READ_REPLICAS)
+
+
+def _synced_path(alias):
+    return f"{connections[alias].settings_dict['NAME']}{SYNCED_SUFFIX}"
+
+
+def mark_synced(alias, moment):
+    """Запоминает, что копия alias содержит все записи до moment."""
+    path = _synced_path(alias)
+    with open(f'{path}.tmp', 'w') as stamp:
+        stamp.write(repr(moment))
+    os.replace(f'{path}.tmp', path)
+
+
+def synced_at():
+    """
+    Время, до которого все копии содержат записи основной базы: начало
+    последней синхронизации самой давней из них, 0 — если какую-то
+    копию ещё не синхронизировали.
+    """
+    moments = []
+    for alias in settings.NEWS_READ_REPLICAS:
+        try:
+            with open(_synced_path(alias)) as stamp:
+                moments.append(float(stamp.read()))
+        except (OSError, ValueError):
+            return 0.0
+    return min(moments, default=0.0)
+
+
+def replica_synced_at():
+    """synced_at() копий, если текущий запрос читает с них, иначе None."""
+    return _synced_at.get() if reading_from_replica() else None
+
+
+def _allowed(view_func):
+    return getattr(view_func, 'read_from_replica', False) or getattr(
+        getattr(view_func, 'view_class', None), 'read_from_replica', False
+    )
+
+
+class ReplicaRouter:
+    """Чтение новостей в отмеченных view — со случайной копии."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in REPLICA_APPS and reading_from_replica():
+            return random.choice(settings.NEWS_READ_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Копии содержат те же строки, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает на копии вместе с данными.
+        return db not in settings.NEWS_READ_REPLICAS
+
+
+class ReplicaMiddleware:
+    """
+    Включает чтение с копии для отмеченных view и закрепляет
+    пользователя за основной базой после его изменений.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.set(False)
+            _synced_at.set(None)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        try:
+            response = await self.get_response(request)
+        finally:
+            _use_replica.set(False)
+            _synced_at.set(None)
+        return self.pin(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _use_replica.set(
+            request.method in ('GET', 'HEAD')
+            and PIN_COOKIE not in request.COOKIES
+            and _allowed(view_func)
+        )
+        if reading_from_replica():
+            # Кеш ответов сверит это время с отметками сброса тегов.
+            request.data_as_of = synced_at()
+            _synced_at.set(request.data_as_of)
+
+    @staticmethod
+    def pin(request, response):
+        if (
+            settings.NEWS_READ_REPLICAS
+            and request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+            and response.status_code < 400
+        ):
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
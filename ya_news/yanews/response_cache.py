@@ -0,0 +1,204 @@
+"""
+Кеш готовых ответов для анонимных посетителей.
+
+Шаблоны читают user и CSRF-токен, поэтому общий кеш страниц Django
+для них небезопасен. Здесь кешируются только GET/HEAD-запросы без
+cookie сессии, и только у view, отмеченных декоратором cache_anonymous;
+декоратор же выбирает, в каком кеше из CACHES хранить страницы.
+
+Каждый ответ помнит теги данных, из которых он собран (например,
+news:42). Теги добавляет view или код моделей через depend_on(), а
+purge() отмечает время изменения тега. Ответ, собранный раньше
+последнего изменения любого из его тегов, считается устаревшим. Если
+view читает данные, отстающие от базы (копию), он ставит в
+request.data_as_of время, на которое они актуальны: ответ считается
+собранным в этот момент.
+
+Отметки тегов лежат в кеше RESPONSE_CACHE_TAGS_ALIAS, общем для
+процессов: запись в одном процессе сбрасывает страницы, сохранённые
+в памяти других.
+"""
+import asyncio
+import hashlib
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from django.utils.translation import get_language
+
+HEADER = 'X-Response-Cache'
+
+_tags = ContextVar('response_cache_tags', default=None)
+
+
+def cache_anonymous(alias=None, timeout=None, tags=()):
+    """
+    Включает кеш ответов для view-функции или класса-view.
+
+    alias — кеш из settings.RESPONSE_CACHE_ALIASES (по умолчанию
+    первый), timeout — время жизни ответа (по умолчанию TIMEOUT кеша),
+    tags — теги, от которых страница зависит целиком.
+    """
+    def decorator(view):
+        view.response_cache = {
+            'alias': alias or settings.RESPONSE_CACHE_ALIASES[0],
+            'timeout': timeout,
+            'tags': tuple(tags),
+        }
+        return view
+    return decorator
+
+
+def depend_on(*tags):
+    """Отмечает, что кешируемый сейчас ответ зависит от тегов."""
+    collected = _tags.get()
+    if collected is not None:
+        collected.update(tags)
+
+
+def _tag_key(tag):
+    return f'response:tag:{tag}'
+
+
+def _marks():
+    return caches[settings.RESPONSE_CACHE_TAGS_ALIAS]
+
+
+def _mark(tags):
+    _marks().set_many(
+        {_tag_key(tag): time.time() for tag in tags}, timeout=None
+    )
+
+
+def purge(*tags):
+    """
+    Сбрасывает ответы, зависящие от тегов.
+
+    Отметка ставится сразу и ещё раз после коммита, чтобы ответ,
+    собранный из данных до коммита, не пережил изменение.
+    """
+    _mark(tags)
+    transaction.on_commit(lambda: _mark(tags))
+
+
+def _view_options(view_func):
+    options = getattr(view_func, 'response_cache', None)
+    if options is None:
+        options = getattr(
+            getattr(view_func, 'view_class', None), 'response_cache', None
+        )
+    return options
+
+
+class AnonymousCacheMiddleware:
+    """
+    Отдаёт анонимам сохранённые ответы отмеченных view.
+
+    Ставится в начало MIDDLEWARE, чтобы сохранять ответ со всеми
+    cookie и заголовками остальных middleware; process_view же
+    вызывается, когда сессия и пользователь уже известны.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        try:
+            response = self.get_response(request)
+            pending = getattr(request, '_response_cache', None)
+            if pending is not None:
+                self.store(request, response, *pending)
+        finally:
+            _tags.set(None)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        pending = getattr(request, '_response_cache', None)
+        if pending is not None:
+            await sync_to_async(self.store, thread_sensitive=False)(
+                request, response, *pending
+            )
+        return response
+
+    @staticmethod
+    def cacheable_request(request):
+        return (
+            request.method in ('GET', 'HEAD')
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        )
+
+    @staticmethod
+    def cacheable_response(response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and 'private' not in response.get('Cache-Control', '')
+        )
+
+    @staticmethod
+    def key(request):
+        raw = f'{request.build_absolute_uri()}|{get_language()}'
+        return 'response:page:' + hashlib.md5(raw.encode()).hexdigest()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        options = _view_options(view_func)
+        if options is None or not self.cacheable_request(request):
+            return None
+        cache = caches[options['alias']]
+        key = self.key(request)
+        started = time.time()
+        entry = cache.get(key)
+        if entry is not None and self.fresh(entry):
+            response = entry['response']
+            response[HEADER] = 'hit'
+            return get_conditional_response(
+                request,
+                etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    response.get('Last-Modified', '')
+                ),
+                response=response,
+            )
+        collected = set(options['tags'])
+        _tags.set(collected)
+        request._response_cache = (options, cache, key, started, collected)
+        return None
+
+    @staticmethod
+    def fresh(entry):
+        changed = _marks().get_many(map(_tag_key, entry['tags']))
+        return len(changed) == len(entry['tags']) and all(
+            mark < entry['started'] for mark in changed.values()
+        )
+
+    def store(self, request, response, options, cache, key, started, tags):
+        if not self.cacheable_response(response):
+            return
+        started = min(started, getattr(request, 'data_as_of', started))
+        # Тег без отметки (новый или вытесненный из кеша) считается
+        # только что изменённым: этот ответ сразу устареет, а следующий
+        # уже будет свежим.
+        marks = _marks()
+        for tag in tags:
+            marks.add(_tag_key(tag), time.time(), timeout=None)
+        response[HEADER] = 'miss'
+        timeout = options['timeout']
+        cache.set(
+            key,
+            {'response': response, 'started': started, 'tags': list(tags)},
+            **({} if timeout is None else {'timeout': timeout}),
+        )
@@ -1,3 +1,5 @@
+import os
+import tempfile
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -21,6 +23,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yanews.middleware.QueryStatsMiddleware',
+    'yanews.response_cache.AnonymousCacheMiddleware',
+    'yanews.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,11 +58,99 @@ WSGI_APPLICATION = 'yanews.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # sqlite3 с прагмами WAL, busy_timeout и т.д., см. yanews/sqlite.
+        'ENGINE': 'yanews.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Соединение живёт между запросами, а не открывается заново.
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            # Переопределяют yanews.sqlite.base.DEFAULT_PRAGMAS.
+            'pragmas': {},
+        },
+    }
+}
+
+# Локальные копии базы только для чтения (yanews.replicas): пути к
+# файлам SQLite через запятую. Копии обновляет команда sync_replicas.
+NEWS_READ_REPLICAS = []
+for number, path in enumerate(filter(None, os.environ.get(
+    'YANEWS_DB_REPLICAS', ''
+).split(','))):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': path,
+        'OPTIONS': {'pragmas': {'query_only': 'ON'}},
+        # В тестах копия — та же тестовая база.
+        'TEST': {'MIRROR': 'default'},
+    }
+    NEWS_READ_REPLICAS.append(alias)
+
+# Шарды комментариев (news.shards): пути к файлам SQLite через запятую.
+# После изменения списка запустите reshard_comments.
+COMMENT_SHARDS = []
+for number, path in enumerate(filter(None, os.environ.get(
+    'YANEWS_COMMENT_SHARDS', ''
+).split(','))):
+    alias = f'comments{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': path,
     }
+    COMMENT_SHARDS.append(alias)
+
+DATABASE_ROUTERS = [
+    'news.shards.CommentShardRouter',
+    'yanews.replicas.ReplicaRouter',
+]
+
+# Сколько секунд после своего изменения пользователь читает основную
+# базу; должно быть больше интервала запуска sync_replicas.
+REPLICA_PIN_SECONDS = 60 * 5
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Готовые страницы для анонимов. Память процесса ограничена
+    # MAX_ENTRIES; страниц новостей много, поэтому они лежат в файлах.
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pages',
+        'TIMEOUT': 60,
+        'OPTIONS': {'MAX_ENTRIES': 200},
+    },
+    'pages_files': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'yanews-pages'),
+        'TIMEOUT': 60 * 10,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Ветки комментариев (news.fragments) и их версии. Кеш должен быть
+    # общим для всех процессов: запись в одном процессе меняет версию
+    # ветки, и другие не должны читать старую. Файлы общие для
+    # процессов одного узла; для нескольких узлов нужен сетевой кеш.
+    'comments': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'yanews-comments'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Отметки изменения тегов кеша ответов. Как и 'comments', общий
+    # для процессов: иначе запись в одном процессе не сбросит ленту,
+    # сохранённую в памяти ('pages') другого.
+    'response_tags': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'yanews-tags'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
 }
 
+# Кеши, в которых AnonymousCacheMiddleware хранит ответы, и кеш отметок
+# тегов, по которым purge() сбрасывает ответы во всех.
+RESPONSE_CACHE_ALIASES = ('pages', 'pages_files')
+RESPONSE_CACHE_TAGS_ALIAS = 'response_tags'
+
 
 AUTH_PASSWORD_VALIDATORS = []
 
@@ -80,3 +173,29 @@ LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('news:home')
 
 NEWS_COUNT_ON_HOME_PAGE = 10
+
+COMMENTS_COUNT_ON_DETAIL_PAGE = 50
+
+# Кеш веток комментариев из CACHES и время жизни страницы в нём, секунды.
+COMMENTS_CACHE_ALIAS = 'comments'
+COMMENTS_CACHE_TIMEOUT = 60 * 10
+
+# Отложенная запись комментариев (news.ingest): очередь в памяти
+# процесса и фоновая запись пачками. Недописанное теряется при падении.
+COMMENTS_WRITE_BEHIND = False
+COMMENTS_WRITE_BEHIND_BATCH = 200
+COMMENTS_WRITE_BEHIND_INTERVAL = 0.05
+COMMENTS_WRITE_BEHIND_MAX_PENDING = 10000
+
+NEWS_SEARCH_RESULTS_COUNT = 20
+
+# Асинхронные view ленты и страницы новости (news.async_views); asgi.py
+# включает их по умолчанию. Запросы к базе они выполняют в пуле из
+# NEWS_ASYNC_DB_WORKERS потоков.
+NEWS_ASYNC_VIEWS = os.environ.get('NEWS_ASYNC_VIEWS') == '1'
+NEWS_ASYNC_DB_WORKERS = int(os.environ.get('NEWS_ASYNC_DB_WORKERS', 8))
+
+# Дополнительный словарь запрещённых слов: файл, одно слово на строку.
+BAD_WORDS_FILE = None
+BAD_WORDS_LOOKALIKES = True
+BAD_WORDS_WHOLE_WORDS = False
@@ -0,0 +1,10 @@
+"""
+Бенчмарки проекта.
+
+Общий для YaNews и YaNote код нагрузочного прогона (loadtest) лежит в
+корне репозитория, поэтому корень добавляется в sys.path.
+"""
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
@@ -0,0 +1,88 @@
+"""Выгрузка и загрузка архива из --notes заметок одного пользователя.
+
+Заметки создаёт generate_dataset. Каждый формат выгружается страницей
+выгрузки в файл (время и пик памяти за всю выгрузку), затем файл
+загружается одной транзакцией, как командой import_notes:
+- import_taken_s — второму пользователю той же базы: все slug архива
+  заняты, и каждая заметка получает новый slug по заголовку;
+- import_free_s — тому же автору после удаления его заметок, как при
+  переезде на новую базу: slug архива свободны и сохраняются.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.common import get_client, peak_memory_kb, report, setup_django
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return round(time.perf_counter() - start, 3), result
+
+
+def export_to(client, format, path):
+    response = client.get('/export/', {'format': format})
+    with open(path, 'wb') as output:
+        for chunk in response.streaming_content:
+            output.write(chunk)
+
+
+def import_from(user, path):
+    from notes.archive import import_notes
+
+    with open(path, 'rb') as archive:
+        return import_notes(user, archive, exclusive=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--notes', type=int, default=100000)
+    parser.add_argument('--formats', nargs='+', default=['jsonl', 'zip'])
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+
+    from notes.models import Note
+
+    call_command(
+        'generate_dataset', users=1, notes_per_user=args.notes,
+        stdout=open(os.devnull, 'w'),
+    )
+    author = get_user_model().objects.get()
+    reader = get_user_model().objects.create_user(username='reader')
+    client = get_client()
+    client.force_login(author)
+    directory = tempfile.mkdtemp(prefix='yanote-archive-')
+    paths = {
+        format: os.path.join(directory, f'notes.{format}')
+        for format in args.formats
+    }
+
+    results = {}
+    for format, path in paths.items():
+        export_s, _ = timed(lambda: export_to(client, format, path))
+        import_s, count = timed(lambda: import_from(reader, path))
+        Note.objects.filter(author=reader).delete()
+        results[format] = {
+            'export_s': export_s,
+            'export_peak_kb': peak_memory_kb(
+                lambda: export_to(client, format, path)
+            ),
+            'size_mb': round(os.path.getsize(path) / 2 ** 20, 1),
+            'import_taken_s': import_s,
+            'imported': count,
+        }
+    for format, path in paths.items():
+        Note.objects.filter(author=author).delete()
+        results[format]['import_free_s'], _ = timed(
+            lambda: import_from(author, path)
+        )
+    report({'notes': args.notes, 'formats': results})
+
+
+if __name__ == '__main__':
+    main()
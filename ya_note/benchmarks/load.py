@@ -0,0 +1,83 @@
+"""Нагрузочный прогон YaNote по сценариям пользователей.
+
+Виртуальные пользователи повторяют сценарий: главная, вход, список
+заметок, создание заметки, её просмотр, правка и удаление, выход. У
+каждого пользователя заранее есть --notes заметок. Параметры прогона,
+транспорт и отчёт — общие для проектов, см. loadtest в корне
+репозитория.
+"""
+import itertools
+from functools import partial
+
+from benchmarks.common import bulk_insert, setup_django
+from loadtest import PASSWORD, arguments, configure, execute
+
+
+def journey(browser, rng, username, counter):
+    browser.get('/')
+    browser.get('/auth/login/')
+    browser.post(
+        '/auth/login/', {'username': username, 'password': PASSWORD}
+    )
+    browser.get('/notes/')
+    slug = f'{username}-{next(counter)}'
+    browser.get('/add/')
+    browser.post('/add/', {
+        'title': f'Заметка {slug}',
+        'text': 'Текст заметки. ' * rng.randint(1, 20),
+        'slug': slug,
+    })
+    browser.get(f'/note/{slug}/')
+    browser.get(f'/edit/{slug}/')
+    browser.post(f'/edit/{slug}/', {
+        'title': f'Исправленная заметка {slug}',
+        'text': 'Исправленный текст.',
+        'slug': slug,
+    })
+    browser.get('/notes/')
+    browser.get(f'/delete/{slug}/')
+    browser.post(f'/delete/{slug}/', {})
+    browser.get('/auth/logout/')
+
+
+def seed(users, notes_per_user):
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+
+    from notes.models import Note
+
+    password = make_password(PASSWORD)
+    User = get_user_model()
+    User.objects.bulk_create([
+        User(username=f'load{number}', password=password)
+        for number in range(users)
+    ])
+    bulk_insert(Note, [
+        Note(
+            title=f'Заметка {number}', text='Текст заметки.',
+            slug=f'{user.username}-seed-{number}', author=user,
+        )
+        for user in User.objects.all()
+        for number in range(notes_per_user)
+    ])
+
+
+def main():
+    parser = arguments(__doc__)
+    parser.add_argument('--notes', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    configure(args, 'yanote.queries')
+    seed(args.users, args.notes)
+
+    from yanote.wsgi import application
+
+    # Номера slug общие для всех потоков: next() у count атомарен.
+    execute('yanote', application, args, partial(
+        journey, counter=itertools.count()
+    ))
+
+
+if __name__ == '__main__':
+    main()
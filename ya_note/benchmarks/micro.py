@@ -0,0 +1,257 @@
+"""Микробенчмарки горячих функций YaNote с эталоном в репозитории.
+
+    python -m benchmarks.micro run      # замерить и вывести
+    python -m benchmarks.micro save     # замерить и записать эталон
+    python -m benchmarks.micro compare  # замерить и сравнить с эталоном
+
+Для каждого случая хранятся замеры времени одного вызова по раундам и
+пик памяти за вызов (tracemalloc). compare считает случай замедлением,
+если критерий Манна — Уитни отличает новые замеры от эталона
+(p < --alpha) и медиана выросла больше чем на --threshold; памяти
+достаточно вырасти больше чем на --memory-threshold. При замедлениях
+команда завершается с кодом 1.
+
+Вместе со случаями меряется эталонная нагрузка на чистом Python
+(reference): новые замеры делятся на то, во сколько раз она стала
+медленнее, и общее замедление машины не принимается за регрессию.
+Каждый случай эталона хранит медиану reference своего прогона
+(reference_us), поэтому save с --filter перезаписывает только
+выбранные случаи, а остальные сравниваются со своей reference.
+
+Эталон зависит от машины: перед сравнением на другой машине запишите
+его там с кода базового коммита.
+"""
+import argparse
+import itertools
+import json
+import statistics
+import sys
+from pathlib import Path
+
+from benchmarks.common import (
+    mann_whitney_greater, peak_memory_kb, report, setup_django, time_rounds
+)
+from loadtest import commit
+
+BASELINE = Path(__file__).with_name('baselines') / 'micro.json'
+WORDS = 'Купить хлеб, молоко и яблоки; позвонить маме вечером в субботу.'
+
+
+def note_text(words):
+    vocabulary = WORDS.split()
+    return ' '.join(
+        vocabulary[number % len(vocabulary)] for number in range(words)
+    )
+
+
+def bench_author():
+    from django.contrib.auth import get_user_model
+
+    return get_user_model().objects.get_or_create(username='bench')[0]
+
+
+def seed_notes(count):
+    """Заметки автора bench, чтобы проверка slug шла по непустой таблице."""
+    from benchmarks.common import bulk_insert
+    from notes.models import Note
+
+    author = bench_author()
+    if not Note.objects.exists():
+        bulk_insert(Note, [
+            Note(
+                title=f'Заметка {number}', text=note_text(20),
+                slug=f'seed-{number}', author=author,
+            )
+            for number in range(count)
+        ])
+    return author
+
+
+def note_save_case(words):
+    from notes.models import Note
+
+    author = bench_author()
+    title = note_text(words)
+    counter = itertools.count()
+
+    def call():
+        Note(
+            title=f'{next(counter)} {title}', text=title, author=author
+        ).save()
+    return call
+
+
+def clean_slug_case(slug):
+    from notes.forms import NoteForm
+    from notes.models import Note
+
+    seed_notes(1000)
+    form = NoteForm(instance=Note())
+
+    def call():
+        form.cleaned_data = {'title': note_text(8), 'slug': slug}
+        form.clean_slug()
+    return call
+
+
+def list_case(notes_count):
+    from django.contrib.auth import get_user_model
+    from django.template.loader import get_template
+    from django.test import RequestFactory
+
+    from notes.models import Note
+
+    template = get_template('notes/list.html')
+    request = RequestFactory().get('/', HTTP_HOST='localhost')
+    request.user = get_user_model()(pk=1, username='bench')
+    context = {'object_list': [
+        Note(pk=number, title=note_text(5), slug=f'note-{number}')
+        for number in range(notes_count)
+    ]}
+    return lambda: template.render(context, request)
+
+
+def reference_case(size):
+    """Нагрузка, не зависящая от кода проекта: мерило скорости машины."""
+    words = note_text(size).split()
+    return lambda: sorted({word.lower(): len(word) for word in words})
+
+
+CASES = {
+    'reference': (reference_case, 1000),
+    **{
+        f'Note.save slugify[{words} words]': (note_save_case, words)
+        for words in (3, 15)
+    },
+    'NoteForm.clean_slug[explicit slug]': (clean_slug_case, 'my-note'),
+    'NoteForm.clean_slug[slug from title]': (clean_slug_case, ''),
+    **{
+        f'render notes/list.html[{count} notes]': (list_case, count)
+        for count in (10, 100, 1000)
+    },
+}
+
+
+def measure_cases(names, rounds):
+    funcs = [CASES[name][0](CASES[name][1]) for name in names]
+    return {
+        name: {
+            'median_us': round(statistics.median(samples) * 1e6, 3),
+            'peak_kb': peak_memory_kb(func),
+            'samples_us': [round(sample * 1e6, 3) for sample in samples],
+        }
+        for name, func, samples in zip(
+            names, funcs, time_rounds(funcs, rounds=rounds)
+        )
+    }
+
+
+def compare(results, baseline, args):
+    reference = results['reference']['median_us']
+    verdicts = {'reference': {'machine_speed_ratio': round(
+        reference / baseline['reference']['median_us'], 3
+    )}}
+    for name, result in results.items():
+        base = baseline.get(name)
+        if name == 'reference':
+            continue
+        if base is None:
+            verdicts[name] = {'time': 'new', 'memory': 'new'}
+            continue
+        # Эталоны без reference_us записаны одним прогоном со всеми
+        # случаями: для них годится общая reference.
+        speed = reference / base.get(
+            'reference_us', baseline['reference']['median_us']
+        )
+        samples = [sample / speed for sample in result['samples_us']]
+        ratio = statistics.median(samples) / base['median_us']
+        slower = mann_whitney_greater(samples, base['samples_us'])
+        faster = mann_whitney_greater(base['samples_us'], samples)
+        time = 'same'
+        if slower < args.alpha and ratio > 1 + args.threshold:
+            time = 'slower'
+        elif faster < args.alpha and ratio < 1 - args.threshold:
+            time = 'faster'
+        memory = result['peak_kb'] / base['peak_kb'] if base['peak_kb'] else 1
+        verdicts[name] = {
+            'time': time,
+            'time_ratio': round(ratio, 3),
+            'p_slower': round(slower, 4),
+            'memory': (
+                'more' if memory > 1 + args.memory_threshold else 'same'
+            ),
+            'memory_ratio': round(memory, 3),
+        }
+    return verdicts
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as baseline:
+        return json.load(baseline)
+
+
+def save(path, results):
+    """Записывает эталон; случаи, не попавшие в --filter, сохраняются."""
+    cases = load_baseline(path)['cases'] if path.exists() else {}
+    # Старые случаи без reference_us записаны с прежней reference.
+    if 'reference' in cases:
+        for case in cases.values():
+            case.setdefault('reference_us', cases['reference']['median_us'])
+    reference = results['reference']['median_us']
+    cases.update({
+        name: {**result, 'reference_us': reference}
+        for name, result in results.items()
+    })
+    path.parent.mkdir(exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump({
+            'commit': commit(),
+            'python': sys.version.split()[0],
+            'cases': cases,
+        }, output, ensure_ascii=False, indent=1)
+        output.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        'action', nargs='?', default='run', choices=('run', 'save', 'compare')
+    )
+    parser.add_argument('--rounds', type=int, default=30)
+    parser.add_argument('--filter', default='', help='Подстрока имени.')
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--alpha', type=float, default=0.01)
+    parser.add_argument('--threshold', type=float, default=0.20)
+    parser.add_argument('--memory-threshold', type=float, default=0.10)
+    args = parser.parse_args()
+
+    # Заметки сохраняются вне транзакции, как в обработчиках запросов;
+    # база временная, поэтому созданные замерами заметки не мешают.
+    setup_django()
+    names = ['reference'] + [
+        name for name in CASES if args.filter in name and name != 'reference'
+    ]
+    results = measure_cases(names, args.rounds)
+    if args.action == 'save':
+        save(args.baseline, results)
+    if args.action != 'compare':
+        return report({
+            name: {key: value for key, value in result.items()
+                   if key != 'samples_us'}
+            for name, result in results.items()
+        })
+
+    baseline = load_baseline(args.baseline)
+    verdicts = compare(results, baseline['cases'], args)
+    report({'baseline_commit': baseline['commit'], 'cases': verdicts})
+    if any(
+        verdict.get('time') == 'slower' or verdict.get('memory') == 'more'
+        for verdict in verdicts.values()
+    ):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Время ответа и пик памяти списка заметок в зависимости от их числа.
+
+«До» — прежний путь: все заметки автора с полными текстами в одном
+шаблоне; «после» — текущий NotesList: первая страница и, для сравнения,
+последняя (курсор after на предпоследней заметке) по индексу
+(author, id) без текстов.
+"""
+import argparse
+
+from benchmarks.common import (
+    bulk_insert, get_client, measure, peak_memory_kb, report, setup_django
+)
+
+
+def seed(author, count, text_length):
+    from notes.models import Note
+
+    bulk_insert(Note, [
+        Note(
+            title=f'Заметка {number}', text='т' * text_length,
+            slug=f'{author.username}-{number}', author=author,
+        )
+        for number in range(count)
+    ])
+
+
+def legacy_list(author):
+    from django.template.loader import get_template
+
+    from notes.models import Note
+
+    template = get_template('notes/list.html')
+    return lambda: template.render(
+        {'object_list': Note.objects.filter(author=author)}
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--counts', type=int, nargs='+', default=[100, 1000, 5000, 20000]
+    )
+    parser.add_argument('--text-length', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+
+    from notes.models import Note
+
+    client = get_client()
+    results = {}
+    for count in args.counts:
+        author = get_user_model().objects.create_user(username=f'a{count}')
+        seed(author, count, args.text_length)
+        client.force_login(author)
+        last = Note.objects.filter(author=author).order_by('-pk')[1].pk
+
+        def first_page():
+            return client.get('/notes/')
+
+        def last_page():
+            return client.get('/notes/', {'after': last})
+
+        before = legacy_list(author)
+        results[count] = {
+            'before': {
+                **measure(before, repeat=args.repeat),
+                'peak_kb': peak_memory_kb(before),
+            },
+            'first_page': {
+                **measure(first_page, repeat=args.repeat),
+                'peak_kb': peak_memory_kb(first_page),
+            },
+            'last_page': {
+                **measure(last_page, repeat=args.repeat),
+                'peak_kb': peak_memory_kb(last_page),
+            },
+        }
+    report({'text_length': args.text_length, 'notes': results})
+
+
+if __name__ == '__main__':
+    main()
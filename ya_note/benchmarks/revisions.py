@@ -0,0 +1,127 @@
+"""Хранение и скорость истории версий заметок с --revisions версиями.
+
+Для каждой из --notes заметок (--lines строк, около 60 символов в
+строке) сохраняется --revisions версий через Note.save(): правка,
+вставка или удаление случайной строки. Выводятся:
+- объём сохранённых данных версий против полных копий текста (и их
+  сжатия zlib по отдельности);
+- время Note.save() с записью версии;
+- время восстановления случайной версии (state) и худшей — последней
+  перед снимком, с самой длинной цепочкой разниц;
+- страницы списка версий, версии и восстановление.
+"""
+import argparse
+import random
+import zlib
+
+from benchmarks.common import (
+    get_client, measure, report, setup_django, summarize
+)
+
+WORDS = (
+    'купить молоко позвонить маме план на неделю идеи для проекта '
+    'список книг встреча с командой рецепт пирога отпуск'
+).split()
+
+
+def line(rng):
+    return ' '.join(rng.choices(WORDS, k=8)) + '\n'
+
+
+def edit(rng, lines):
+    position = rng.randrange(len(lines))
+    action = rng.random()
+    if action < 0.6:
+        lines[position] = line(rng)
+    elif action < 0.8 or len(lines) < 2:
+        lines.insert(position, line(rng))
+    else:
+        del lines[position]
+
+
+def timed_save(note):
+    import time
+
+    start = time.perf_counter()
+    note.save()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--notes', type=int, default=3)
+    parser.add_argument('--revisions', type=int, default=1000)
+    parser.add_argument('--lines', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.db.models import Sum
+    from django.db.models.functions import Length
+
+    from notes.models import Revision
+    from notes.revisions import SNAPSHOT_INTERVAL, state
+
+    rng = random.Random(42)
+    author = get_user_model().objects.create_user(username='bench')
+    full_bytes = full_zlib_bytes = 0
+    saves = []
+    notes = []
+    for number in range(args.notes):
+        lines = [line(rng) for _ in range(args.lines)]
+        note = author.note_set.model(
+            title=f'Заметка {number}', text=''.join(lines), author=author
+        )
+        saves.append(timed_save(note))
+        for _ in range(args.revisions):
+            text = note.text.encode()
+            full_bytes += len(text)
+            full_zlib_bytes += len(zlib.compress(text))
+            edit(rng, lines)
+            note.text = ''.join(lines)
+            saves.append(timed_save(note))
+        notes.append(note)
+
+    stored = Revision.objects.aggregate(size=Sum(Length('data')))['size']
+    numbers = [
+        (rng.choice(notes), rng.randint(1, args.revisions))
+        for _ in range(args.repeat)
+    ]
+    samples = iter(numbers)
+    worst = args.revisions - args.revisions % SNAPSHOT_INTERVAL
+
+    client = get_client()
+    client.force_login(author)
+    note = notes[0]
+    report({
+        'notes': args.notes,
+        'revisions_per_note': Revision.objects.filter(note=note).count(),
+        'text_kb': round(len(note.text.encode()) / 1024, 1),
+        'storage': {
+            'full_copies_kb': round(full_bytes / 1024),
+            'full_copies_zlib_kb': round(full_zlib_bytes / 1024),
+            'stored_kb': round(stored / 1024),
+            'ratio_to_full': round(full_bytes / stored, 1),
+        },
+        'save': summarize(saves),
+        'state_random': measure(
+            lambda: state(*next(samples)), repeat=args.repeat - 3
+        ),
+        'state_worst': measure(lambda: state(note, worst)),
+        'state_latest': measure(lambda: state(note)),
+        'list_page': measure(
+            lambda: client.get(f'/revisions/{note.slug}/', {'page': 10})
+        ),
+        'revision_page': measure(
+            lambda: client.get(f'/revisions/{note.slug}/{worst}/')
+        ),
+        'restore': measure(
+            lambda: client.post(f'/revisions/{note.slug}/{worst}/'),
+            repeat=20,
+        ),
+    })
+
+
+if __name__ == '__main__':
+    main()
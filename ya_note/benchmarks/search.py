@@ -0,0 +1,67 @@
+"""Время поиска по заметкам пользователя с --notes-per-user заметками.
+
+Заметки создаёт generate_dataset: словарь у него маленький, поэтому
+частые слова встречаются почти в каждой заметке автора и в заметках
+других пользователей. Редкое слово есть в одной заметке. Для каждого
+запроса меряются search_notes и страница поиска целиком.
+"""
+import argparse
+import os
+
+from benchmarks.common import get_client, measure, report, setup_django
+
+QUERIES = {
+    'rare': 'землетрясение',
+    'common': 'молоко',
+    'one_letter': 'м',
+    'prefix': 'мол',
+    'long_prefix': 'молок',
+    'long_word': 'позвонить',
+    'two_words': 'купить молоко',
+    'four_words': 'купить молоко позвонить маме',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=2)
+    parser.add_argument('--notes-per-user', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+
+    from notes.models import Note
+    from notes.search import search_notes
+
+    call_command(
+        'generate_dataset', users=args.users,
+        notes_per_user=args.notes_per_user, stdout=open(os.devnull, 'w'),
+    )
+    author = get_user_model().objects.order_by('pk').first()
+    Note.objects.create(
+        title='Новости', text='Вчера было землетрясение', author=author
+    )
+    client = get_client()
+    client.force_login(author)
+
+    results = {}
+    for name, query in QUERIES.items():
+        results[name] = {
+            'query': query,
+            'found': len(search_notes(author, query)),
+            'search_notes': measure(lambda: search_notes(author, query),
+                                    repeat=args.repeat),
+            'page': measure(lambda: client.get('/search/', {'q': query}),
+                            repeat=args.repeat),
+        }
+    report({
+        'notes_per_user': Note.objects.filter(author=author).count(),
+        'queries': results,
+    })
+
+
+if __name__ == '__main__':
+    main()
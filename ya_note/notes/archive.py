@@ -0,0 +1,338 @@
+"""
+Выгрузка заметок пользователя в архив и загрузка из него.
+
+Форматы:
+- jsonl — по объекту {"title", "text", "slug"} в строке;
+- zip — по файлу Markdown «<slug>.md» на заметку: в первой строке
+  заголовок после «# », затем пустая строка и текст.
+Размер заметки (файла zip после распаковки или строки jsonl) ограничен
+NOTES_IMPORT_MAX_NOTE_SIZE, а всего архива — NOTES_IMPORT_MAX_SIZE:
+иначе маленький zip или одна длинная строка заняли бы всю память.
+
+Выгрузка отдаёт генератор байтов для StreamingHttpResponse. Заметки
+читаются iterator() порциями по CHUNK_SIZE, zip пишется в поток без
+перемотки (ZipWriter), наружу уходят куски около BUFFER_SIZE, поэтому
+память не растёт с числом заметок.
+
+Загрузка вставляет заметки пачками через bulk_create, ошибка в любой
+заметке отменяет всю загрузку. Команда import_notes пишет всё в одной
+транзакции (search.bulk_index): поиск индексирует заметки разом в
+конце, но другие записи в базу ждут до конца загрузки. Страница
+загрузки сначала проверяет весь архив, а потом пишет пачками по
+WEB_BATCH_SIZE, каждую в своей транзакции, и чужие сохранения ждут не
+дольше одной пачки. slug пачкам выдаёт assign_slugs: занятые и пустые
+slug подбираются по заголовку, как при сохранении формы. Первую
+версию каждой заметки записывает revisions.record_imported.
+"""
+import json
+import struct
+import tempfile
+import time
+import zipfile
+import zlib
+from itertools import islice
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connections, router, transaction
+from django.template.defaultfilters import filesizeformat
+
+from .models import SAVE_ATTEMPTS, Note
+from .revisions import record_imported
+from .search import bulk_index
+from .slugs import SlugAllocator, assign_slugs
+
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson',
+    'zip': 'application/zip',
+}
+FIELDS = ('title', 'text', 'slug')
+CHUNK_SIZE = 2000
+BATCH_SIZE = 5000
+# Пачка страницы загрузки пишется с триггером поиска за доли секунды,
+# много меньше busy_timeout у ждущих её записей.
+WEB_BATCH_SIZE = 1000
+BUFFER_SIZE = 64 * 1024
+UTF8_NAMES = 0x800
+FILE_MODE = 0o644 << 16
+ZIP64_LIMIT = 0xffffffff
+
+
+class ZipWriter:
+    """
+    Zip, который пишется строго вперёд и отдаётся кусками.
+
+    zipfile держит в памяти ZipInfo каждого файла (около 0,5 КБ) до
+    записи оглавления в конце архива. Здесь записи оглавления сразу
+    сериализуются во временный файл, который уходит на диск после
+    BUFFER_SIZE, и память не зависит от числа файлов. Больше 65535
+    файлов или смещения за 4 ГБ записываются в формате zip64.
+    """
+
+    def __init__(self, compresslevel=6):
+        self.compresslevel = compresslevel
+        self.buffer = []
+        self.size = 0
+        self.offset = 0
+        self.count = 0
+        self.directory = tempfile.SpooledTemporaryFile(BUFFER_SIZE)
+        self.time, self.date = dos_datetime(time.localtime())
+
+    def write(self, data):
+        self.buffer.append(data)
+        self.size += len(data)
+        self.offset += len(data)
+
+    def take(self):
+        data = b''.join(self.buffer)
+        self.buffer = []
+        self.size = 0
+        return data
+
+    def add(self, name, content):
+        """Добавляет файл name с текстом content."""
+        name = name.encode()
+        content = content.encode()
+        compressor = zlib.compressobj(
+            self.compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS
+        )
+        data = compressor.compress(content) + compressor.flush()
+        crc = zlib.crc32(content)
+        offset = self.offset
+        self.write(struct.pack(
+            '<IHHHHHIIIHH', 0x04034b50, 20, UTF8_NAMES, zipfile.ZIP_DEFLATED,
+            self.time, self.date, crc, len(data), len(content), len(name), 0,
+        ) + name)
+        self.write(data)
+        extra = b''
+        if offset >= ZIP64_LIMIT:
+            extra = struct.pack('<HHQ', 1, 8, offset)
+            offset = ZIP64_LIMIT
+        self.directory.write(struct.pack(
+            '<IHHHHHHIIIHHHHHII', 0x02014b50, 45, 20, UTF8_NAMES,
+            zipfile.ZIP_DEFLATED, self.time, self.date, crc, len(data),
+            len(content), len(name), len(extra), 0, 0, 0, FILE_MODE, offset,
+        ) + name + extra)
+        self.count += 1
+
+    def finish(self):
+        """Дописывает оглавление и конец архива; отдаёт остаток кусками."""
+        start = self.offset
+        self.directory.seek(0)
+        for chunk in iter(lambda: self.directory.read(BUFFER_SIZE), b''):
+            self.write(chunk)
+            yield self.take()
+        self.directory.close()
+        size = self.offset - start
+        count = self.count
+        if count >= 0xffff or start >= ZIP64_LIMIT:
+            end = self.offset
+            self.write(struct.pack(
+                '<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0,
+                count, count, size, start,
+            ))
+            self.write(struct.pack('<IIQI', 0x07064b50, 0, end, 1))
+            count = 0xffff
+            start = min(start, ZIP64_LIMIT)
+        self.write(struct.pack(
+            '<IHHHHIIH', 0x06054b50, 0, 0, count, count, size, start, 0,
+        ))
+        yield self.take()
+
+
+def dos_datetime(moment):
+    return (
+        moment.tm_hour << 11 | moment.tm_min << 5 | moment.tm_sec // 2,
+        (moment.tm_year - 1980) << 9 | moment.tm_mon << 5 | moment.tm_mday,
+    )
+
+
+def export_notes(notes, format):
+    """Байты архива заметок в формате format, кусками."""
+    rows = notes.order_by('pk').values_list(*FIELDS).iterator(
+        chunk_size=CHUNK_SIZE
+    )
+    return EXPORTERS[format](rows)
+
+
+def export_jsonl(rows):
+    lines, size = [], 0
+    for title, text, slug in rows:
+        line = json.dumps(
+            {'title': title, 'text': text, 'slug': slug}, ensure_ascii=False
+        ).encode() + b'\n'
+        lines.append(line)
+        size += len(line)
+        if size >= BUFFER_SIZE:
+            yield b''.join(lines)
+            lines, size = [], 0
+    if lines:
+        yield b''.join(lines)
+
+
+def export_zip(rows):
+    archive = ZipWriter()
+    for title, text, slug in rows:
+        archive.add(f'{slug}.md', f'# {title}\n\n{text}')
+        if archive.size >= BUFFER_SIZE:
+            yield archive.take()
+    yield from archive.finish()
+
+
+EXPORTERS = {'jsonl': export_jsonl, 'zip': export_zip}
+
+
+def read_jsonl(archive):
+    limit = settings.NOTES_IMPORT_MAX_NOTE_SIZE
+    left = settings.NOTES_IMPORT_MAX_SIZE
+    # Строка читается не длиннее лимита: иначе одна строка без переводов
+    # строки целиком попала бы в память.
+    for number, line in enumerate(
+        iter(lambda: archive.readline(limit + 1), b''), 1
+    ):
+        if len(line) > limit:
+            raise ValidationError(
+                f'Строка {number}: больше {filesizeformat(limit)}.'
+            )
+        left -= len(line)
+        if left < 0:
+            raise ValidationError('Архив больше {}.'.format(
+                filesizeformat(settings.NOTES_IMPORT_MAX_SIZE)
+            ))
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            raise ValidationError(f'Строка {number}: это не JSON.')
+        if not isinstance(row, dict):
+            raise ValidationError(f'Строка {number}: ожидается объект.')
+        yield f'Строка {number}', row
+
+
+def read_zip(archive):
+    left = settings.NOTES_IMPORT_MAX_SIZE
+    with zipfile.ZipFile(archive) as files:
+        for info in files.infolist():
+            path = PurePosixPath(info.filename)
+            if info.is_dir() or path.suffix != '.md':
+                continue
+            data = read_member(files, info, left)
+            left -= len(data)
+            try:
+                content = data.decode()
+            except UnicodeDecodeError:
+                raise ValidationError(f'{info.filename}: не UTF-8.')
+            heading, _, text = content.partition('\n\n')
+            if not heading.startswith('# '):
+                raise ValidationError(
+                    f'{info.filename}: нет заголовка «# ...» в первой строке.'
+                )
+            yield info.filename, {
+                'title': heading[2:], 'text': text, 'slug': path.stem,
+            }
+
+
+def read_member(files, info, left):
+    """
+    Распакованный файл архива, если он не больше лимита заметки и
+    оставшихся left байт лимита архива.
+
+    Размер проверяется по заголовку до распаковки; zipfile не отдаёт
+    больше заявленного, а read() ограничен ещё и сам.
+    """
+    limit = settings.NOTES_IMPORT_MAX_NOTE_SIZE
+    if info.file_size > limit:
+        raise ValidationError(
+            f'{info.filename}: больше {filesizeformat(limit)} '
+            'после распаковки.'
+        )
+    if info.file_size > left:
+        raise ValidationError('Архив больше {} после распаковки.'.format(
+            filesizeformat(settings.NOTES_IMPORT_MAX_SIZE)
+        ))
+    try:
+        with files.open(info) as file:
+            return file.read(info.file_size)
+    except (zipfile.BadZipFile, zlib.error):
+        raise ValidationError(f'{info.filename}: файл повреждён.')
+
+
+def build_note(author, where, row):
+    note = Note(
+        author=author,
+        **{name: row.get(name) or '' for name in FIELDS},
+    )
+    try:
+        note.clean_fields(exclude=('author',))
+    except ValidationError as error:
+        raise ValidationError('{}: {}'.format(where, ' '.join(
+            f'{Note._meta.get_field(name).verbose_name} — '
+            f'{" ".join(messages)}'
+            for name, messages in error.message_dict.items()
+        )))
+    return note
+
+
+def read_notes(author, archive):
+    """Проверенные, ещё не сохранённые заметки архива по одной."""
+    archive.seek(0)
+    is_zip = zipfile.is_zipfile(archive)
+    archive.seek(0)
+    rows = read_zip(archive) if is_zip else read_jsonl(archive)
+    return (build_note(author, where, row) for where, row in rows)
+
+
+def batches(notes, size):
+    while True:
+        batch = list(islice(notes, size))
+        if not batch:
+            return
+        yield batch
+
+
+def import_notes(author, archive, exclusive=False):
+    """
+    Загружает заметки автору из файла jsonl или zip; вернёт их число.
+
+    exclusive — одна транзакция на всю загрузку (команда import_notes),
+    иначе транзакция на пачку (страница загрузки).
+    """
+    count = 0
+    if exclusive:
+        slugs = SlugAllocator()
+        with bulk_index(connections[router.db_for_write(Note)]):
+            for notes in batches(read_notes(author, archive), BATCH_SIZE):
+                Note.objects.bulk_create(assign_slugs(notes, slugs))
+                record_imported(notes)
+                count += len(notes)
+        return count
+    for _ in read_notes(author, archive):
+        pass
+    for notes in batches(read_notes(author, archive), WEB_BATCH_SIZE):
+        insert_batch(notes)
+        count += len(notes)
+    return count
+
+
+def insert_batch(notes):
+    """
+    Вставляет пачку в своей транзакции.
+
+    Между пачками slug могут занять другие записи, поэтому они
+    подбираются для каждой пачки заново, а при совпадении — ещё раз.
+    Подбор идёт до транзакции: транзакция SQLite, начатая чтением, не
+    ждёт busy_timeout, а сразу падает, если база изменилась до записи.
+    """
+    using = router.db_for_write(Note)
+    for attempt in range(SAVE_ATTEMPTS):
+        assign_slugs(notes)
+        try:
+            with transaction.atomic(using=using):
+                Note.objects.bulk_create(notes)
+                record_imported(notes)
+            return
+        except IntegrityError:
+            if attempt == SAVE_ATTEMPTS - 1:
+                raise
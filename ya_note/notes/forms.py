@@ -1,5 +1,3 @@
-from pytils.translit import slugify
-
 from django import forms
 from django.core.exceptions import ValidationError
 
@@ -16,14 +14,34 @@ class NoteForm(forms.ModelForm):
         fields = ('title', 'text', 'slug')
 
     def clean_slug(self):
-        """Обрабатывает случай, если slug не уникален."""
-        cleaned_data = super().clean()
-        slug = cleaned_data.get('slug')
+        """
+        Проверяет, что введённый пользователем slug не занят.
+
+        Пустой slug подберёт по заголовку Note.save, при совпадении —
+        с суффиксом -N.
+        """
+        slug = self.cleaned_data.get('slug')
         if not slug:
-            title = cleaned_data.get('title')
-            slug = slugify(title)[:100]
+            return slug
         if Note.objects.filter(
                 slug=slug
         ).exclude(id=self.instance.pk).exists():
             raise ValidationError(slug + WARNING)
         return slug
+
+    def validate_unique(self):
+        # Уникальность slug уже проверена в clean_slug, второй запрос
+        # модели не нужен.
+        exclude = [*self._get_validation_exclusions(), 'slug']
+        try:
+            self.instance.validate_unique(exclude=exclude)
+        except ValidationError as error:
+            self._update_errors(error)
+
+
+class ImportForm(forms.Form):
+    """Форма загрузки архива заметок."""
+    archive = forms.FileField(
+        label='Архив',
+        help_text='Файл .zip с заметками в Markdown или .jsonl',
+    )
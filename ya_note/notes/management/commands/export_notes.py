@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.archive import CONTENT_TYPES, export_notes
+from notes.models import Note
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает все заметки пользователя в архив, как страница '
+        'выгрузки: zip с Markdown или jsonl.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=sorted(CONTENT_TYPES), default='zip'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            author = get_user_model().objects.get(
+                username=options['username']
+            )
+        except get_user_model().DoesNotExist:
+            raise CommandError('Нет такого пользователя.')
+        with open(options['path'], 'wb') as output:
+            for chunk in export_notes(
+                Note.objects.filter(author=author), options['format']
+            ):
+                output.write(chunk)
@@ -0,0 +1,140 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from notes.models import Note, Revision
+from notes.revisions import ids_by_slug, pack
+from notes.slugs import SlugAllocator
+
+WORDS = (
+    'купить', 'молоко', 'позвонить', 'маме', 'план', 'на', 'неделю',
+    'идеи', 'для', 'проекта', 'список', 'книг', 'встреча', 'с', 'командой',
+    'рецепт', 'пирога', 'отпуск', 'заметка', 'важное', 'сделать', 'завтра',
+)
+TEXT_POOL_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует воспроизводимый набор пользователей и заметок для '
+        'нагрузочного тестирования. Заголовки берутся из ограниченного '
+        'набора, поэтому их slug совпадают и получают суффиксы -N.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--notes-per-user', type=int, default=1000)
+        parser.add_argument(
+            '--titles', type=int, default=500,
+            help='Сколько различных заголовков использовать; чем меньше, '
+                 'тем больше совпадений slug.'
+        )
+        parser.add_argument(
+            '--text-length', type=int, default=500,
+            help='Средняя длина текста заметки в символах.'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--prefix',
+            help='Префикс имён пользователей; по умолчанию load<seed>_. '
+                 'Пользователи с таким префиксом не должны существовать.'
+        )
+        parser.add_argument('--batch-size', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        user_ids = self.create_users(
+            options['users'], options['prefix'] or f"load{options['seed']}_"
+        )
+        titles = [
+            ' '.join(self.rng.choices(WORDS, k=3)).capitalize()
+            for _ in range(options['titles'])
+        ]
+        texts = [
+            self.text(self.rng.lognormvariate(0, 0.75)
+                      * options['text_length'])
+            for _ in range(TEXT_POOL_SIZE)
+        ]
+        # Занятые slug всех заголовков читаются заранее одним запросом.
+        slugs = SlugAllocator()
+        slugs.load(titles)
+        rows = (
+            (title, self.rng.choice(texts), slugs.slug_for(title), author_id)
+            for author_id in user_ids
+            for title in self.rng.choices(
+                titles, k=options['notes_per_user']
+            )
+        )
+        # Первая версия каждой заметки — снимок её текста, как при
+        # сохранении формы; тексты берутся из пула, и сжимаются один раз.
+        packed = {text: pack(text) for text in texts}
+        created = connection.ops.adapt_datetimefield_value(timezone.now())
+        total = 0
+        while True:
+            batch = [row for _, row in zip(range(self.batch_size), rows)]
+            if not batch:
+                break
+            with transaction.atomic():
+                self.insert_rows(
+                    Note, ('title', 'text', 'slug', 'author'), batch
+                )
+                ids = ids_by_slug(slug for _, _, slug, _ in batch)
+                self.insert_rows(
+                    Revision,
+                    ('note', 'number', 'title', 'created', 'is_snapshot',
+                     'data'),
+                    [
+                        (ids[slug], 1, title, created, True, packed[text])
+                        for title, text, slug, _ in batch
+                    ],
+                )
+            total += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(user_ids)}, заметок: {total}'
+        ))
+
+    def text(self, length):
+        words = []
+        while sum(map(len, words)) + len(words) < length:
+            words.append(self.rng.choice(WORDS))
+        return ' '.join(words).capitalize() or WORDS[0]
+
+    def create_users(self, count, prefix):
+        User = get_user_model()
+        # Хешировать пароль для каждого пользователя слишком долго.
+        password = make_password(None)
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {prefix!r} уже есть: удалите их '
+                'или задайте другой --prefix.'
+            )
+        with transaction.atomic():
+            User.objects.bulk_create(
+                User(username=f'{prefix}{number}', password=password)
+                for number in range(count)
+            )
+        return list(User.objects.filter(
+            username__startswith=prefix
+        ).values_list('pk', flat=True))
+
+    def insert_rows(self, model, field_names, rows):
+        """
+        Вставка готовых кортежей одним executemany.
+
+        Для миллионов заметок подготовка значений в bulk_create
+        занимает большую часть времени, поэтому значения сразу
+        собираются в том виде, в котором их хранит база.
+        """
+        columns = [model._meta.get_field(name).column for name in field_names]
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(model._meta.db_table),
+            ', '.join(map(connection.ops.quote_name, columns)),
+            ', '.join(['%s'] * len(columns)),
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.archive import import_notes
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает пользователю заметки из архива zip или jsonl, '
+        'выгруженного export_notes или страницей выгрузки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+
+    def handle(self, *args, **options):
+        try:
+            author = get_user_model().objects.get(
+                username=options['username']
+            )
+        except get_user_model().DoesNotExist:
+            raise CommandError('Нет такого пользователя.')
+        with open(options['path'], 'rb') as archive:
+            try:
+                count = import_notes(author, archive, exclusive=True)
+            except ValidationError as error:
+                raise CommandError(' '.join(error.messages))
+        self.stdout.write(self.style.SUCCESS(f'Заметок: {count}'))
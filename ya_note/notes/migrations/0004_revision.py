@@ -0,0 +1,30 @@
+# Generated by Django 3.2.15 on 2026-10-18 00:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0003_note_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Revision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(verbose_name='Номер')),
+                ('title', models.CharField(max_length=100, verbose_name='Заголовок')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Сохранена')),
+                ('is_snapshot', models.BooleanField(default=False, verbose_name='Снимок')),
+                ('data', models.BinaryField()),
+                ('note', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='notes.note')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='revision',
+            constraint=models.UniqueConstraint(fields=('note', 'number'), name='revision_note_number'),
+        ),
+    ]
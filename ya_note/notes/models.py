@@ -1,7 +1,10 @@
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, router, transaction
 
-from pytils.translit import slugify
+from .slugs import MAX_LENGTH, SlugAllocator, base_slug
+
+# Попыток записать заметку со slug из заголовка или её версию.
+SAVE_ATTEMPTS = 5
 
 
 class Note(models.Model):
@@ -17,22 +20,82 @@ class Note(models.Model):
     )
     slug = models.SlugField(
         'Адрес для страницы с заметкой',
-        max_length=100,
+        max_length=MAX_LENGTH,
         unique=True,
         blank=True,
         help_text=('Укажите адрес для страницы заметки. Используйте только '
                    'латиницу, цифры, дефисы и знаки подчёркивания')
     )
+    # Отдельный индекс по автору не нужен: его покрывает составной
+    # индекс из Meta.indexes.
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_index=False,
     )
 
+    class Meta:
+        indexes = (
+            models.Index(fields=('author', 'id'), name='note_author_id_idx'),
+        )
+
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        # Версию добавляет сигнал post_save (notes.signals): заметка и
+        # версия пишутся в одной транзакции, иначе ошибка записи версии
+        # оставила бы заметку сохранённой без неё.
+        with transaction.atomic(using=using):
+            if self.slug:
+                return super().save(*args, **kwargs)
+            # Обычно slug из заголовка свободен: пробуем его без запроса
+            # занятых, а при совпадении подбираем свободный суффикс.
+            self.slug = base_slug(self.title)
+            for attempt in range(SAVE_ATTEMPTS):
+                # Неудачная вставка откатывается к точке сохранения и
+                # не портит транзакцию.
+                try:
+                    with transaction.atomic(using=using):
+                        return super().save(*args, **kwargs)
+                except IntegrityError:
+                    # Выбранный суффикс могла успеть занять одновременная
+                    # запись с тем же заголовком: подбираем заново.
+                    if attempt == SAVE_ATTEMPTS - 1:
+                        raise
+                    self.slug = SlugAllocator(exclude_pk=self.pk).slug_for(
+                        self.title
+                    )
+
+
+class Revision(models.Model):
+    """
+    Версия заметки. Текст хранится сжатым (см. notes.revisions): целиком
+    в снимках, в остальных версиях — разницей с предыдущей.
+    """
+    # Отдельный индекс по заметке не нужен: его покрывает уникальность
+    # (note, number).
+    note = models.ForeignKey(
+        Note,
+        on_delete=models.CASCADE,
+        related_name='revisions',
+        db_index=False,
+    )
+    number = models.PositiveIntegerField('Номер')
+    title = models.CharField('Заголовок', max_length=100)
+    created = models.DateTimeField('Сохранена', auto_now_add=True)
+    is_snapshot = models.BooleanField('Снимок', default=False)
+    data = models.BinaryField()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('note', 'number'), name='revision_note_number'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.note_id} #{self.number}'
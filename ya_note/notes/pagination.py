@@ -0,0 +1,65 @@
+"""Курсорная (keyset) пагинация списка заметок.
+
+Заметки упорядочены по id. Страница выбирается условием «id строго
+больше/меньше курсора» по индексу (author, id), а не OFFSET, поэтому
+у пользователя с десятками тысяч заметок последняя страница стоит
+столько же, сколько первая. Курсор — id крайней заметки страницы.
+"""
+from django.http import Http404
+
+
+# id в SQLite — знаковое 64-битное целое; большее число драйвер
+# не передаст в запрос (OverflowError).
+MAX_ID = 2 ** 63 - 1
+
+
+def decode_cursor(cursor):
+    """Номер заметки из курсора; мусор даёт 404."""
+    try:
+        pk = int(cursor)
+    except ValueError:
+        raise Http404('Некорректный курсор.')
+    if not -MAX_ID - 1 <= pk <= MAX_ID:
+        raise Http404('Некорректный курсор.')
+    return pk
+
+
+class NotePage:
+    """Страница заметок с курсорами на соседние страницы."""
+
+    def __init__(self, object_list, has_previous, has_next):
+        self.object_list = object_list
+        self.previous_cursor = None
+        self.next_cursor = None
+        if object_list and has_previous:
+            self.previous_cursor = object_list[0].pk
+        if object_list and has_next:
+            self.next_cursor = object_list[-1].pk
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def paginate_notes(queryset, per_page, after_cursor=None,
+                   before_cursor=None):
+    """
+    Возвращает страницу заметок.
+
+    Без курсоров — первые заметки; after_cursor — следующие за
+    курсором, before_cursor — предшествующие ему. Лишняя
+    (per_page + 1)-я строка показывает, есть ли что-то дальше.
+    """
+    if before_cursor:
+        rows = list(queryset.filter(
+            pk__lt=decode_cursor(before_cursor)
+        ).order_by('-pk')[:per_page + 1])
+        has_previous = len(rows) > per_page
+        return NotePage(rows[:per_page][::-1], has_previous, True)
+    if after_cursor:
+        queryset = queryset.filter(pk__gt=decode_cursor(after_cursor))
+    rows = list(queryset.order_by('pk')[:per_page + 1])
+    has_next = len(rows) > per_page
+    return NotePage(rows[:per_page], bool(after_cursor), has_next)
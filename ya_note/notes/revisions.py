@@ -0,0 +1,163 @@
+"""
+История версий заметок.
+
+Каждое сохранение заметки с новым заголовком или текстом добавляет
+версию. Каждая SNAPSHOT_INTERVAL-я версия (1, 21, 41, ...) — снимок:
+текст целиком, сжатый zlib. Остальные хранят разницу по строкам с
+предыдущей версией, тоже сжатую: для правок небольших частей длинной
+заметки это сотни байт вместо копии текста.
+
+Чтобы получить текст версии, читается ближайший снимок не позже неё
+и применяются разницы после него — не больше SNAPSHOT_INTERVAL строк
+одним запросом по индексу (note, number), сколько бы версий ни было.
+
+Заметкам, вставленным пачкой (загрузка архива, generate_dataset), первую
+версию-снимок добавляет record_imported: иначе их исходный текст нельзя
+было бы восстановить после первой правки.
+"""
+import difflib
+import json
+import zlib
+from collections import namedtuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import Subquery
+
+from .models import SAVE_ATTEMPTS, Note, Revision
+from .slugs import QUERY_CHUNK
+
+SNAPSHOT_INTERVAL = 20
+
+State = namedtuple('State', 'number title text')
+
+
+def is_snapshot(number):
+    return (number - 1) % SNAPSHOT_INTERVAL == 0
+
+
+def make_delta(old, new):
+    """
+    Разница между текстами: список, где [начало, конец] — строки
+    старого текста, а строка — новый текст, в порядке нового текста.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, False)
+    delta = []
+    for tag, start, end, new_start, new_end in matcher.get_opcodes():
+        if tag == 'equal':
+            delta.append([start, end])
+        elif tag != 'delete':
+            delta.append(''.join(new_lines[new_start:new_end]))
+    return delta
+
+
+def apply_delta(old, delta):
+    lines = old.splitlines(keepends=True)
+    return ''.join(
+        part if isinstance(part, str) else ''.join(lines[part[0]:part[1]])
+        for part in delta
+    )
+
+
+def pack(value):
+    data = json.dumps(value, ensure_ascii=False).encode()
+    # Окно и память zlib по размеру данных: с окном по умолчанию
+    # сжатие короткой версии выделяло бы около 300 КБ на каждое
+    # сохранение. decompress читает размер окна из заголовка.
+    window = max(9, min(zlib.MAX_WBITS, (len(data) - 1).bit_length()))
+    compressor = zlib.compressobj(6, zlib.DEFLATED, window, window - 7)
+    return compressor.compress(data) + compressor.flush()
+
+
+def unpack(data):
+    return json.loads(zlib.decompress(data))
+
+
+def state(note, number=None):
+    """Версия number заметки (по умолчанию последняя) или None."""
+    revisions = Revision.objects.filter(note=note)
+    if number is None:
+        # Последний снимок ищется в том же запросе.
+        revisions = revisions.filter(number__gte=Subquery(
+            revisions.filter(is_snapshot=True).order_by(
+                '-number'
+            ).values('number')[:1]
+        ))
+    else:
+        revisions = revisions.filter(
+            number__gte=number - (number - 1) % SNAPSHOT_INTERVAL,
+            number__lte=number,
+        )
+    rows = list(revisions.order_by('number').values_list(
+        'number', 'title', 'data'
+    ))
+    if not rows or number not in (None, rows[-1][0]):
+        return None
+    text = ''
+    for _, _, data in rows:
+        value = unpack(data)
+        text = value if isinstance(value, str) else apply_delta(text, value)
+    return State(rows[-1][0], rows[-1][1], text)
+
+
+def record(note, created=False):
+    """
+    Добавляет версию, если заголовок или текст изменились.
+
+    Номер версии следует за прочитанной историей. Если его успела занять
+    одновременная запись той же заметки, история читается заново. У
+    новой заметки других версий быть не может, и точка сохранения для
+    повтора ей не нужна.
+    """
+    if created:
+        return create_revision(note, None)
+    for attempt in range(SAVE_ATTEMPTS):
+        last = state(note)
+        if last and (last.title, last.text) == (note.title, note.text):
+            return None
+        try:
+            with transaction.atomic(using=note._state.db):
+                return create_revision(note, last)
+        except IntegrityError:
+            if attempt == SAVE_ATTEMPTS - 1:
+                raise
+
+
+def create_revision(note, last):
+    number = last.number + 1 if last else 1
+    snapshot = is_snapshot(number)
+    return Revision.objects.create(
+        note=note,
+        number=number,
+        title=note.title,
+        is_snapshot=snapshot,
+        data=pack(
+            note.text if snapshot else make_delta(last.text, note.text)
+        ),
+    )
+
+
+def ids_by_slug(slugs):
+    """
+    Номера заметок по их slug, порциями по QUERY_CHUNK: bulk_create
+    на SQLite id не возвращает, а slug уникальны.
+    """
+    slugs, ids = list(slugs), {}
+    for start in range(0, len(slugs), QUERY_CHUNK):
+        ids.update(Note.objects.filter(
+            slug__in=slugs[start:start + QUERY_CHUNK]
+        ).values_list('slug', 'pk'))
+    return ids
+
+
+def record_imported(notes):
+    """Первые версии-снимки заметок, вставленных bulk_create."""
+    ids = ids_by_slug(note.slug for note in notes)
+    Revision.objects.bulk_create(
+        Revision(
+            note_id=ids[note.slug], number=1, title=note.title,
+            is_snapshot=True, data=pack(note.text),
+        )
+        for note in notes
+    )
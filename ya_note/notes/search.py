@@ -0,0 +1,185 @@
+"""
+Полнотекстовый поиск по заметкам пользователя на SQLite FTS5.
+
+Индекс notes_note_fts хранит только токены (external content) и
+поддерживается триггерами на notes_note, поэтому любая запись в
+таблицу — через ORM, bulk_create или generate_dataset — сразу попадает
+в индекс. Автор тоже проиндексирован: фильтр по колонке author_id
+выполняется внутри FTS5 и не перебирает чужие заметки.
+
+Результаты идут от новых заметок к старым, как их читает FTS5, и
+чтение останавливается на LIMIT. Ранжирование bm25 пришлось бы
+считать для всех совпадений: у автора с 50 тысячами заметок частое
+слово давало 80–100 мс на запрос против единиц миллисекунд.
+
+Последнее слово запроса ищется как префикс, чтобы искать по мере
+ввода, остальные уже дописаны и ищутся целиком. Префикс, для длины
+которого нет индекса префиксов, FTS5 собирает в память по всем
+заметкам (частое слово — около 10 мс), поэтому индексы есть для длин
+от 2 до PREFIX_MAX, а более длинный префикс обрезается: слова с общими
+первыми восемью буквами почти всегда формы одного слова. Индекс при
+этом примерно вдвое больше.
+"""
+import re
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Note
+
+TABLE = 'notes_note_fts'
+PREFIX_MAX = 8
+PREFIXES = ' '.join(str(length) for length in range(2, PREFIX_MAX + 1))
+MARK_START, MARK_END = '\x02', '\x03'
+
+SCHEMA = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+        title, text, author_id, content='notes_note', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='{PREFIXES}'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_insert
+    AFTER INSERT ON notes_note BEGIN
+        INSERT INTO {TABLE}(rowid, title, text, author_id)
+        VALUES (new.id, new.title, new.text, new.author_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_delete
+    AFTER DELETE ON notes_note BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, title, text, author_id)
+        VALUES ('delete', old.id, old.title, old.text, old.author_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_update
+    AFTER UPDATE OF title, text, author_id ON notes_note BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, title, text, author_id)
+        VALUES ('delete', old.id, old.title, old.text, old.author_id);
+        INSERT INTO {TABLE}(rowid, title, text, author_id)
+        VALUES (new.id, new.title, new.text, new.author_id);
+    END
+    """,
+)
+
+# Значение automerge FTS5 по умолчанию.
+AUTOMERGE = 4
+AUTOMERGE_SQL = (
+    f"INSERT INTO {TABLE}({TABLE}, rank) VALUES ('automerge', %s)"
+)
+
+# snippet() считается только для попавших в LIMIT строк.
+SEARCH_SQL = f"""
+    SELECT notes_note.id, notes_note.title, notes_note.slug,
+           snippet({TABLE}, 1, %s, %s, '…', 16) AS snippet
+    FROM {TABLE}
+    JOIN notes_note ON notes_note.id = {TABLE}.rowid
+    WHERE {TABLE} MATCH %s AND notes_note.author_id = %s
+    ORDER BY {TABLE}.rowid DESC
+    LIMIT %s
+"""
+
+
+def install(connection):
+    """
+    Создаёт индекс и триггеры, если их нет.
+
+    Вызывается и после каждой миграции: пересоздание таблицы
+    notes_note при изменении её полей удаляет триггеры.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in SCHEMA:
+            cursor.execute(statement)
+
+
+def rebuild(connection):
+    """Перестраивает индекс по текущему содержимому notes_note."""
+    install(connection)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+
+
+@contextmanager
+def bulk_index(connection):
+    """
+    Блок для массовой вставки заметок: индекс обновляется один раз.
+
+    Триггер вставки индексирует по строке, и на сотне тысяч заметок
+    это вдвое дольше, чем проиндексировать их одним INSERT ... SELECT.
+    Внутри блока триггера нет, на выходе новые заметки (id больше
+    прежнего максимума, id в SQLite не переиспользуются) индексируются
+    разом и триггер возвращается. Слияние сегментов индекса на время
+    вставки отключается (ещё около трети времени); сегменты сольют
+    следующие записи. Блок — одна транзакция: удаление триггера держит
+    блокировку записи, и чужие вставки не пройдут мимо индекса, а при
+    ошибке всё вернёт откат.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM notes_note')
+            last_id = cursor.fetchone()[0]
+            cursor.execute(f'DROP TRIGGER IF EXISTS {TABLE}_insert')
+        yield
+        with connection.cursor() as cursor:
+            cursor.execute(AUTOMERGE_SQL, [0])
+            cursor.execute(f"""
+                INSERT INTO {TABLE}(rowid, title, text, author_id)
+                SELECT id, title, text, author_id FROM notes_note
+                WHERE id > %s
+            """, [last_id])
+            cursor.execute(AUTOMERGE_SQL, [AUTOMERGE])
+        install(connection)
+
+
+def match_expression(query, author_id):
+    """
+    Запрос пользователя в синтаксисе FTS5, ограниченный его заметками.
+
+    Каждое слово берётся в кавычки, поэтому операторы и спецсимволы
+    FTS5 из ввода не могут сломать запрос; слова объединяются по И.
+    Префикс из одной буквы совпал бы почти со всем индексом, поэтому
+    такое последнее слово тоже ищется целиком.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words[:-1]]
+    if len(words[-1]) > 1:
+        terms.append(f'"{words[-1][:PREFIX_MAX]}"*')
+    else:
+        terms.append(f'"{words[-1]}"')
+    return 'author_id : "{}" AND {{title text}} : ({})'.format(
+        author_id, ' AND '.join(terms)
+    )
+
+
+def highlight(snippet):
+    """Экранирует фрагмент и превращает маркеры совпадений в <mark>."""
+    return mark_safe(escape(snippet).replace(
+        MARK_START, '<mark>'
+    ).replace(MARK_END, '</mark>'))
+
+
+def search_notes(author, query, limit=None):
+    """Заметки автора, подходящие под запрос, от новых к старым."""
+    expression = match_expression(query, author.pk)
+    if expression is None:
+        return []
+    results = list(Note.objects.raw(SEARCH_SQL, [
+        MARK_START, MARK_END, expression, author.pk,
+        limit or settings.NOTES_SEARCH_RESULTS_COUNT,
+    ]))
+    for note in results:
+        note.snippet = highlight(note.snippet)
+    return results
@@ -0,0 +1,20 @@
+from django.db import connections, router
+from django.db.models.signals import post_migrate, post_save
+from django.dispatch import receiver
+
+from . import revisions, search
+from .models import Note
+
+
+@receiver(post_migrate)
+def install_search_index(sender, using, **kwargs):
+    """Возвращает триггеры поиска, если миграция пересоздала таблицу."""
+    if sender.name == 'notes' and router.allow_migrate_model(using, Note):
+        search.install(connections[using])
+
+
+@receiver(post_save, sender=Note)
+def record_revision(sender, instance, created, raw, **kwargs):
+    """Сохраняет версию заметки после каждого изменения."""
+    if not raw:
+        revisions.record(instance, created=created)
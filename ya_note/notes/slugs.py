@@ -0,0 +1,166 @@
+"""
+Выдача свободных slug заметкам.
+
+slug строится из заголовка (base_slug), транслитерация запоминается:
+заголовки у заметок часто повторяются. Если базовый slug занят, к нему
+добавляется первый свободный суффикс -N. Занятые суффиксы базового slug
+читаются из базы одним запросом по диапазону индекса slug, а для пачки
+заметок — одним запросом на QUERY_CHUNK разных базовых slug.
+
+Note.save обращается к SlugAllocator только при совпадении: сначала
+заметка записывается с базовым slug, и обычно лишних запросов нет.
+"""
+from functools import lru_cache
+
+from django.apps import apps
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from pytils.translit import slugify
+
+# Длина поля Note.slug; база обрезается так, чтобы влез «-9999999».
+MAX_LENGTH = 100
+BASE_LENGTH = MAX_LENGTH - 8
+FALLBACK = 'note'
+QUERY_CHUNK = 200
+# Больше любого символа slug: slug >= base AND slug < base + PREFIX_END
+# выбирает все slug с префиксом base по индексу, в отличие от LIKE.
+PREFIX_END = '\U0010ffff'
+
+
+@lru_cache(maxsize=10000)
+def base_slug(title):
+    """Базовый slug заголовка, без суффикса."""
+    return slugify(title)[:BASE_LENGTH] or FALLBACK
+
+
+class SlugAllocator:
+    """
+    Свободные slug для заголовков.
+
+    Занятые номера базового slug (0 — сам базовый slug) читаются из
+    базы при первом обращении к нему или заранее пачкой в load(); дальше
+    slug выдаются из памяти. Выданные slug тоже считаются занятыми,
+    поэтому один распределитель обслуживает всю пачку новых заметок.
+    exclude_pk — заметка, чей нынешний slug не мешает (при правке).
+    """
+
+    def __init__(self, exclude_pk=None):
+        self.exclude_pk = exclude_pk
+        self.taken = {}
+        self.next_number = {}
+        # Выданные без суффикса и заданные вручную slug. Выданные
+        # с суффиксом хранить не нужно: они видны по taken их базы.
+        self.issued = set()
+        # Номера заданных вручную slug вида base-N по base: чтобы
+        # учесть их при загрузке base, не перебирая все issued.
+        self.issued_numbers = {}
+
+    def load(self, titles, slugs=()):
+        """
+        Читает занятые slug для всех ещё не известных заголовков.
+
+        Готовые slug из slugs читаются тем же запросом как базовые:
+        после этого is_taken(slug, 0) говорит, занят ли такой slug.
+        """
+        bases = sorted(
+            {base_slug(title) for title in titles}.union(slugs)
+            - set(self.taken)
+        )
+        for start in range(0, len(bases), QUERY_CHUNK):
+            chunk = bases[start:start + QUERY_CHUNK]
+            for base in chunk:
+                self.taken[base] = set()
+            # Условие собирается строкой: ORM сравнивает каждое новое
+            # условие Q со всеми прежними, и на пачке это квадратично.
+            bounds = [(base, base + PREFIX_END) for base in chunk]
+            ranges = RawSQL(
+                ' OR '.join(['(slug >= %s AND slug < %s)'] * len(chunk)),
+                [value for bound in bounds for value in bound],
+                output_field=BooleanField(),
+            )
+            notes = apps.get_model('notes', 'Note').objects.filter(ranges)
+            if self.exclude_pk is not None:
+                notes = notes.exclude(pk=self.exclude_pk)
+            for slug in notes.values_list('slug', flat=True):
+                self.mark(slug)
+            for base in chunk:
+                self.taken[base].update(self.issued_numbers.get(base, ()))
+                if base in self.issued:
+                    self.taken[base].add(0)
+                prefix, dash, number = base.rpartition('-')
+                if dash and number.isdigit() and self.is_taken(
+                    prefix, int(number)
+                ):
+                    self.taken[base].add(0)
+
+    def is_taken(self, base, number):
+        # Номера ниже next_number заняты или уже выданы.
+        return number in self.taken.get(base, ()) or (
+            number < self.next_number.get(base, 0)
+        )
+
+    def mark(self, slug):
+        """Отмечает slug занятым у всех известных базовых slug."""
+        if slug in self.taken:
+            self.taken[slug].add(0)
+        base, dash, number = slug.rpartition('-')
+        if dash and number.isdigit() and base in self.taken:
+            self.taken[base].add(int(number))
+
+    def reserve(self, slug):
+        """Занимает slug (заданный вручную или базовый) для следующих выдач."""
+        self.issued.add(slug)
+        self.mark(slug)
+        base, dash, number = slug.rpartition('-')
+        if dash and number.isdigit():
+            self.issued_numbers.setdefault(base, set()).add(int(number))
+
+    def slug_for(self, title):
+        """Первый свободный slug для заголовка; он сразу занимается."""
+        base = base_slug(title)
+        if base not in self.taken:
+            self.load([title])
+        taken = self.taken[base]
+        number = self.next_number.get(base, 0)
+        while number in taken:
+            number += 1
+        self.next_number[base] = number + 1
+        if not number:
+            self.reserve(base)
+            return base
+        slug = f'{base}-{number}'
+        if slug in self.taken:
+            self.taken[slug].add(0)
+        return slug
+
+
+def assign_slugs(notes, allocator=None):
+    """
+    Заполняет slug у пачки новых заметок перед bulk_create.
+
+    Пустые slug подбираются по заголовку, как в Note.save. Заданный
+    slug сохраняется, если он свободен и не встречался в пачке раньше,
+    иначе тоже подбирается по заголовку: NoteForm.clean_slug в таком
+    случае вернул бы ошибку. Запросов к базе — по одному на QUERY_CHUNK
+    разных заголовков и заданных slug.
+
+    Пачки одной загрузки передают общий allocator: иначе занятые slug
+    частых заголовков читались бы заново для каждой пачки.
+    """
+    if allocator is None:
+        allocator = SlugAllocator()
+    allocator.load(
+        (note.title for note in notes),
+        [note.slug for note in notes if note.slug],
+    )
+    for note in notes:
+        if not note.slug:
+            continue
+        if allocator.is_taken(note.slug, 0) or note.slug in allocator.issued:
+            note.slug = ''
+        else:
+            allocator.reserve(note.slug)
+    for note in notes:
+        if not note.slug:
+            note.slug = allocator.slug_for(note.title)
+    return notes
@@ -0,0 +1,15 @@
+class QueryBudgetMixin:
+    """
+    Проверка бюджета SQL-запросов для TestCase.
+
+    Число запросов берётся из статистики QueryStatsMiddleware, поэтому
+    учитываются только запросы, выполненные при обработке URL.
+    """
+
+    def assert_query_budget(self, response, budget):
+        request = response.wsgi_request
+        stats = request.query_stats
+        self.assertLessEqual(stats.count, budget, (
+            f'{request.method} {request.path}: {stats}, а бюджет {budget}; '
+            f'повторяются: {stats.duplicated_sql()}'
+        ))
@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from notes.models import Note
@@ -76,6 +76,114 @@ class NotesTests(TestCase):
         self.assertEqual(response.status_code, 404)
 
 
+@override_settings(NOTES_COUNT_ON_LIST_PAGE=2)
+class NotesListPaginationTest(TestCase):
+    """Тесты постраничного списка заметок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт автора с пятью заметками."""
+        cls.author = User.objects.create_user(
+            username='author', password='password'
+        )
+        cls.notes = [
+            Note.objects.create(
+                title=f'Note {i}', text='Text', author=cls.author
+            )
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        """Авторизует автора заметок."""
+        self.client.login(username='author', password='password')
+
+    def get_page(self, **params):
+        response = self.client.get(reverse('notes:list'), params)
+        return response.context['object_list']
+
+    def test_pages_follow_cursors_and_skip_texts(self):
+        """
+        Проверяет, что страницы идут по курсорам без пересечений, назад
+        возвращают ту же страницу и не загружают тексты заметок.
+        """
+        first = self.get_page()
+        self.assertEqual(list(first), self.notes[:2])
+        self.assertIsNone(first.previous_cursor)
+        second = self.get_page(after=first.next_cursor)
+        self.assertEqual(list(second), self.notes[2:4])
+        last = self.get_page(after=second.next_cursor)
+        self.assertEqual(list(last), self.notes[4:])
+        self.assertIsNone(last.next_cursor)
+        back = self.get_page(before=second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertIn('text', first.object_list[0].get_deferred_fields())
+
+    def test_garbage_cursor_returns_404(self):
+        """Проверяет, что некорректный курсор даёт 404."""
+        for params in (
+            {'after': 'x'},
+            {'after': '9' * 30},
+            {'before': '-' + '9' * 30},
+        ):
+            with self.subTest(**params):
+                response = self.client.get(reverse('notes:list'), params)
+                self.assertEqual(response.status_code, 404)
+
+
+class NoteSearchTest(TestCase):
+    """Тесты поиска по заметкам."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт двух авторов с заметками про снегопад."""
+        cls.author = User.objects.create_user(
+            username='author', password='password'
+        )
+        cls.other = User.objects.create_user(username='other')
+        cls.by_text = Note.objects.create(
+            title='Погода', text='Жители <b>ждут</b> снегопад',
+            author=cls.author,
+        )
+        cls.by_title = Note.objects.create(
+            title='Снегопад', text='Текст', author=cls.author
+        )
+        Note.objects.create(
+            title='Снегопад', text='Чужая заметка', author=cls.other
+        )
+
+    def setUp(self):
+        """Авторизует автора заметок."""
+        self.client.login(username='author', password='password')
+
+    def search(self, query):
+        response = self.client.get(reverse('notes:search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response.context['object_list']
+
+    def test_search_finds_own_notes_by_prefix(self):
+        """
+        Проверяет, что поиск находит по началу слова только свои
+        заметки, начиная с новых, и подсвечивает совпадение; длинное
+        слово ищется по первым восьми буквам.
+        """
+        results = self.search('снегоп')
+        self.assertEqual(results, [self.by_title, self.by_text])
+        self.assertIn('<mark>', results[1].snippet)
+        self.assertIn('&lt;b&gt;', results[1].snippet)
+        self.assertEqual(
+            self.search('снегопадами'), [self.by_title, self.by_text]
+        )
+        self.assertEqual(self.search('"OR *'), [])
+
+    def test_search_index_follows_changes(self):
+        """Проверяет, что правка и удаление сразу видны в поиске."""
+        self.by_title.title = 'Метель'
+        self.by_title.save()
+        self.by_text.delete()
+        self.assertEqual(self.search('снегопад'), [])
+        self.assertEqual(self.search('метель'), [self.by_title])
+
+
 class NoteAccessTest(TestCase):
     """
     Тесты для проверки доступа к страницам заметок
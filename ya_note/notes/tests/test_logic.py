@@ -1,7 +1,22 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import zipfile
+from io import StringIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from notes.models import Note
+from notes.revisions import SNAPSHOT_INTERVAL, create_revision, state
+from notes.slugs import SlugAllocator, assign_slugs
+from yanote.sqlite.base import DatabaseWrapper
 
 User = get_user_model()
 
@@ -60,3 +75,411 @@ class NoteLogicTests(TestCase):
             'придумайте уникальное значение!'
         )
         self.assertEqual(Note.objects.filter(slug='unique-slug').count(), 1)
+
+    def test_same_titles_get_numbered_slugs(self):
+        """
+        Проверяет, что slug из совпадающих заголовков получает первый
+        свободный суффикс, а правка без slug сохраняет прежний.
+        """
+        self.client.login(username='user1', password='pass1')
+        for _ in range(3):
+            self.client.post(reverse('notes:add'), {
+                'title': 'Список дел', 'text': 'Текст',
+            })
+        self.assertEqual(
+            sorted(Note.objects.values_list('slug', flat=True)),
+            ['spisok-del', 'spisok-del-1', 'spisok-del-2'],
+        )
+        Note.objects.get(slug='spisok-del-1').delete()
+        self.client.post(reverse('notes:edit', args=['spisok-del']), {
+            'title': 'Список дел', 'text': 'Новый текст',
+        })
+        self.assertTrue(Note.objects.filter(
+            slug='spisok-del', text='Новый текст'
+        ).exists())
+        Note.objects.create(
+            title='Список дел', text='Текст', author=self.user1
+        )
+        self.assertTrue(Note.objects.filter(slug='spisok-del-1').exists())
+
+    def test_taken_suffix_is_picked_again(self):
+        """
+        Проверяет, что если выбранный суффикс успели занять (как при
+        одновременном сохранении с тем же заголовком), заметка получает
+        следующий.
+        """
+        Note.objects.create(
+            title='Список дел', text='Текст', author=self.user1
+        )
+        slug_for = SlugAllocator.slug_for
+        rivals = []
+
+        def racing_slug_for(allocator, title):
+            slug = slug_for(allocator, title)
+            if not rivals:
+                rivals.append(Note.objects.create(
+                    title='Соперник', text='Текст', author=self.user1,
+                    slug=slug,
+                ))
+            return slug
+
+        with mock.patch.object(SlugAllocator, 'slug_for', racing_slug_for):
+            note = Note.objects.create(
+                title='Список дел', text='Текст', author=self.user1
+            )
+        self.assertEqual(rivals[0].slug, 'spisok-del-1')
+        self.assertEqual(note.slug, 'spisok-del-2')
+
+
+class AssignSlugsTests(TestCase):
+    """Тесты выдачи slug пачке заметок."""
+
+    def test_batch_gets_unique_slugs_in_one_query(self):
+        """
+        Проверяет, что пачка получает уникальные slug одним запросом с
+        учётом заметок в базе и slug, заданных в самой пачке; занятый
+        заданный slug заменяется slug из заголовка.
+        """
+        author = User.objects.create_user(username='author')
+        Note.objects.create(title='Заметка', text='Текст', author=author)
+        notes = [
+            Note(title=title, text='Текст', author=author, slug=slug)
+            for title, slug in (
+                ('Заметка', ''), ('Заметка', 'zametka-2'), ('Заметка', ''),
+                ('Заметка 1', ''), ('Заметка', ''), ('!!!', ''),
+                ('Другая', 'zametka'), ('Другая', 'zametka-2'),
+            )
+        ]
+        with self.assertNumQueries(1):
+            assign_slugs(notes)
+        self.assertEqual([note.slug for note in notes], [
+            'zametka-1', 'zametka-2', 'zametka-3', 'zametka-1-1',
+            'zametka-4', 'note', 'drugaya', 'drugaya-1',
+        ])
+        Note.objects.bulk_create(notes)
+
+
+class NoteArchiveTests(TestCase):
+    """Тесты выгрузки и загрузки архива заметок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт автора с заметками и второго пользователя."""
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.notes = [
+            Note.objects.create(
+                title=f'Заметка {number}', text=f'Текст\n\n«{number}»',
+                author=cls.author,
+            )
+            for number in range(3)
+        ]
+        Note.objects.create(title='Чужая', text='Текст', author=cls.reader)
+
+    def export(self, format):
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('notes:export'), {
+            'format': format
+        })
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def upload(self, name, content):
+        self.client.force_login(self.reader)
+        return self.client.post(reverse('notes:import'), {
+            'archive': SimpleUploadedFile(name, content),
+        })
+
+    def test_round_trip(self):
+        """
+        Проверяет, что выгруженные в zip и jsonl заметки загружаются
+        другому пользователю теми же, а занятые slug заменяются.
+        """
+        for format in ('zip', 'jsonl'):
+            with self.subTest(format=format):
+                archive = self.export(format)
+                self.assertRedirects(
+                    self.upload(f'notes.{format}', archive),
+                    reverse('notes:success'),
+                )
+                imported = Note.objects.filter(
+                    author=self.reader, title__startswith='Заметка'
+                ).order_by('pk')
+                self.assertEqual(
+                    [(note.title, note.text) for note in imported],
+                    [(note.title, note.text) for note in self.notes],
+                )
+                self.assertFalse(imported.filter(slug__in=[
+                    note.slug for note in self.notes
+                ]).exists())
+                for note in imported:
+                    self.assertEqual(state(note), (1, note.title, note.text))
+                imported.delete()
+
+    def test_zip_is_readable(self):
+        """Проверяет, что zip содержит Markdown-файл на каждую заметку."""
+        with zipfile.ZipFile(io.BytesIO(self.export('zip'))) as archive:
+            self.assertEqual(
+                archive.read(f'{self.notes[0].slug}.md').decode(),
+                '# Заметка 0\n\nТекст\n\n«0»',
+            )
+            self.assertEqual(len(archive.namelist()), 3)
+
+    def test_invalid_archive_imports_nothing(self):
+        """Проверяет, что ошибка в архиве отменяет загрузку целиком."""
+        lines = [
+            json.dumps({'title': 'Новая', 'text': 'Текст', 'slug': 'new'}),
+            json.dumps({'title': 'Без текста', 'text': ''}),
+        ]
+        response = self.upload('notes.jsonl', '\n'.join(lines).encode())
+        self.assertFormError(
+            response, 'form', 'archive',
+            'Строка 2: Текст — Это поле не может быть пустым.',
+        )
+        self.assertFalse(Note.objects.filter(slug='new').exists())
+
+    @staticmethod
+    def zip_of(files):
+        content = io.BytesIO()
+        with zipfile.ZipFile(content, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, data in files.items():
+                archive.writestr(name, data)
+        return content.getvalue()
+
+    @override_settings(
+        NOTES_IMPORT_MAX_NOTE_SIZE=1000, NOTES_IMPORT_MAX_SIZE=1500
+    )
+    def test_oversized_zip_is_rejected(self):
+        """
+        Проверяет, что zip с файлом больше лимита заметки или больше
+        лимита архива после распаковки отклоняется ошибкой формы.
+        """
+        note = '# Заметка\n\n'.encode() + b'x' * 900
+        cases = (
+            ({'bomb.md': b'x' * 10 ** 6}, 'bomb.md: больше'),
+            ({'a.md': note, 'b.md': note}, 'Архив больше'),
+        )
+        for files, message in cases:
+            with self.subTest(message=message):
+                response = self.upload('notes.zip', self.zip_of(files))
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(
+                    message, response.context['form'].errors['archive'][0]
+                )
+        self.assertFalse(Note.objects.filter(
+            author=self.reader, title='Заметка'
+        ).exists())
+
+    @override_settings(
+        NOTES_IMPORT_MAX_NOTE_SIZE=1000, NOTES_IMPORT_MAX_SIZE=1500
+    )
+    def test_oversized_jsonl_is_rejected(self):
+        """
+        Проверяет, что jsonl со строкой больше лимита заметки или больше
+        лимита архива отклоняется ошибкой формы.
+        """
+        line = json.dumps({'title': 'Заметка', 'text': 'x' * 900}) + '\n'
+        cases = (
+            ('x' * 10 ** 6, 'Строка 1: больше'),
+            (line * 2, 'Архив больше'),
+        )
+        for content, message in cases:
+            with self.subTest(message=message):
+                response = self.upload('notes.jsonl', content.encode())
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(
+                    message, response.context['form'].errors['archive'][0]
+                )
+        self.assertFalse(Note.objects.filter(
+            author=self.reader, title='Заметка'
+        ).exists())
+
+    def test_upload_is_written_batch_by_batch(self):
+        """
+        Проверяет, что страница загрузки пишет заметки пачками и не
+        снимает триггер поиска: заметки сразу находятся.
+        """
+        archive = self.export('jsonl')
+        with mock.patch('notes.archive.WEB_BATCH_SIZE', 2):
+            with CaptureQueriesContext(connection) as queries:
+                self.upload('notes.jsonl', archive)
+        statements = [query['sql'] for query in queries]
+        self.assertEqual(len([
+            sql for sql in statements
+            if sql.startswith('INSERT INTO "notes_note"')
+        ]), 2)
+        self.assertFalse(any('DROP TRIGGER' in sql for sql in statements))
+        response = self.client.get(reverse('notes:search'), {'q': 'заметка'})
+        self.assertEqual(len(response.context['object_list']), 3)
+
+    def test_damaged_zip_member_is_rejected(self):
+        """
+        Проверяет, что файл, размер которого в заголовке zip занижен,
+        отклоняется и не распаковывается дальше заявленного.
+        """
+        content = bytearray(self.zip_of({'a.md': b'x' * 10 ** 6}))
+        for signature, offset in ((b'PK\x03\x04', 22), (b'PK\x01\x02', 24)):
+            start = content.index(signature) + offset
+            content[start:start + 4] = (10).to_bytes(4, 'little')
+        response = self.upload('notes.zip', bytes(content))
+        self.assertFormError(
+            response, 'form', 'archive', 'a.md: файл повреждён.'
+        )
+
+
+class RevisionTests(TestCase):
+    """Тесты истории версий заметки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт заметку и правит её, сохраняя ожидаемые тексты."""
+        cls.author = User.objects.create_user(username='author')
+        cls.note = Note.objects.create(
+            title='Заметка', text='Первая строка\n', author=cls.author
+        )
+        cls.texts = [cls.note.text]
+        for number in range(2 * SNAPSHOT_INTERVAL + 5):
+            lines = cls.texts[-1].splitlines(keepends=True)
+            lines.insert(number % len(lines), f'Строка {number}\n')
+            if number % 3 == 0:
+                lines[-1] = f'Правка {number}\n'
+            cls.note.text = ''.join(lines)
+            cls.note.save()
+            cls.texts.append(cls.note.text)
+
+    def test_every_revision_is_restored(self):
+        """
+        Проверяет, что версии хранятся снимками и разницами и каждая
+        восстанавливается одним запросом; сохранение без изменений
+        версию не добавляет.
+        """
+        self.note.save()
+        self.assertEqual(self.note.revisions.count(), len(self.texts))
+        self.assertEqual(
+            list(self.note.revisions.filter(is_snapshot=True).values_list(
+                'number', flat=True
+            ).order_by('number')),
+            [1, SNAPSHOT_INTERVAL + 1, 2 * SNAPSHOT_INTERVAL + 1],
+        )
+        for number, text in enumerate(self.texts, 1):
+            with self.assertNumQueries(1):
+                revision = state(self.note, number)
+            self.assertEqual(revision.text, text)
+
+    def test_restore_revision(self):
+        """
+        Проверяет, что восстановление возвращает текст версии новой
+        версией, а чужие версии недоступны.
+        """
+        url = reverse('notes:revision', args=(self.note.slug, 2))
+        self.client.force_login(
+            User.objects.create_user(username='reader')
+        )
+        self.assertEqual(self.client.post(url).status_code, 404)
+        self.client.force_login(self.author)
+        self.assertRedirects(
+            self.client.post(url),
+            reverse('notes:detail', args=(self.note.slug,)),
+        )
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.text, self.texts[1])
+        self.assertEqual(state(self.note).number, len(self.texts) + 1)
+
+    def test_taken_number_is_read_again(self):
+        """
+        Проверяет, что если номер версии успела занять одновременная
+        правка той же заметки, версия получает следующий номер.
+        """
+        rivals = []
+
+        def racing_state(note, number=None):
+            last = state(note, number)
+            if not rivals:
+                rivals.append(create_revision(Note(
+                    pk=note.pk, title='Заметка', text='Чужой текст'
+                ), last))
+            return last
+
+        self.note.text = 'Новый текст'
+        with mock.patch('notes.revisions.state', racing_state):
+            self.note.save()
+        number = len(self.texts)
+        self.assertEqual(state(self.note, number + 1).text, 'Чужой текст')
+        self.assertEqual(
+            state(self.note), (number + 2, 'Заметка', 'Новый текст')
+        )
+
+    def test_note_is_not_saved_without_revision(self):
+        """Проверяет, что заметка и её версия пишутся вместе."""
+        self.note.text = 'Новый текст'
+        with mock.patch(
+            'notes.revisions.record', side_effect=IntegrityError
+        ):
+            with self.assertRaises(IntegrityError):
+                self.note.save()
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.text, self.texts[-1])
+
+
+class GenerateDatasetTests(TestCase):
+    """Тесты команды генерации заметок для нагрузочного тестирования."""
+
+    def test_generated_slugs_are_unique(self):
+        """
+        Проверяет, что совпадающие заголовки получают разные slug,
+        в том числе при повторном запуске команды.
+        """
+        for seed in ('1', '2'):
+            call_command(
+                'generate_dataset', '--users', '2', '--notes-per-user',
+                '20', '--titles', '3', '--seed', seed, stdout=StringIO()
+            )
+        self.assertEqual(Note.objects.count(), 80)
+        self.assertEqual(
+            Note.objects.values('slug').distinct().count(), 80
+        )
+        for note in Note.objects.all():
+            self.assertEqual(state(note), (1, note.title, note.text))
+
+    def test_same_seed_needs_new_prefix(self):
+        """
+        Проверяет, что имена пользователей задаются seed, а повторный
+        запуск с занятым префиксом даёт понятную ошибку.
+        """
+        options = ['--users', '2', '--notes-per-user', '1', '--seed', '7']
+        call_command('generate_dataset', *options, stdout=StringIO())
+        self.assertEqual(
+            set(User.objects.values_list('username', flat=True)),
+            {'load7_0', 'load7_1'},
+        )
+        with self.assertRaisesMessage(CommandError, 'load7_'):
+            call_command('generate_dataset', *options, stdout=StringIO())
+        call_command(
+            'generate_dataset', *options, '--prefix', 'again_',
+            stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 4)
+
+
+class SqliteBackendTests(TestCase):
+    """Тесты бэкенда yanote.sqlite."""
+
+    def test_new_connection_gets_pragmas(self):
+        """Новое соединение настраивается прагмами и OPTIONS."""
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = DatabaseWrapper({
+                **connection.settings_dict,
+                'NAME': os.path.join(directory, 'db.sqlite3'),
+                'OPTIONS': {'pragmas': {'synchronous': 'OFF'}},
+            })
+            try:
+                with wrapper.cursor() as cursor:
+                    values = [
+                        cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                        for name in (
+                            'journal_mode', 'synchronous', 'busy_timeout'
+                        )
+                    ]
+            finally:
+                wrapper.close()
+        self.assertEqual(values, ['wal', 0, 5000])
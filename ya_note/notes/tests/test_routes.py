@@ -1,6 +1,7 @@
 from django.test import TestCase
 from django.urls import reverse
 from notes.models import Note
+from notes.tests.mixins import QueryBudgetMixin
 from django.contrib.auth.models import User
 
 
@@ -147,3 +148,53 @@ class NoteRoutesTest(TestCase):
 
         response = self.client.get(reverse('users:logout'))
         self.assertEqual(response.status_code, 200)
+
+
+class NoteQueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Тесты числа SQL-запросов на страницах заметок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Создаёт автора и заметку для тестов."""
+        cls.author = User.objects.create_user(
+            username='author', password='password'
+        )
+        cls.note = Note.objects.create(
+            title='Test Note', text='This is a test note.', author=cls.author
+        )
+
+    def setUp(self):
+        """Авторизует автора заметки."""
+        self.client.login(username='author', password='password')
+
+    def test_read_pages_query_budget(self):
+        """Проверяет число запросов списка, заметки и формы правки."""
+        for url in (
+            reverse('notes:list'),
+            reverse('notes:detail', args=[self.note.slug]),
+            reverse('notes:edit', args=[self.note.slug]),
+        ):
+            with self.subTest(url=url):
+                self.assert_query_budget(self.client.get(url), 3)
+
+    def test_revision_pages_query_budget(self):
+        """Проверяет, что число запросов истории не растёт с версиями."""
+        for number in range(5):
+            self.note.text = f'Версия {number}'
+            self.note.save()
+        for url, budget in (
+            (reverse('notes:revisions', args=[self.note.slug]), 5),
+            (reverse('notes:revision', args=[self.note.slug, 3]), 4),
+        ):
+            with self.subTest(url=url):
+                self.assert_query_budget(self.client.get(url), budget)
+
+    def test_create_note_query_budget(self):
+        """Проверяет число запросов при создании заметки."""
+        response = self.client.post(reverse('notes:add'), {
+            'title': 'New Note', 'text': 'Text',
+        })
+        self.assertEqual(response.status_code, 302)
+        # Два из них — SAVEPOINT и RELEASE транзакции, в которой заметка
+        # пишется вместе с версией; вне теста это BEGIN и COMMIT.
+        self.assert_query_budget(response, 8)
@@ -11,5 +11,18 @@ urlpatterns = [
     path('note/<slug:slug>/', views.NoteDetail.as_view(), name='detail'),
     path('delete/<slug:slug>/', views.NoteDelete.as_view(), name='delete'),
     path('notes/', views.NotesList.as_view(), name='list'),
+    path('search/', views.NoteSearch.as_view(), name='search'),
+    path('export/', views.NoteExport.as_view(), name='export'),
+    path('import/', views.NoteImport.as_view(), name='import'),
+    path(
+        'revisions/<slug:slug>/',
+        views.NoteRevisionList.as_view(),
+        name='revisions',
+    ),
+    path(
+        'revisions/<slug:slug>/<int:number>/',
+        views.NoteRevisionDetail.as_view(),
+        name='revision',
+    ),
     path('done/', views.NoteSuccess.as_view(), name='success'),
 ]
@@ -1,9 +1,17 @@
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import ValidationError
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy
 from django.views import generic
 
-from .forms import NoteForm
+from .archive import CONTENT_TYPES, export_notes, import_notes
+from .forms import ImportForm, NoteForm
 from .models import Note
+from .pagination import paginate_notes
+from .revisions import state
+from .search import search_notes
 
 
 class Home(generic.TemplateView):
@@ -32,9 +40,9 @@ class NoteCreate(NoteBase, generic.CreateView):
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        # Заметка сохраняется один раз, в form.save() из form_valid:
+        # каждое сохранение проверяет, не появилась ли новая версия.
+        form.instance.author = self.request.user
         return super().form_valid(form)
 
 
@@ -50,10 +58,115 @@ class NoteDelete(NoteBase, generic.DeleteView):
 
 
 class NotesList(NoteBase, generic.ListView):
-    """Список всех заметок пользователя."""
+    """Список заметок пользователя, по страницам."""
     template_name = 'notes/list.html'
 
+    def get_queryset(self):
+        """Списку нужны только id, slug и заголовок, без текстов."""
+        return super().get_queryset().only('id', 'slug', 'title')
+
+    def get_context_data(self, **kwargs):
+        page = paginate_notes(
+            self.object_list,
+            settings.NOTES_COUNT_ON_LIST_PAGE,
+            after_cursor=self.request.GET.get('after'),
+            before_cursor=self.request.GET.get('before'),
+        )
+        return super().get_context_data(object_list=page, **kwargs)
+
+
+class NoteSearch(NoteBase, generic.ListView):
+    """Полнотекстовый поиск по заметкам пользователя."""
+    template_name = 'notes/search.html'
+
+    def get_queryset(self):
+        return search_notes(self.request.user, self.request.GET.get('q', ''))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        return context
+
 
 class NoteDetail(NoteBase, generic.DetailView):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+
+
+class NoteExport(NoteBase, generic.View):
+    """Выгрузка всех заметок пользователя архивом zip или jsonl."""
+
+    def get(self, request):
+        format = request.GET.get('format', 'zip')
+        if format not in CONTENT_TYPES:
+            raise Http404('Неизвестный формат выгрузки.')
+        response = StreamingHttpResponse(
+            export_notes(self.get_queryset(), format),
+            content_type=CONTENT_TYPES[format],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="notes.{format}"'
+        )
+        return response
+
+
+class NoteImport(NoteBase, generic.FormView):
+    """Загрузка заметок из архива, выгруженного NoteExport."""
+    template_name = 'notes/import.html'
+    form_class = ImportForm
+
+    def form_valid(self, form):
+        try:
+            import_notes(self.request.user, form.cleaned_data['archive'])
+        except ValidationError as error:
+            form.add_error('archive', error)
+            return self.form_invalid(form)
+        return super().form_valid(form)
+
+
+class RevisionBase(NoteBase):
+    """Базовый класс для страниц версий заметки."""
+
+    def get_note(self):
+        return get_object_or_404(
+            NoteBase.get_queryset(self), slug=self.kwargs['slug']
+        )
+
+
+class NoteRevisionList(RevisionBase, generic.ListView):
+    """Список версий заметки, от новых к старым."""
+    template_name = 'notes/revisions.html'
+    paginate_by = settings.NOTES_REVISIONS_ON_PAGE
+
+    def get_queryset(self):
+        self.note = self.get_note()
+        return self.note.revisions.order_by('-number').only(
+            'note', 'number', 'title', 'created', 'is_snapshot'
+        )
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(note=self.note, **kwargs)
+
+
+class NoteRevisionDetail(RevisionBase, generic.TemplateView):
+    """Версия заметки; POST восстанавливает её как новую версию."""
+    template_name = 'notes/revision.html'
+
+    def get_revision(self, note):
+        revision = state(note, self.kwargs['number'])
+        if revision is None:
+            raise Http404('Нет такой версии.')
+        return revision
+
+    def get_context_data(self, **kwargs):
+        note = self.get_note()
+        return super().get_context_data(
+            note=note, revision=self.get_revision(note), **kwargs
+        )
+
+    def post(self, request, **kwargs):
+        note = self.get_note()
+        revision = self.get_revision(note)
+        note.title, note.text = revision.title, revision.text
+        note.save()
+        return redirect('notes:detail', slug=note.slug)
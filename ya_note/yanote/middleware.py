@@ -0,0 +1,77 @@
+"""Учёт SQL-запросов, выполненных при обработке HTTP-запроса."""
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('yanote.queries')
+
+HEADER = 'X-DB-Queries'
+
+
+class QueryStats:
+    """Счётчик запросов; подключается через connection.execute_wrapper."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[(sql, repr(params))] += 1
+
+    @property
+    def duplicates(self):
+        """Сколько запросов повторили уже выполненный с теми же params."""
+        return sum(times - 1 for times in self.statements.values())
+
+    def duplicated_sql(self):
+        return [
+            sql for (sql, _), times in self.statements.items() if times > 1
+        ]
+
+    def __str__(self):
+        return (
+            f'count={self.count}; time={self.duration * 1000:.1f}ms; '
+            f'duplicates={self.duplicates}'
+        )
+
+
+class QueryStatsMiddleware:
+    """
+    Считает запросы, их суммарное время и дубликаты для каждого запроса.
+
+    Статистика пишется в лог yanote.queries и сохраняется в
+    request.query_stats; при DEBUG она также отдаётся в заголовке
+    X-DB-Queries. Middleware стоит первым, чтобы учесть и запросы
+    сессий и аутентификации.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = request.query_stats = QueryStats()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        if stats.duplicates:
+            logger.warning(
+                '%s %s: %s; повторяются: %s', request.method,
+                request.path, stats, stats.duplicated_sql()
+            )
+        else:
+            logger.info('%s %s: %s', request.method, request.path, stats)
+        if settings.DEBUG:
+            response[HEADER] = str(stats)
+        return response
@@ -22,6 +22,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yanote.middleware.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,8 +55,15 @@ WSGI_APPLICATION = 'yanote.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # sqlite3 с прагмами WAL, busy_timeout и т.д., см. yanote/sqlite.
+        'ENGINE': 'yanote.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Соединение живёт между запросами, а не открывается заново.
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            # Переопределяют yanote.sqlite.base.DEFAULT_PRAGMAS.
+            'pragmas': {},
+        },
     }
 }
 
@@ -87,3 +95,14 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')
+
+NOTES_COUNT_ON_LIST_PAGE = 100
+
+NOTES_SEARCH_RESULTS_COUNT = 20
+
+NOTES_REVISIONS_ON_PAGE = 50
+
+# Ограничения загрузки архива (notes.archive): на одну заметку (файл zip
+# после распаковки или строку jsonl) и на весь архив, в байтах.
+NOTES_IMPORT_MAX_NOTE_SIZE = 1024 * 1024
+NOTES_IMPORT_MAX_SIZE = 256 * 1024 * 1024
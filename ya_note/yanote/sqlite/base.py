@@ -0,0 +1,39 @@
+"""
+Бэкенд SQLite с настройкой соединения через PRAGMA.
+
+Подключается как ENGINE 'yanote.sqlite'. Прагмы задаются в
+OPTIONS['pragmas'] и применяются к каждому новому соединению; значения
+по умолчанию — DEFAULT_PRAGMAS. Переиспользование соединений между
+запросами включается обычным CONN_MAX_AGE.
+
+WAL позволяет читателям работать, пока идёт запись, synchronous=NORMAL
+в режиме WAL не теряет целостность базы при падении процесса,
+busy_timeout заставляет писателей ждать блокировку, а не сразу
+получать «database is locked».
+"""
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    # 256 МБ файла отображаются в память, кеш страниц — 64 МБ.
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**DEFAULT_PRAGMAS, **params.pop('pragmas', {})}
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            if value is not None:
+                connection.execute(f'PRAGMA {name} = {value}')
+        return connection